@@ -0,0 +1,282 @@
+import math
+
+import FetchEngine
+import ForecastWeather
+import MathOthers
+import Metrics
+import WeatherInfoJunction
+
+"""
+This module provides an adaptive grid: a quadtree of cells that is only refined where the rain changes, within a budget of calls
+to the API.
+
+A uniform grid (see 'MathOthers.getGrid()') costs as many requests in a dry, uniform area as across a storm front. The adaptive grid
+starts from a coarse grid of cells around the center point, with a sample at each corner. A cell is split into four when the values
+at its corners differ by more than a threshold ('rain_current' by more than 'RAIN_THRESHOLD' mm, or the probability of precipitation
+of the first forecast horizon by more than 'POP_THRESHOLD'); the split adds samples at the center and at the middle of the sides of
+the cell. The cells with the largest differences are split first, in rounds (the new samples of a round are fetched together), until
+no cell needs to be split, the cells reach 'MIN_SIZE' km, or the next split would exceed the budget.
+
+The tree can then be queried by coordinate ('queryTree()'): the values of a location are interpolated (bilinear) from the corners of
+the smallest cell that contains it.
+
+Notes:
+    - A tree is a dictionary created by 'buildTree()'. Each cell is a dictionary with its 'bounds' (lat_min, lat_max, lon_min, lon_max),
+    its 'depth' and its 'children' (None for a leaf, or a list of four cells).
+    - Neighbouring cells share their corner samples, which are only requested once. The budget counts two calls (current weather and
+    forecast) for each new sample, even if it is in the caches.
+
+Functions in this module:
+
+- 'buildTree()': Builds the adaptive grid of a region, fetching the samples and refining the cells within a budget of calls.
+- 'cellSpread()': Returns how much the values at the corners of a cell differ, relative to the thresholds.
+- 'treeLeaves()': Returns the leaf cells of a tree.
+- 'queryTree()': Returns the weather of a location, interpolated from the smallest cell that contains it.
+"""
+
+BUDGET = 1000
+RAIN_THRESHOLD = 0.5
+POP_THRESHOLD = 0.2
+MIN_SIZE = 5
+
+def _sampleKey(lat, lon):
+    return (round(lat, 4), round(lon, 4))
+
+def _cellPoints(bounds, split):
+    # The corners of a cell or, for a split, the five points it adds (the center and the middle of each side)
+    lat_min, lat_max, lon_min, lon_max = bounds
+    if not split:
+        return [(lat_min, lon_min), (lat_min, lon_max), (lat_max, lon_min), (lat_max, lon_max)]
+
+    lat_mid = (lat_min + lat_max) / 2
+    lon_mid = (lon_min + lon_max) / 2
+    return [(lat_mid, lon_mid), (lat_min, lon_mid), (lat_max, lon_mid), (lat_mid, lon_min), (lat_mid, lon_max)]
+
+def _cellSize(cell):
+    # North-south side of the cell, in km (the shorter one, except near the poles)
+    return MathOthers.R * math.radians(cell['bounds'][1] - cell['bounds'][0])
+
+def _fetchSamples(tree, points, maxWorkers):
+    locations = {}
+    for lat, lon in points:
+        key = _sampleKey(lat, lon)
+        if key not in tree['index'] and key not in locations:
+            # The longitude of the samples across the antimeridian is wrapped, so it is valid for the API
+            locations[key] = {'coord': (key[0], round((key[1] + 180) % 360 - 180, 4))}
+
+    names = {}
+    for key in locations:
+        names[key] = 'sample' + str(len(tree['samples']) + len(names) + 1)
+        tree['index'][key] = names[key]
+
+    requests = {names[key]: info for key, info in locations.items()}
+    priority = FetchEngine.nearestFirst(tree['center'][0], tree['center'][1])
+    for name, record in WeatherInfoJunction.streamWeather(requests, 'weather', maxWorkers, tree['horizons'], priority):
+        tree['samples'][name] = record
+
+    tree['calls'] += 2 * len(requests)
+
+def _newSamples(tree, cell):
+    return {_sampleKey(lat, lon) for lat, lon in _cellPoints(cell['bounds'], True)} - tree['index'].keys()
+
+def _split(cell):
+    lat_min, lat_max, lon_min, lon_max = cell['bounds']
+    lat_mid = (lat_min + lat_max) / 2
+    lon_mid = (lon_min + lon_max) / 2
+
+    cell['children'] = [
+        {'bounds': bounds, 'depth': cell['depth'] + 1, 'children': None}
+        for bounds in ((lat_min, lat_mid, lon_min, lon_mid), (lat_min, lat_mid, lon_mid, lon_max),
+                       (lat_mid, lat_max, lon_min, lon_mid), (lat_mid, lat_max, lon_mid, lon_max))
+    ]
+
+def buildTree(dist, lat1, lon1, coarse_point, budget=BUDGET, rainThreshold=RAIN_THRESHOLD, popThreshold=POP_THRESHOLD,
+              minSize=MIN_SIZE, maxWorkers=None, horizons=None):
+    """
+    Builds the adaptive grid of a region: fetches the samples of a coarse grid of cells, then splits the cells whose corner values
+    differ by more than the thresholds, the largest differences first, while the budget allows.
+
+    Parameters:
+        dist (float): Distance in kilometers from the center point.
+        lat1 (float): Latitude of the center point.
+        lon1 (float): Longitude of the center point.
+        coarse_point (float): Size, in kilometers, of the cells of the coarse grid.
+        budget (int): Maximum number of calls to the API (two for each sample).
+        rainThreshold (float): Difference of 'rain_current', in mm, between the corners of a cell above which it is split.
+        popThreshold (float): Difference of the probability of precipitation (0 to 1) above which a cell is split.
+        minSize (float): Cells are not split below this size, in kilometers.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        horizons (tuple): Forecast horizons, in hours. If None, 'ForecastWeather.HORIZONS' is used.
+
+    Returns:
+        tree (dict): The tree, with the coarse grid of cells ('roots', 'rows' and 'cols'), the 'samples' (with the same records as
+        'WeatherInfoJunction.weatherPoints()') and the number of 'calls' used.
+
+    Raises:
+        ValueError: If the coarse grid alone needs more calls than the budget.
+    """
+    if coarse_point <= 0:
+        raise ValueError("The size of the cells must be greater than 0.")
+
+    lat_max, lat_min, lon_max, lon_min = MathOthers.rangePoints(dist, lat1, lon1)
+    step = math.degrees(coarse_point / MathOthers.R)
+    rows = max(1, math.ceil((lat_max - lat_min) / step))
+    cols = max(1, math.ceil((lon_max - lon_min) * math.cos(math.radians(lat1)) / step))
+
+    if 2 * (rows + 1) * (cols + 1) > budget:
+        raise ValueError(f"The coarse grid needs {2 * (rows + 1) * (cols + 1)} calls, more than the budget of {budget}.")
+
+    latStep = (lat_max - lat_min) / rows
+    lonStep = (lon_max - lon_min) / cols
+    roots = [
+        {'bounds': (lat_min + row * latStep, lat_min + (row + 1) * latStep, lon_min + col * lonStep, lon_min + (col + 1) * lonStep),
+         'depth': 0, 'children': None}
+        for row in range(rows) for col in range(cols)
+    ]
+
+    tree = {
+        'center': (lat1, lon1),
+        'bounds': (lat_min, lat_max, lon_min, lon_max),
+        'rows': rows,
+        'cols': cols,
+        'roots': roots,
+        'horizons': ForecastWeather.checkHorizons(horizons),
+        'thresholds': (rainThreshold, popThreshold),
+        'samples': {},
+        'index': {},
+        'calls': 0
+    }
+
+    _fetchSamples(tree, [point for cell in roots for point in _cellPoints(cell['bounds'], False)], maxWorkers)
+
+    with Metrics.span('refineTree'):
+        while True:
+            candidates = [(cellSpread(tree, cell), cell) for cell in treeLeaves(tree) if _cellSize(cell) / 2 >= minSize]
+            candidates = sorted((item for item in candidates if item[0] > 1), key=lambda item: -item[0])
+
+            # The cells that fit in the budget are split together, so their new samples are fetched in a single round
+            chosen = []
+            points = set()
+            calls = tree['calls']
+            for spread, cell in candidates:
+                new = _newSamples(tree, cell) - points
+                if calls + 2 * len(new) <= budget:
+                    calls += 2 * len(new)
+                    points |= new
+                    chosen.append(cell)
+
+            if not chosen:
+                break
+
+            _fetchSamples(tree, points, maxWorkers)
+            for cell in chosen:
+                _split(cell)
+
+    return tree
+
+def _cornerValues(tree, cell):
+    # (rain_current, pop) of each corner; None for the values of failed requests
+    popKey = f"percent_{tree['horizons'][0]}h"
+    values = []
+    for lat, lon in _cellPoints(cell['bounds'], False):
+        record = tree['samples'][tree['index'][_sampleKey(lat, lon)]]
+        values.append((record.get('rain_current'), (record.get('weather') or {}).get(popKey)))
+    return values
+
+def cellSpread(tree, cell):
+    """
+    Returns how much the values at the corners of a cell differ, relative to the thresholds of the tree. A value greater than 1
+    means that the cell must be split.
+
+    Parameters:
+        tree (dict): A tree created by 'buildTree()'.
+        cell (dict): A cell of the tree.
+
+    Returns:
+        float: The largest of (rain_current range / rain threshold) and (pop range / pop threshold). Missing values are ignored.
+    """
+    spread = 0.0
+    for column, threshold in enumerate(tree['thresholds']):
+        values = [corner[column] for corner in _cornerValues(tree, cell) if corner[column] is not None]
+        if len(values) > 1:
+            spread = max(spread, (max(values) - min(values)) / threshold)
+    return spread
+
+def treeLeaves(tree):
+    """
+    Returns the leaf cells of a tree, which cover the whole region without overlapping.
+
+    Parameters:
+        tree (dict): A tree created by 'buildTree()'.
+
+    Returns:
+        leaves (list): The leaf cells.
+    """
+    leaves = []
+    pending = list(reversed(tree['roots']))
+    while pending:
+        cell = pending.pop()
+        if cell['children'] is None:
+            leaves.append(cell)
+        else:
+            pending.extend(reversed(cell['children']))
+    return leaves
+
+def queryTree(tree, lat, lon):
+    """
+    Returns the weather of a location, interpolated (bilinear) from the corners of the smallest cell of the tree that contains it.
+
+    Parameters:
+        tree (dict): A tree created by 'buildTree()'.
+        lat (float): Latitude of the location.
+        lon (float): Longitude of the location.
+
+    Returns:
+        record (dict): A record like the ones of 'WeatherInfoJunction.weatherPoints()', with the 'bounds' and 'depth' of the cell.
+        None if the location is outside the region of the tree.
+    """
+    lat_min, lat_max, lon_min, lon_max = tree['bounds']
+    coord = (lat, lon)
+
+    # The longitude is taken in the same range as the cells, which may go beyond 180 near the antimeridian
+    lon = (lon - tree['center'][1] + 180) % 360 - 180 + tree['center'][1]
+    if not (lat_min <= lat <= lat_max and lon_min <= lon <= lon_max):
+        return None
+
+    row = min(tree['rows'] - 1, int((lat - lat_min) / (lat_max - lat_min) * tree['rows']))
+    col = min(tree['cols'] - 1, int((lon - lon_min) / (lon_max - lon_min) * tree['cols']))
+    cell = tree['roots'][row * tree['cols'] + col]
+
+    while cell['children'] is not None:
+        lat_mid = (cell['bounds'][0] + cell['bounds'][1]) / 2
+        lon_mid = (cell['bounds'][2] + cell['bounds'][3]) / 2
+        cell = cell['children'][2 * (lat >= lat_mid) + (lon >= lon_mid)]
+
+    # Bilinear weights of the corners, in the order of '_cellPoints()'
+    lat0, lat1, lon0, lon1 = cell['bounds']
+    t = (lat - lat0) / (lat1 - lat0)
+    u = (lon - lon0) / (lon1 - lon0)
+    weights = [(1 - t) * (1 - u), (1 - t) * u, t * (1 - u), t * u]
+    records = [tree['samples'][tree['index'][_sampleKey(*point)]] for point in _cellPoints(cell['bounds'], False)]
+
+    def blend(values):
+        # Weighted mean of the corners that have the value
+        pairs = [(weight, value) for weight, value in zip(weights, values) if value is not None]
+        total = sum(weight for weight, value in pairs)
+        if not pairs:
+            return None
+        if total == 0:
+            return round(sum(value for weight, value in pairs) / len(pairs), 2)
+        return round(sum(weight * value for weight, value in pairs) / total, 2)
+
+    record = {'coord': coord}
+
+    forecasts = [corner.get('weather') for corner in records]
+    if any(forecast is not None for forecast in forecasts):
+        fields = next(forecast for forecast in forecasts if forecast is not None)
+        record['weather'] = {field: blend([forecast.get(field) if forecast else None for forecast in forecasts]) for field in fields}
+
+    record['rain_current'] = blend([corner.get('rain_current') for corner in records])
+    record['bounds'] = cell['bounds']
+    record['depth'] = cell['depth']
+    return record
@@ -0,0 +1,224 @@
+import numpy as np
+
+import ForecastWeather
+import Interpolation
+import Metrics
+
+"""
+This module turns the rain of a weather result into a rain attenuation grid for the satellite network simulator.
+
+The simulator needs the attenuation of each link, not the rain: with the result dictionaries, it would have to find the rain of
+each location and compute the attenuation on every routing step. Instead, 'buildAttenuationGrid()' runs once after a
+'WeatherInfoJunction' function: it rasterizes the rain rates onto a regular latitude/longitude grid and computes, for each cell,
+rain field and frequency, the specific attenuation of ITU-R P.838-3:
+
+    gamma = k * R ** alpha   (dB/km, with the rain rate R in mm/h)
+
+where k and alpha depend on the frequency, the elevation of the path and the polarization ('specificCoefficients()'). The routing
+code then reads the attenuation of any coordinate in constant time with 'lookupAttenuation()' (nearest cell or bilinear).
+
+Notes:
+    - The rain rates are in mm/h: 'rain_current' is the rain of the last hour, and the forecast values ('rain_3h', 'rain_6h', ...)
+    are the rain of a 3 hour slot, so they are divided by 3.
+    - The grid cells are filled by inverse distance weighting of the nearest locations (see 'Interpolation' module). Cells whose
+    nearest locations have no value are NaN.
+    - The coefficients are valid from 1 to 1000 GHz.
+
+Functions in this module:
+
+- 'specificCoefficients()': Returns the k and alpha coefficients of ITU-R P.838-3 for some frequencies.
+- 'specificAttenuation()': Returns the specific attenuation, in dB/km, of some rain rates.
+- 'rainRates()': Returns the rain rates, in mm/h, of the locations of a weather result.
+- 'buildAttenuationGrid()': Rasterizes the rain of a weather result and computes its specific attenuation.
+- 'lookupAttenuation()': Returns the specific attenuation at some coordinates, from a grid.
+"""
+
+# ITU-R P.838-3, tables 1 to 4: (a, b, c) of each term, and the (m, c) of the linear term
+K_H = ([-5.33980, -0.35351, -0.23789, -0.94158], [-0.10008, 1.26970, 0.86036, 0.64552], [1.13098, 0.45400, 0.15354, 0.16817], -0.18961, 0.71147)
+K_V = ([-3.80595, -3.44965, -0.39902, 0.50167], [0.56934, -0.22911, 0.73042, 1.07319], [0.81061, 0.51059, 0.11899, 0.27195], -0.16398, 0.63297)
+ALPHA_H = ([-0.14318, 0.29591, 0.32177, -5.37610, 16.1721], [1.82442, 0.77564, 0.63773, -0.96230, -3.29980],
+           [-0.55187, 0.19822, 0.13164, 1.47828, 3.43990], 0.67849, -1.95537)
+ALPHA_V = ([-0.07771, 0.56727, -0.20238, -48.2991, 48.5833], [2.33840, 0.95545, 1.14520, 0.791669, 0.791459],
+           [-0.76284, 0.54039, 0.26809, 0.116226, 0.116479], -0.053739, 0.83433)
+
+FREQUENCIES = (12.0, 20.0, 30.0)
+ELEVATION = 45.0
+TILT = 45.0
+RESOLUTION = 0.1
+
+def _fit(table, logFrequency):
+    # sum of a * exp(-((log10 f - b) / c) ** 2), plus m * log10 f + c
+    a, b, c, m, offset = (np.asarray(value, dtype=float) for value in table)
+    terms = a * np.exp(-((logFrequency[..., None] - b) / c) ** 2)
+    return terms.sum(axis=-1) + m * logFrequency + offset
+
+def specificCoefficients(frequencies, elevation=ELEVATION, tilt=TILT):
+    """
+    Returns the k and alpha coefficients of ITU-R P.838-3 for some frequencies, a path elevation and a polarization tilt.
+
+    Parameters:
+        frequencies (array-like): Frequencies, in GHz (1 to 1000).
+        elevation (float): Elevation angle of the path, in degrees.
+        tilt (float): Polarization tilt angle relative to the horizontal, in degrees (45 for circular polarization).
+
+    Returns:
+        tuple: (k, alpha) NumPy arrays, with the shape of 'frequencies'.
+    """
+    logFrequency = np.log10(np.asarray(frequencies, dtype=float))
+
+    kH = 10 ** _fit(K_H, logFrequency)
+    kV = 10 ** _fit(K_V, logFrequency)
+    alphaH = _fit(ALPHA_H, logFrequency)
+    alphaV = _fit(ALPHA_V, logFrequency)
+
+    factor = np.cos(np.radians(elevation)) ** 2 * np.cos(np.radians(2 * tilt))
+    k = (kH + kV + (kH - kV) * factor) / 2
+    alpha = (kH * alphaH + kV * alphaV + (kH * alphaH - kV * alphaV) * factor) / (2 * k)
+
+    return k, alpha
+
+def specificAttenuation(rates, frequencies, elevation=ELEVATION, tilt=TILT):
+    """
+    Returns the specific attenuation of some rain rates, for some frequencies.
+
+    Parameters:
+        rates (array-like): Rain rates, in mm/h.
+        frequencies (array-like): Frequencies, in GHz.
+        elevation (float): Elevation angle of the path, in degrees.
+        tilt (float): Polarization tilt angle, in degrees.
+
+    Returns:
+        numpy.ndarray: The attenuation, in dB/km, with shape (frequencies..., rates...).
+    """
+    k, alpha = specificCoefficients(frequencies, elevation, tilt)
+    rates = np.asarray(rates, dtype=float)
+    shape = k.shape + (1,) * rates.ndim
+
+    return k.reshape(shape) * rates ** alpha.reshape(shape)
+
+def rainRates(weather, fields=None):
+    """
+    Returns the rain rates of the locations of a weather result.
+
+    Parameters:
+        weather (dict): A result of a 'WeatherInfoJunction' function (or a 'ResultStore.WeatherView').
+        fields (tuple): The rain fields: 'rain_current' and the forecast fields ('rain_3h', ...). If None, 'rain_current' and the
+        fields of 'ForecastWeather.HORIZONS' are used.
+
+    Returns:
+        tuple: (coordinates, rates), where 'coordinates' has shape (n, 2) and 'rates' has shape (n, fields), in mm/h (NaN if missing).
+    """
+    if fields is None:
+        fields = ('rain_current',) + tuple(f'rain_{hours}h' for hours in ForecastWeather.HORIZONS)
+
+    coordinates = np.zeros((len(weather), 2))
+    rates = np.full((len(weather), len(fields)), np.nan)
+
+    for row, record in enumerate(weather.values()):
+        coordinates[row] = record['coord']
+        forecast = record.get('rain_forecast') or record.get('weather') or {}
+
+        for column, field in enumerate(fields):
+            if field == 'rain_current':
+                value = record.get('rain_current')
+            else:
+                value = forecast.get(field)
+                value = None if value is None else value / 3
+            if value is not None:
+                rates[row, column] = value
+
+    return coordinates, rates
+
+def buildAttenuationGrid(weather, frequencies=FREQUENCIES, resolution=RESOLUTION, fields=None, elevation=ELEVATION, tilt=TILT):
+    """
+    Rasterizes the rain of a weather result onto a regular latitude/longitude grid, covering its locations, and computes the
+    specific attenuation of each cell.
+
+    Parameters:
+        weather (dict): A result of a 'WeatherInfoJunction' function (or a 'ResultStore.WeatherView').
+        frequencies (tuple): Frequencies of the links, in GHz.
+        resolution (float): Size of the cells, in degrees.
+        fields (tuple): The rain fields (see 'rainRates()').
+        elevation (float): Elevation angle of the paths, in degrees.
+        tilt (float): Polarization tilt angle, in degrees.
+
+    Returns:
+        grid (dict): The grid, with the latitude and longitude of the first cell center ('lat0', 'lon0'), the 'resolution', the
+        'fields' and 'frequencies', the 'rates' (fields, rows, cols), in mm/h, and the 'attenuation' (fields, frequencies, rows, cols),
+        in dB/km.
+    """
+    if fields is None:
+        fields = ('rain_current',) + tuple(f'rain_{hours}h' for hours in ForecastWeather.HORIZONS)
+    if not len(weather):
+        raise ValueError("The weather result has no locations.")
+
+    coordinates, rates = rainRates(weather, fields)
+
+    with Metrics.span('attenuationGrid'):
+        lat0, lon0 = coordinates.min(axis=0)
+        rows = int(np.ceil((coordinates[:, 0].max() - lat0) / resolution)) + 1
+        cols = int(np.ceil((coordinates[:, 1].max() - lon0) / resolution)) + 1
+
+        lat, lon = np.meshgrid(lat0 + resolution * np.arange(rows), lon0 + resolution * np.arange(cols), indexing='ij')
+        indexes, weights, exact = Interpolation.idwWeights(np.column_stack((lat.ravel(), lon.ravel())), coordinates)
+        cellRates = Interpolation.interpolateValues(rates, indexes, weights).T.reshape(len(fields), rows, cols)
+
+        attenuation = specificAttenuation(cellRates, frequencies, elevation, tilt)
+
+    return {
+        'lat0': float(lat0),
+        'lon0': float(lon0),
+        'resolution': resolution,
+        'rows': rows,
+        'cols': cols,
+        'fields': tuple(fields),
+        'frequencies': tuple(frequencies),
+        'rates': cellRates.astype(np.float32),
+        'attenuation': np.ascontiguousarray(np.moveaxis(attenuation, 0, 1), dtype=np.float32)
+    }
+
+def lookupAttenuation(grid, lat, lon, bilinear=False):
+    """
+    Returns the specific attenuation at some coordinates, from a grid, in constant time. Coordinates outside the grid take the
+    values of its nearest border.
+
+    Parameters:
+        grid (dict): A grid created by 'buildAttenuationGrid()'.
+        lat (float or array-like): Latitudes.
+        lon (float or array-like): Longitudes.
+        bilinear (bool): If True, the values of the four nearest cell centers are interpolated; otherwise the nearest cell is used.
+
+    Returns:
+        numpy.ndarray: The attenuation, in dB/km, with shape (fields, frequencies) for a single coordinate, or
+        (fields, frequencies, n) for arrays of coordinates.
+    """
+    attenuation = grid['attenuation']
+
+    # A single coordinate (a routing query) is computed without NumPy arithmetic, which is much slower on scalars
+    if np.ndim(lat) == 0 and np.ndim(lon) == 0:
+        row = min(max((lat - grid['lat0']) / grid['resolution'], 0), grid['rows'] - 1)
+        col = min(max((lon - grid['lon0']) / grid['resolution'], 0), grid['cols'] - 1)
+        if not bilinear:
+            return attenuation[:, :, int(row + 0.5), int(col + 0.5)]
+
+        row0, col0 = int(row), int(col)
+        row1, col1 = min(row0 + 1, grid['rows'] - 1), min(col0 + 1, grid['cols'] - 1)
+        t, u = row - row0, col - col0
+        return ((1 - t) * (1 - u)) * attenuation[:, :, row0, col0] + ((1 - t) * u) * attenuation[:, :, row0, col1] \
+            + (t * (1 - u)) * attenuation[:, :, row1, col0] + (t * u) * attenuation[:, :, row1, col1]
+
+    row = np.clip((np.asarray(lat, dtype=float) - grid['lat0']) / grid['resolution'], 0, grid['rows'] - 1)
+    col = np.clip((np.asarray(lon, dtype=float) - grid['lon0']) / grid['resolution'], 0, grid['cols'] - 1)
+
+    if not bilinear:
+        return attenuation[..., np.rint(row).astype(np.intp), np.rint(col).astype(np.intp)]
+
+    row0 = np.floor(row).astype(np.intp)
+    col0 = np.floor(col).astype(np.intp)
+    row1 = np.minimum(row0 + 1, grid['rows'] - 1)
+    col1 = np.minimum(col0 + 1, grid['cols'] - 1)
+    t = row - row0
+    u = col - col0
+
+    return ((1 - t) * (1 - u) * attenuation[..., row0, col0] + (1 - t) * u * attenuation[..., row0, col1]
+            + t * (1 - u) * attenuation[..., row1, col0] + t * u * attenuation[..., row1, col1])
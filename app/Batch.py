@@ -0,0 +1,338 @@
+import argparse
+import csv
+import json
+import os
+
+import requests
+
+import CurrentWeather
+import DataIntroduction
+import FetchEngine
+import ForecastWeather
+import Geocoder
+import HttpClient
+import MathOthers
+import Metrics
+import OutputFormats
+import QueryPlan
+import RainField
+import WeatherCache
+import WeatherInfoJunction
+
+"""
+This module provides a non-interactive batch mode, which gets the weather for many center points in a single run.
+
+The jobs are read from a CSV file (with a header) or a JSON lines file. Each job has a center point, given by 'lat' and 'lon'
+or by 'city' and 'country' (ISO 3166 code), a distance 'dist' in km, a distance between points 'spacing' in km (for the modes that
+use points) and a 'mode', which is the option of the main menu: 1 (or 'cities'), 2 (or 'points') or 3 (or 'both'). A 'name' can
+also be given; otherwise the jobs are named 'job1', 'job2', ... The names must be unique, since the results are stored by name.
+
+With a 'coarse' distance, in km, only the samples of a grid with that spacing are requested, and the points ('spacing' km apart,
+which can then be below the usual minimum) are interpolated from them (see 'Interpolation' module).
+
+All jobs share the same connections, caches and query plans. Before the jobs run, the locations of every job are merged, so a
+location used by several jobs (or by both a city and a point) is requested only once. With '--lattice', the points of every job are
+taken from the global lattice (see 'Lattice' module), so overlapping regions share all their points.
+
+Example of a CSV jobs file:
+
+    name,lat,lon,city,country,dist,spacing,mode
+    lisbon,38.72,-9.14,,,200,40,both
+    porto,,,Porto,PT,100,20,points
+
+Usage:
+    python Batch.py jobs.csv -o results.json [--lattice] [--workers N] [--calls-per-minute N] [--metrics FILE] [--profile FILE]
+                    [--rain-field FILE] [--rain-field-level KM] [--format FORMAT]
+
+With '--rain-field', the results are also written into a memory-mapped rain field file (see 'RainField' module), which is created
+if missing and otherwise updated in place, so simulator processes that map it see the new values.
+The results file is JSON by default; '--format' (or the extension of the file: '.json.gz', '.json.zst', '.npz', '.parquet') selects
+another format of the 'OutputFormats' module.
+
+Functions in this module:
+
+- 'readJobs()': Reads the jobs of a CSV or JSON lines file.
+- 'parseJob()': Validates a job and converts its values.
+- 'resolveCenters()': Gets the coordinates of the jobs given by city name.
+- 'prefetch()': Fetches, once, the weather of every location used by the jobs.
+- 'runJob()': Gets the weather of a single job.
+- 'forecastKey()': Returns the key of the forecast in the records of a job.
+- 'runBatch()': Runs every job of a file and writes the results.
+"""
+
+MODES = {'1': 1, 'cities': 1, '2': 2, 'points': 2, '3': 3, 'both': 3}
+
+def readJobs(filePath):
+    """
+    Reads the jobs of a CSV file (with a header) or a JSON lines file (one JSON object per line).
+
+    Parameters:
+        filePath (str): Path of the jobs file. Files ending in '.csv' are read as CSV.
+
+    Returns:
+        jobs (list): A list of validated jobs (see 'parseJob()').
+
+    Raises:
+        ValueError: If a job is invalid, or if several jobs have the same name (the results are stored by job name).
+    """
+    with open(filePath, newline='', encoding='utf-8') as infile:
+        if filePath.lower().endswith('.csv'):
+            rows = list(csv.DictReader(infile))
+        else:
+            rows = [json.loads(line) for line in infile if line.strip()]
+
+    jobs = [parseJob(row, number) for number, row in enumerate(rows, start=1)]
+
+    numbers = {}
+    for number, job in enumerate(jobs, start=1):
+        numbers.setdefault(job['name'], []).append(number)
+
+    for name, used in numbers.items():
+        if len(used) > 1:
+            raise ValueError(f"Job {name}: the name is used by the jobs {', '.join(map(str, used))}. Job names must be unique.")
+
+    return jobs
+
+def parseJob(row, number):
+    """
+    Validates a job and converts its values. The limits are the same as the ones of the interactive mode ('DataIntroduction' module).
+
+    Parameters:
+        row (dict): The job, as read from the file. Empty values are ignored.
+        number (int): Position of the job in the file, used for its default name.
+
+    Returns:
+        job (dict): A dictionary with the 'name', 'mode', 'dist', 'spacing', 'coarse', 'lat', 'lon', 'city' and 'country' of the job.
+
+    Raises:
+        ValueError: If a value is missing or invalid.
+    """
+    row = {key.strip(): value for key, value in row.items() if key and value not in (None, '')}
+    name = str(row.get('name', f'job{number}'))
+
+    try:
+        mode = MODES[str(row.get('mode', '')).strip().lower()]
+        dist = float(row['dist'])
+        spacing = float(row['spacing']) if 'spacing' in row else None
+        coarse = float(row['coarse']) if 'coarse' in row else None
+        lat = float(row['lat']) if 'lat' in row else None
+        lon = float(row['lon']) if 'lon' in row else None
+    except KeyError as e:
+        raise ValueError(f"Job {name}: missing or invalid value for {e}.")
+    except (TypeError, ValueError):
+        raise ValueError(f"Job {name}: values must be numbers.")
+
+    if not 10 <= dist <= 500:
+        raise ValueError(f"Job {name}: the distance must be between 10 and 500, including.")
+
+    if (lat is None or lon is None) and not ('city' in row and 'country' in row):
+        raise ValueError(f"Job {name}: either 'lat' and 'lon', or 'city' and 'country', must be given.")
+
+    if lat is not None and lon is not None and not (-90 < lat < 90 and -180 < lon < 180):
+        raise ValueError(f"Job {name}: the coordinates are out of range.")
+
+    if mode != 1:
+        aux = DataIntroduction.minDistPoints(dist)
+
+        # In interpolation mode, the limits apply to the samples, which are the requested locations
+        if coarse is not None:
+            if not (coarse >= aux and coarse < dist):
+                raise ValueError(f"Job {name}: the distance between samples must be at least {aux} km and less than {dist} km.")
+            if spacing is None or not 0 < spacing < dist:
+                raise ValueError(f"Job {name}: the distance between points must be greater than 0 and less than {dist} km.")
+        elif spacing is None or not (spacing >= aux and spacing < dist):
+            raise ValueError(f"Job {name}: the distance between points must be at least {aux} km and less than {dist} km.")
+    else:
+        coarse = None
+
+    return {
+        'name': name,
+        'mode': mode,
+        'dist': dist,
+        'spacing': spacing,
+        'coarse': coarse,
+        'lat': lat,
+        'lon': lon,
+        'city': row.get('city'),
+        'country': row.get('country')
+    }
+
+def resolveCenters(jobs):
+    """
+    Gets the coordinates of the jobs given by city name. Each city is only geocoded once.
+    Jobs whose city can't be found are removed.
+
+    Parameters:
+        jobs (list): A list of jobs returned by 'parseJob()'.
+
+    Returns:
+        jobs (list): The jobs with coordinates.
+    """
+    found = {}
+    resolved = []
+
+    for job in jobs:
+        if job['lat'] is None or job['lon'] is None:
+            key = (Geocoder.normalizeName(job['city']), Geocoder.normalizeName(job['country']))
+
+            if key not in found:
+                try:
+                    found[key] = DataIntroduction.geocodeCity(job['city'], job['country'])
+                except (requests.exceptions.RequestException, IndexError, KeyError, ValueError):
+                    print(f"Error fetching coordinates for {job['city']} (job {job['name']}). The job was skipped.")
+                    found[key] = None
+
+            if found[key] is None:
+                continue
+
+            job['lat'], job['lon'] = found[key]
+
+        resolved.append(job)
+
+    return resolved
+
+def prefetch(plans, maxWorkers=None):
+    """
+    Fetches the current and forecast weather of every location used by the jobs, once, into the caches of the
+    'CurrentWeather' and 'ForecastWeather' modules. Locations that share a cache key are only requested once.
+    The cities are requested first, then the points, each nearest to the center of its job first.
+
+    Parameters:
+        plans (list): A list of (job, query plan) tuples.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+
+    Returns:
+        tuple: (number of locations used by the jobs, number of unique locations).
+    """
+    total = 0
+    locations = {}
+    ranks = {}
+
+    for job, plan in plans:
+        used = []
+        if job['mode'] in (1, 3):
+            used += [(0, info) for info in QueryPlan.planCities(plan).values()]
+        if job['mode'] in (2, 3):
+            points = QueryPlan.planSamples(plan) if plan['coarse_point'] is not None else QueryPlan.planPoints(plan)
+            used += [(1, info) for info in points.values()]
+
+        total += len(used)
+        for group, info in used:
+            key = WeatherCache.cacheKey(CurrentWeather.ENDPOINT, *info['coord'])
+            rank = (group, MathOthers.haversineDist((plan['lat'], plan['lon']), info['coord']))
+            locations[key] = info
+            ranks[key] = min(rank, ranks.get(key, rank))
+
+    priority = lambda item: ranks[item[0]]
+    FetchEngine.fetchAll(CurrentWeather.ENDPOINT, locations, maxWorkers, CurrentWeather.cache, priority)
+    ForecastWeather.getForecasts(locations, maxWorkers, priority)
+
+    return total, len(locations)
+
+def runJob(job, plan):
+    """
+    Gets the weather of a single job.
+
+    Parameters:
+        job (dict): A job returned by 'parseJob()', with coordinates.
+        plan (dict): The query plan of the job.
+
+    Returns:
+        dict: The weather information, as returned by the function of the 'WeatherInfoJunction' module of the job's mode.
+    """
+    if job['mode'] == 1:
+        # Option 0: not called from the main menu, so nothing is printed
+        return WeatherInfoJunction.weatherCities(job['dist'], job['lat'], job['lon'], 0, plan)
+    elif job['mode'] == 2:
+        return WeatherInfoJunction.weatherPoints(job['dist'], job['lat'], job['lon'], 2, job['spacing'], plan)
+    else:
+        return WeatherInfoJunction.weatherBoth(job['dist'], job['lat'], job['lon'], 3, plan)
+
+def forecastKey(job, plan):
+    """
+    Returns the key of the forecast in the records of a job, which tells its cities from its points in the columnar output formats.
+
+    Parameters:
+        job (dict): A job returned by 'parseJob()'.
+        plan (dict): The query plan of the job.
+
+    Returns:
+        str or dict: 'rain_forecast' for the cities mode, 'weather' for the points mode, or the key of each location of the plan
+        (see 'QueryPlan.planForecastKeys()') for the mode with both.
+    """
+    if job['mode'] == 1:
+        return 'rain_forecast'
+    elif job['mode'] == 2:
+        return 'weather'
+    else:
+        return QueryPlan.planForecastKeys(plan)
+
+def runBatch(filePath, outPath, lattice=False, maxWorkers=None, rainField=None, rainFieldLevel=RainField.LEVEL, fmt=None):
+    """
+    Runs every job of a file and writes the results to a JSON file, with the job names as keys.
+
+    Parameters:
+        filePath (str): Path of the jobs file (see 'readJobs()').
+        outPath (str): Path of the JSON file to write.
+        lattice (bool): If True, the points of every job are taken from the global lattice.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        rainField (str): Path of a rain field file (see 'RainField' module) to update with the results. If None, none is written.
+        rainFieldLevel (int): Lattice level of the rain field file, if it has to be created. An existing file keeps its level.
+        fmt (str): Format of the results file (see 'OutputFormats' module). If None, it is taken from the extension of 'outPath'.
+
+    Returns:
+        results (dict): A dictionary with the job names, as keys, and their weather information, as values.
+    """
+    jobs = resolveCenters(readJobs(filePath))
+    plans = [(job, QueryPlan.buildPlan(job['dist'], job['lat'], job['lon'], job['spacing'], lattice, job['coarse'])) for job in jobs]
+
+    total, unique = prefetch(plans, maxWorkers)
+    print(f"{len(plans)} jobs use {total} locations, {unique} of them unique.")
+
+    results = {job['name']: runJob(job, plan) for job, plan in plans}
+    OutputFormats.writeResult(results, outPath, fmt, {job['name']: forecastKey(job, plan) for job, plan in plans})
+
+    if rainField is not None:
+        if not os.path.exists(rainField):
+            RainField.createRainField(rainField, rainFieldLevel)
+
+        field = RainField.openRainField(rainField, writable=True)
+        try:
+            # A single update, so the readers see the results of every job at once
+            merged = {(job, name): record for job, weather in results.items() for name, record in weather.items()}
+            sequence = RainField.updateRainField(field, merged)
+        finally:
+            RainField.closeRainField(field)
+        print(f"Rain field '{rainField}' updated (sequence {sequence}).")
+
+    stats = HttpClient.connectionStats()
+    print(f"{stats['requests']} requests over {stats['opened']} connections. Results written to '{outPath}'.")
+
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gets the weather for every job of a CSV or JSON lines file.")
+    parser.add_argument('jobs', help="path of the jobs file")
+    parser.add_argument('-o', '--output', default='batchResults.json', help="path of the results file")
+    parser.add_argument('--format', default=None, choices=OutputFormats.FORMATS, help="format of the results file (default: from its extension)")
+    parser.add_argument('--lattice', action='store_true', help="take the points of every job from the global lattice")
+    parser.add_argument('--workers', type=int, default=None, help="maximum number of concurrent requests")
+    parser.add_argument('--calls-per-minute', type=float, default=None, help="calls-per-minute limit of the account (0 for no limit)")
+    parser.add_argument('--metrics', default=None, help="write the metrics of the run to this file (.json or Prometheus text)")
+    parser.add_argument('--profile', default=None, help="save a cProfile of the run to this file")
+    parser.add_argument('--rain-field', default=None, help="also update this memory-mapped rain field file with the results")
+    parser.add_argument('--rain-field-level', type=int, default=RainField.LEVEL, help="lattice level, in km, of a new rain field file")
+    args = parser.parse_args(argv)
+
+    if args.calls_per_minute is not None:
+        FetchEngine.setRateLimit(args.calls_per_minute or None)
+
+    try:
+        Metrics.runInstrumented(lambda: runBatch(args.jobs, args.output, args.lattice, args.workers, args.rain_field, args.rain_field_level,
+                                                   args.format),
+                                args.metrics, args.profile)
+    except (OSError, ValueError, ImportError) as e:
+        parser.exit(1, f"{e}\n")
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,21 @@
-import requests
-
-import MathOthers
+import FetchEngine
+import Metrics
+import QueryPlan
+import WeatherCache
 
 """
 This module provides functionality for fetching current weather data for cities or points based on their geographical coordinates. 
 It utilizes the OpenWeatherMap API to retrieve weather conditions, such as current rainfall, and associates this information 
 with the cities or points generated by the 'MathOthers' module.
 
-The module interacts with functions in the 'MathOthers' module to get a dictionary of cities or points and then 
-requests weather data (using 'requests' package) for each location, returning the results in a structured format (dictionary).
+The module gets a dictionary of cities or points from the query plan ('QueryPlan' and 'MathOthers' modules) and then 
+requests weather data (using the 'FetchEngine' module) for each location, returning the results in a structured format (dictionary).
 
 Notes:
     - Note that we are using the free subscription of the OpenWeatherMap API, which comes with certain restrictions on weather data availability.
+    - The requests are sent concurrently by the 'FetchEngine' module. The concurrency limit can be changed with the 'maxWorkers' parameter.
+    - The responses are kept in 'cache' (see 'WeatherCache' module) for 'CACHE_TTL' seconds, so repeated coordinates are not requested again.
+    It can be replaced, for example by a cache kept in a SQLite file: cache = WeatherCache.createCache(CACHE_TTL, dbPath='cache.sqlite').
 
 Functions in this module:
 
@@ -20,7 +24,13 @@ Functions in this module:
 
 """
 
-def curWeatherCities(dist,lat1,lon1):
+ENDPOINT = '/data/2.5/weather'
+CACHE_TTL = 600
+
+cache = WeatherCache.createCache(CACHE_TTL, maxSize=20000)
+Metrics.registerCache('current', cache)
+
+def curWeatherCities(dist,lat1,lon1,maxWorkers=None,plan=None):
 
     """
     Get current weather in the respective cities that were returned by getCities in mathModule.
@@ -29,30 +39,20 @@ def curWeatherCities(dist,lat1,lon1):
         dist (float): Distance in kilometers to determine the range of cities.
         lat1 (float): Latitude of the central point.
         lon1 (float): Longitude of the central point.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        plan (dict): Query plan of the request (see 'QueryPlan' module). If None, a new plan is built from the other parameters.
 
     Returns:
         cities (dict): A dictionary with city names, as keys, and current weather information, as values, including the coordinates calculated previously.
     """
-    base_url = 'https://api.openweathermap.org/data/2.5/weather'
-    api_key = '########################'
+    if plan is None:
+        plan = QueryPlan.buildPlan(dist, lat1, lon1)
 
-    cities = MathOthers.getCities(dist, lat1, lon1)
+    cities = QueryPlan.planCities(plan)
+    responses = FetchEngine.fetchAll(ENDPOINT, cities, maxWorkers, cache, FetchEngine.nearestFirst(plan['lat'], plan['lon']))
 
-    for city, coordinates in cities.items():
-        lat, lon = coordinates['coord']
-        
-        # Set up the parameters for the API request
-        paramsAdd = {
-            'lat': lat,
-            'lon': lon,
-            'appid': api_key,
-            'units': 'metric'
-        }
+    for city, weather_data in responses.items():
         try:
-            response = requests.get(base_url, params=paramsAdd)
-            response.raise_for_status()
-            weather_data = response.json()
-            
             rain_current = weather_data.get('rain', {}).get('1h', 0)
             cities[city]['rain_current'] = rain_current
             
@@ -62,7 +62,7 @@ def curWeatherCities(dist,lat1,lon1):
     
     return cities
 
-def curWeatherPoints(dist, lat1, lon1,radius_point):
+def curWeatherPoints(dist, lat1, lon1,radius_point,maxWorkers=None,plan=None):
     """
     Get current weather in the respective points that were returned by getPoints in mathModule.
 
@@ -71,31 +71,22 @@ def curWeatherPoints(dist, lat1, lon1,radius_point):
         lat1 (float): Latitude of the central location.
         lon1 (float): Longitude of the central location.
         radius_point (float): distance, in kilometers, between points
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        plan (dict): Query plan of the request (see 'QueryPlan' module). If None, a new plan is built from the other parameters.
 
     Returns:
         points (dict): A dictionary with the several points, as keys, and current weather information, as values, including the coordinates calculated previously.
     """
-    base_url = 'https://api.openweathermap.org/data/2.5/weather'
-    api_key = 'cd625bdba0ced920ac5b1dc2f68a634f'
-    
-    points = MathOthers.getPoints(dist, lat1, lon1, radius_point)
+    if plan is None:
+        plan = QueryPlan.buildPlan(dist, lat1, lon1, radius_point)
+
+    points = QueryPlan.planPoints(plan)
+    responses = FetchEngine.fetchAll(ENDPOINT, points, maxWorkers, cache, FetchEngine.nearestFirst(plan['lat'], plan['lon']))
     
-    for point, coordinates in points.items():
-        lat,lon = coordinates['coord']
-        
-        # Set up the parameters for the API request
-        paramsAdd = {
-            'lat': lat,
-            'lon': lon,
-            'appid': api_key,
-            'units': 'metric'
-        }
+    for point, weather_data in responses.items():
+        lat,lon = points[point]['coord']
         
         try:
-            response = requests.get(base_url, params=paramsAdd)
-            response.raise_for_status()
-            weather_data = response.json()
-            
             rain_info = weather_data.get('rain', {'1h': 0})
             points[point]['rain_current'] = rain_info.get('1h', 0)
         
@@ -1,11 +1,14 @@
 import requests
 
+import Geocoder
+
 """
 This module provides functions to gather geographical data, including distance, latitude, longitude, and city-specific coordinates,
 and it is used to gather information that can be passed to other functions in different modules, like Main module.
 
 The module interacts with users to obtain necessary inputs, validates those inputs, 
-and uses the OpenWeatherMap API (with 'requests' package) to convert city names and country codes into latitude and longitude coordinates.
+and converts city names and country codes into latitude and longitude coordinates with the 'Geocoder' module (the local cities file,
+or the OpenWeatherMap Geocoding API for the cities that are not in it).
 
 Functions in this module:
 
@@ -15,8 +18,10 @@ Functions in this module:
 - 'dataIntroduction()': Handles user choice between entering coordinates from a point in the globe, or specifying a location 
    using city name and country code. It then retrieves the respective geographical data (distance, latitude, longitude).
 - 'getCityUser()': Retrieves the latitude and longitude for a user-specified city using 
-   the OpenWeatherMap Geocoding API and validates country code input.
+   the 'Geocoder' module and validates country code input.
+- 'geocodeCity()': Converts a city name and country code into latitude and longitude, without user interaction.
 - 'is_alpha_space()': Validates if a string contains only alphabetic characters and spaces.
+- 'minDistPoints()': Returns the minimum distance between points allowed for a distance from the center point.
 - 'getDistPoints()': Calculates the optimal distance between points based on the distance from the center point, 
    ensuring it adheres to computational and practical constraints.
 """
@@ -128,9 +133,6 @@ def getCityUser():
         lat (float): The latitude of the city chosen by the user.
         lon (float): The longitude of the city chosen by the user.
     """
-    base_url = 'http://api.openweathermap.org/geo/1.0/direct?'
-    api_key = '#######################'
-
     while True:
         try:
 
@@ -147,26 +149,7 @@ def getCityUser():
                 else:
                     print("\nInput error. Please use a valid ISO 3166 country code.")
 
-            city_code = f'{city_name},{code}'
-
-            paramsAdd = {
-                'q': city_code,
-                'appid': api_key
-            }
-
-
-            response = requests.get(base_url, params=paramsAdd)
-            response.raise_for_status()
-            
-            data = response.json()
-
-            if len(data) == 0:
-                raise ValueError("No results returned from the API.")
-            
-            lat = data[0]['lat']
-            lon = data[0]['lon']
-
-            return lat, lon
+            return geocodeCity(city_name, code)
 
         except requests.exceptions.RequestException as e:
             print(f"\nError fetching data from API: {e}. Try again.")
@@ -174,6 +157,25 @@ def getCityUser():
         except (IndexError, KeyError, ValueError):
             print(f"\nError fetching coordinates for {city_name}. The city or country code might be invalid.")
 
+def geocodeCity(city_name, code):
+    """
+    Retrieves the latitude and longitude of a city, without asking the user. The cities of the cities file are found locally;
+    the others are requested from the OpenWeatherMap Geocoding API, and cached (see 'Geocoder' module).
+
+    Parameters:
+        city_name (str): The name of the city.
+        code (str): The country code of the city (ISO 3166 format).
+
+    Returns:
+        lat (float): The latitude of the city.
+        lon (float): The longitude of the city.
+
+    Raises:
+        requests.exceptions.RequestException: If the request to the API fails.
+        ValueError: If the API has no results for the city.
+    """
+    return Geocoder.geocode(city_name, code)
+
 def is_alpha_space(str):
     """
     Verifies if a string contains only letters or spaces.
@@ -186,6 +188,23 @@ def is_alpha_space(str):
     """
     return all(char.isalpha() or char.isspace() for char in str)
 
+def minDistPoints(dist):
+    """
+    Returns the minimum distance, in km, between points: 1/5 of the distance from the center point, and at least 10km
+    (see 'getDistPoints()').
+
+    Parameters:
+        dist (float): Distance, in km, from the center point.
+
+    Returns:
+        aux (int): Minimum distance, in km, between points.
+    """
+    aux = round(dist / 5)
+    if aux < 10:
+        aux = 10
+
+    return aux
+
 def getDistPoints(dist):
     """
     Get the distance, in km, between points.
@@ -205,9 +224,7 @@ def getDistPoints(dist):
     Returns:
         radius (float): Distance, in km, between points.
     """
-    aux = round(dist / 5)
-    if aux < 10:
-        aux = 10
+    aux = minDistPoints(dist)
 
     print(f"\nConsidering the proportion of 1/5 between the distance from the center point and the distance between points\n"
           f"and the minimum of 10km, the distance between points should be {aux} km or more.\n")
@@ -0,0 +1,335 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+
+import requests
+
+import HttpClient
+import MathOthers
+import Metrics
+import WeatherCache
+
+"""
+This module provides a concurrent fetch engine for the OpenWeatherMap requests made by the 'CurrentWeather' and 'ForecastWeather' modules.
+
+Fetching the weather of each location one after the other means that most of the execution time is spent waiting on the network.
+This module sends the requests from a pool of threads (using the 'concurrent.futures' package), so several locations
+are fetched at the same time, up to a configurable concurrency limit. The requests share the pooled connections of the 'HttpClient' module.
+
+Every request, from any thread, also goes through a single token bucket sized to the calls-per-minute limit of the account, so large
+grids are fetched at the maximum sustainable rate instead of being rejected. When the API answers 'Too Many Requests' (429) or
+a server error (5xx), the request is retried with exponential backoff; a 429 pauses every request for the time given in its
+'Retry-After' header. The locations are requested in priority order (for example, nearest to the center first), so the most
+important ones are fetched first when the rate is limited.
+
+Notes:
+    - The concurrency limit is set by 'MAX_WORKERS', or by the 'maxWorkers' parameter of 'fetchAll()'.
+    - The rate limit is set by 'CALLS_PER_MINUTE' (60 for the free subscription of the OpenWeatherMap API), with 'setRateLimit()'.
+    Use None for no limit (for example, against a local mock server).
+    - If a cache (see 'WeatherCache' module) is given to 'fetchAll()', locations with a valid cached response are not requested again.
+    - The latency and status of every request, and every retry, are recorded in the 'Metrics' module.
+
+Functions in this module:
+
+- 'setRateLimit()': Changes the calls-per-minute limit and the burst size of the token bucket.
+- 'acquireToken()': Waits until a request can be sent without exceeding the rate limit.
+- 'pauseRequests()': Stops every request for a number of seconds.
+- 'retryDelay()': Returns how long to wait before retrying a request.
+- 'nearestFirst()': Returns a priority function that requests the locations nearest to a center point first.
+- 'fetchOne()': Requests the weather data for a single pair of coordinates, retrying when rate-limited.
+- 'fetchAll()': Requests the weather data for every location of a dictionary, concurrently.
+- 'streamAll()': Requests several endpoints for every location and yields each location as soon as all its responses arrived.
+"""
+
+MAX_WORKERS = 8
+CALLS_PER_MINUTE = 60
+BURST = 10
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRY_STATUS = (429, 500, 502, 503, 504)
+STREAM_WINDOW = 4
+
+_bucket = {'lock': threading.Lock(), 'tokens': float(BURST), 'updated': time.monotonic(), 'pausedUntil': 0.0}
+
+def setRateLimit(callsPerMinute=None, burst=None):
+    """
+    Changes the rate limit of the requests and refills the token bucket.
+
+    Parameters:
+        callsPerMinute (float): Maximum number of calls per minute. Use a value slightly below the limit of the account, since the
+        requests reach the API with some jitter. If None, the requests are not limited.
+        burst (int): Number of requests that can be sent at once, after a pause. If None, 'BURST' is kept.
+
+    Returns:
+        None.
+    """
+    global CALLS_PER_MINUTE, BURST
+
+    with _bucket['lock']:
+        CALLS_PER_MINUTE = callsPerMinute
+        if burst is not None:
+            BURST = max(1, int(burst))
+
+        _bucket['tokens'] = float(BURST)
+        _bucket['updated'] = time.monotonic()
+
+def acquireToken():
+    """
+    Waits until a request can be sent without exceeding the rate limit, and takes a token from the bucket.
+    It also waits while the requests are paused by a 429 response.
+
+    Parameters:
+        None.
+
+    Returns:
+        None.
+    """
+    while True:
+        with _bucket['lock']:
+            now = time.monotonic()
+            delay = _bucket['pausedUntil'] - now
+
+            if delay <= 0:
+                if CALLS_PER_MINUTE is None:
+                    return
+
+                rate = CALLS_PER_MINUTE / 60
+                _bucket['tokens'] = min(BURST, _bucket['tokens'] + (now - _bucket['updated']) * rate)
+                _bucket['updated'] = now
+
+                if _bucket['tokens'] >= 1:
+                    _bucket['tokens'] -= 1
+                    return
+
+                delay = (1 - _bucket['tokens']) / rate
+
+        time.sleep(delay)
+
+def pauseRequests(seconds):
+    """
+    Stops every request (of every thread) for a number of seconds. The token bucket is emptied, so the requests restart at the
+    sustained rate instead of in a burst.
+
+    Parameters:
+        seconds (float): Length of the pause.
+
+    Returns:
+        None.
+    """
+    with _bucket['lock']:
+        _bucket['pausedUntil'] = max(_bucket['pausedUntil'], time.monotonic() + seconds)
+        _bucket['tokens'] = 0.0
+        _bucket['updated'] = _bucket['pausedUntil']
+
+def retryDelay(response, attempt):
+    """
+    Returns how long to wait before retrying a request: the 'Retry-After' header of the response, if there is one,
+    otherwise an exponential backoff with jitter. The delay is at most 'BACKOFF_MAX' seconds.
+
+    Parameters:
+        response (requests.Response): The failed response, or None if no response was received.
+        attempt (int): Number of the failed attempt (0 for the first one).
+
+    Returns:
+        float: The delay, in seconds.
+    """
+    header = response.headers.get('Retry-After') if response is not None else None
+
+    if header:
+        try:
+            return min(BACKOFF_MAX, max(0.0, float(header)))
+        except ValueError:
+            try:
+                return min(BACKOFF_MAX, max(0.0, parsedate_to_datetime(header).timestamp() - time.time()))
+            except (TypeError, ValueError):
+                pass
+
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+def nearestFirst(lat, lon):
+    """
+    Returns a priority function for 'fetchAll()' that requests the locations nearest to a center point first.
+
+    Parameters:
+        lat (float): Latitude of the center point.
+        lon (float): Longitude of the center point.
+
+    Returns:
+        function: Function of a (name, info) item of a locations dictionary, which returns its distance to the center point.
+    """
+    return lambda item: MathOthers.haversineDist((lat, lon), item[1]['coord'])
+
+def fetchOne(endpoint, lat, lon):
+    """
+    Requests the weather data for a single pair of coordinates. Each attempt waits for the rate limit; responses with a status in
+    'RETRY_STATUS', and connection errors, are retried up to 'MAX_RETRIES' times.
+
+    Parameters:
+        endpoint (str): Path of the OpenWeatherMap endpoint, for example '/data/2.5/weather'.
+        lat (float): Latitude of the location.
+        lon (float): Longitude of the location.
+
+    Returns:
+        dict: JSON response of the API.
+
+    Raises:
+        requests.exceptions.RequestException: If the request still fails after the retries.
+    """
+    paramsAdd = {
+        'lat': lat,
+        'lon': lon,
+        'units': 'metric'
+    }
+
+    for attempt in range(MAX_RETRIES + 1):
+        acquireToken()
+
+        start = time.perf_counter()
+        try:
+            response = HttpClient.get(endpoint, paramsAdd)
+        except requests.exceptions.RequestException:
+            Metrics.observeRequest(endpoint, time.perf_counter() - start, 'error')
+            if attempt == MAX_RETRIES:
+                raise
+
+            Metrics.countRetry(endpoint)
+            time.sleep(retryDelay(None, attempt))
+            continue
+
+        Metrics.observeRequest(endpoint, time.perf_counter() - start, response.status_code)
+        if response.status_code not in RETRY_STATUS or attempt == MAX_RETRIES:
+            break
+
+        Metrics.countRetry(endpoint)
+        if response.status_code == 429:
+            # The account is over its limit, so every thread waits, not only this one
+            pauseRequests(retryDelay(response, attempt))
+        else:
+            time.sleep(retryDelay(response, attempt))
+
+    response.raise_for_status()
+
+    with Metrics.span('parseJson'):
+        return response.json()
+
+def fetchAll(endpoint, locations, maxWorkers=None, cache=None, priority=None):
+    """
+    Requests the weather data for every location of a dictionary, using a pool of threads.
+
+    Parameters:
+        endpoint (str): Path of the OpenWeatherMap endpoint, for example '/data/2.5/weather'.
+        locations (dict): A dictionary with location names, as keys, and a dictionary with the 'coord' tuple, as values.
+        maxWorkers (int): Maximum number of requests in flight at the same time. If None, 'MAX_WORKERS' is used.
+        cache (dict): Cache created by 'WeatherCache.createCache()'. If None, every location is requested.
+        priority (function): Function of a (name, info) item of 'locations'; the locations with the lowest values are requested first
+        (see 'nearestFirst()'). If None, the locations are requested in their order.
+
+    Returns:
+        results (dict): A dictionary with the same keys (and order) as 'locations' and the JSON response, as values.
+        The value is None if the request failed.
+    """
+    if maxWorkers is None:
+        maxWorkers = MAX_WORKERS
+
+    results = {}
+    missing = {}
+
+    for name, info in locations.items():
+        results[name] = None
+
+        if cache is not None:
+            key = WeatherCache.cacheKey(endpoint, *info['coord'])
+            results[name] = WeatherCache.cacheGet(cache, key)
+
+        if results[name] is None:
+            missing[name] = info
+
+    if not missing:
+        return results
+
+    with Metrics.span(f'fetch:{endpoint}'), ThreadPoolExecutor(max_workers=max(1, int(maxWorkers))) as executor:
+        ordered = sorted(missing.items(), key=priority) if priority is not None else missing.items()
+        futures = {
+            name: executor.submit(fetchOne, endpoint, *info['coord'])
+            for name, info in ordered
+        }
+
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except (requests.exceptions.RequestException, ValueError):
+                continue
+
+            if cache is not None:
+                WeatherCache.cachePut(cache, WeatherCache.cacheKey(endpoint, *missing[name]['coord']), results[name])
+
+    return results
+
+def streamAll(locations, maxWorkers=None, priority=None):
+    """
+    Requests several endpoints for every location, using a pool of threads, and yields each location as soon as all its responses
+    arrived, so the caller can use it while the other requests are still in flight. Only 'STREAM_WINDOW' requests per worker are
+    queued at a time, so the memory used does not grow with the number of locations.
+
+    Parameters:
+        locations (dict): A dictionary with location names, as keys, and a dictionary with the 'coord' tuple and the list of
+        'endpoints' to request, as values.
+        maxWorkers (int): Maximum number of requests in flight at the same time. If None, 'MAX_WORKERS' is used.
+        priority (function): Function of a (name, info) item of 'locations'; the locations with the lowest values are requested first.
+
+    Yields:
+        tuple: (name, responses), where responses is a dictionary with the endpoints, as keys, and the JSON response, as values
+        (None if the request failed). The locations are yielded in the order in which they complete.
+    """
+    if maxWorkers is None:
+        maxWorkers = MAX_WORKERS
+
+    if not locations:
+        return
+
+    maxWorkers = max(1, int(maxWorkers))
+    ordered = iter(sorted(locations.items(), key=priority) if priority is not None else locations.items())
+    executor = ThreadPoolExecutor(max_workers=maxWorkers)
+    futures = {}
+    pending = {}
+    responses = {}
+
+    def submitMore():
+        for name, info in ordered:
+            pending[name] = len(info['endpoints'])
+            responses[name] = {}
+
+            # The requests of a location are queued together, so the location completes as soon as possible
+            for endpoint in info['endpoints']:
+                futures[executor.submit(fetchOne, endpoint, *info['coord'])] = (name, endpoint)
+
+            if len(futures) >= STREAM_WINDOW * maxWorkers:
+                return
+
+    try:
+        with Metrics.span('fetch:stream'):
+            submitMore()
+
+            while futures:
+                finished = wait(futures, return_when=FIRST_COMPLETED)[0]
+
+                for future in finished:
+                    name, endpoint = futures.pop(future)
+                    try:
+                        responses[name][endpoint] = future.result()
+                    except (requests.exceptions.RequestException, ValueError):
+                        responses[name][endpoint] = None
+
+                    pending[name] -= 1
+                    if pending[name] == 0:
+                        del pending[name]
+                        yield name, responses.pop(name)
+
+                submitMore()
+    finally:
+        # If the caller stops early, the requests that were not sent yet are cancelled
+        executor.shutdown(wait=True, cancel_futures=True)
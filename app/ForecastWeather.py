@@ -1,19 +1,30 @@
-import requests
+import time
 
-import MathOthers
+import numpy as np
+
+import FetchEngine
+import Metrics
+import QueryPlan
+import WeatherCache
 
 """
 This module provides functionality to retrieve weather forecasts for cities and points based on their geographical coordinates. 
 It interacts with the OpenWeatherMap API to gather forecast data, such as rainfall, for the next 3 and 6 hours* and associates this information 
 with cities or points generated by the 'MathOthers' module.
 
-The module relies on the 'MathOthers' module to obtain a dictionary of cities or points, then fetches weather forecast data 
-for each location using the OpenWeatherMap API and 'requests' package. The results are returned in a structured format (dictionary).
+The module relies on the query plan ('QueryPlan' and 'MathOthers' modules) to obtain a dictionary of cities or points, then fetches weather forecast data 
+for each location using the OpenWeatherMap API and the 'FetchEngine' module. The results are returned in a structured format (dictionary).
 
 Notes:
 
     - Note that we are using the free subscription of the OpenWeatherMap API, which comes with certain restrictions on weather data availability.
 
+    - The requests are sent concurrently by the 'FetchEngine' module. The concurrency limit can be changed with the 'maxWorkers' parameter.
+
+    - Each response contains the forecast for the next 5 days, in 3 hour slots. The whole forecast of each location is kept in 'store',
+    in a compact array, until the next 3 hour slot boundary. Any horizon (3h, 6h, ... 120h) can then be read from memory with
+    'getForecast()', or requested with the 'horizons' parameter, without new requests.
+
     *- The "next 3 and 6 hours" refer to specific times. 
     The OpenWeatherMap API only provides data for hours that are multiples of 3 and 6.
         Example: 
@@ -26,9 +37,21 @@ Functions in this module:
 - 'forWeatherCities()': Fetches weather forecast data for cities within a specified distance from a central location.
 - 'forWeatherPoints()': Retrieves weather forecast data for specific points within a grid around a central location.
 - 'parseWeatherInfo()': Parses weather forecast data for easy consumption in the final output.
+- 'compactForecast()': Converts a forecast response into a compact array of 3 hour slots.
+- 'checkHorizons()': Validates a list of forecast horizons.
+- 'forecastHorizons()': Reads the rain and probability of precipitation of some horizons from a compact forecast.
+- 'getForecasts()': Returns the compact forecast of each location, from 'store' or from the API.
+- 'getForecast()': Reads some horizons of the forecast of a location from 'store', without requests.
 """
 
-def forWeatherCities(dist, lat1, lon1):
+ENDPOINT = '/data/2.5/forecast'
+SLOT = 10800
+HORIZONS = (3, 6)
+
+store = WeatherCache.createCache(SLOT, maxSize=20000)
+Metrics.registerCache('forecast', store)
+
+def forWeatherCities(dist, lat1, lon1, maxWorkers=None, plan=None, horizons=None):
     """
     Get forecasted weather in the respective cities that were returned by getCities in mathModule.
 
@@ -36,60 +59,176 @@ def forWeatherCities(dist, lat1, lon1):
         dist (float): The distance in kilometers within which to search for cities.
         lat1 (float): Latitude of the center location.
         lon1 (float): Longitude of the center location.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        plan (dict): Query plan of the request (see 'QueryPlan' module). If None, a new plan is built from the other parameters.
+        horizons (tuple): Forecast horizons, in hours (multiples of 3, up to 120). If None, 'HORIZONS' is used.
 
     Returns:
         cities (dict): A dictionary with city names, as keys, and forecast weather information, as values, including the coordinates calculated previously.
     """
-    base_url = 'https://api.openweathermap.org/data/2.5/forecast'
-    api_key = '##########'
+    if plan is None:
+        plan = QueryPlan.buildPlan(dist, lat1, lon1)
 
-    cities = MathOthers.getCities(dist, lat1, lon1)
+    horizons = checkHorizons(horizons)
+    cities = QueryPlan.planCities(plan)
+    forecasts = getForecasts(cities, maxWorkers, FetchEngine.nearestFirst(plan['lat'], plan['lon']))
 
-    for city, coordinates in cities.items():
-        lat, lon = coordinates['coord']
-        paramsAdd = {
-            'lat': lat,
-            'lon': lon,
-            'appid': api_key,
-            'units': 'metric'
-        }
-        
+    for city, forecast in forecasts.items():
         try:
-            response = requests.get(base_url, params=paramsAdd)
-            response.raise_for_status()
-            weather_info = response.json()
-            cities[city]['rain_forecast'] = parseWeatherInfo(weather_info)
+            cities[city]['rain_forecast'] = forecastHorizons(forecast, horizons)
         except:
             print(f"Failed to fetch weather data for {city}")
     
     return cities
 
-def parseWeatherInfo(weatherInfo):
+def parseWeatherInfo(weatherInfo, horizons=None):
     """
     Parses weather information from the API response.
 
     Parameters:
         weatherInfo (dict): JSON response containing weather forecast data.
+        horizons (tuple): Forecast horizons, in hours. If None, 'HORIZONS' (the next 3 and 6 hours) is used.
 
     Returns:
         parsed_data (dict): Parsed weather information.
     """
 
+    return forecastHorizons(compactForecast(weatherInfo), horizons)
+
+def compactForecast(weatherInfo):
+    """
+    Converts a forecast response of the API into a compact array with one row per 3 hour slot.
+
+    Parameters:
+        weatherInfo (dict): JSON response containing weather forecast data.
+
+    Returns:
+        forecast (dict): A dictionary with the 'slots' array (fields 'dt', 'rain' and 'pop') and the time at which it 'expires',
+        which is the next 3 hour slot boundary.
+    """
+
+    variables = weatherInfo['list']
+    slots = np.zeros(len(variables), dtype=[('dt', 'i8'), ('rain', 'f8'), ('pop', 'f8')])
+
+    for i, slot in enumerate(variables):
+        slots[i] = (slot.get('dt', 0), slot.get('rain', {'3h': 0}).get('3h', 0), slot.get('pop', 0))
+
+    return {'slots': slots, 'expires': (time.time() // SLOT + 1) * SLOT}
+
+def checkHorizons(horizons=None):
+    """
+    Validates a list of forecast horizons.
+
+    Parameters:
+        horizons (tuple): Forecast horizons, in hours. If None, 'HORIZONS' is used.
+
+    Returns:
+        horizons (tuple): The validated horizons.
+    """
+
+    if horizons is None:
+        horizons = HORIZONS
+
+    for hours in horizons:
+        if hours % 3 != 0 or not 3 <= hours <= 120:
+            raise ValueError(f"Invalid forecast horizon: {hours}. It must be a multiple of 3, from 3 to 120 hours.")
+
+    return tuple(horizons)
+
+def forecastHorizons(forecast, horizons=None, now=None):
+    """
+    Reads the rain and the probability of precipitation of some horizons from a compact forecast.
+
+    Note:
+        The horizon of 3 hours is the slot of the next multiple of 3 hours after 'now', 6 hours is the slot after it, and so on.
+        The slots are chosen by their 'dt', not by their position, since the API may also return the slot that already started.
+
+    Parameters:
+        forecast (dict): A compact forecast returned by 'compactForecast()'.
+        horizons (tuple): Forecast horizons, in hours (multiples of 3, up to 120). If None, 'HORIZONS' is used.
+        now (float): Current time (as returned by 'time.time()'). If None, the current time is used.
+
+    Returns:
+        parsed_data (dict): A dictionary with the 'rain_<h>h' and 'percent_<h>h' values of each horizon (None if the forecast has
+        no slot for that horizon).
+    """
+    if now is None:
+        now = time.time()
+
     parsed_data = {}
-    # Range(2) means that we only want the next 3 and 6 hours of forecast weather for each city
-    for i in range(2):
-        index = 3 + 3 * i
-        rain_key = f'rain_{index}h'
-        percent_key = f'percent_{index}h'
-
-        variables = weatherInfo['list'][i]
-        rain_data = variables.get('rain', {'3h': 0})
-        parsed_data[rain_key] = rain_data['3h']
-        parsed_data[percent_key] = variables.get('pop',0)
-    
+    slots = forecast['slots']
+    boundary = (now // SLOT + 1) * SLOT
+
+    for hours in checkHorizons(horizons):
+        target = boundary + (hours - 3) * 3600
+        position = int(np.searchsorted(slots['dt'], target))
+
+        if position < len(slots) and slots['dt'][position] < target + SLOT:
+            parsed_data[f'rain_{hours}h'] = float(slots['rain'][position])
+            parsed_data[f'percent_{hours}h'] = float(slots['pop'][position])
+        else:
+            parsed_data[f'rain_{hours}h'] = None
+            parsed_data[f'percent_{hours}h'] = None
+
     return parsed_data
 
-def forWeatherPoints(dist,lat1,lon1,radius_point):
+def getForecasts(locations, maxWorkers=None, priority=None):
+    """
+    Returns the compact forecast of each location. Locations with a valid forecast in 'store' are not requested again.
+
+    Parameters:
+        locations (dict): A dictionary with location names, as keys, and a dictionary with the 'coord' tuple, as values.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        priority (function): Order in which the missing locations are requested (see 'FetchEngine.fetchAll()').
+
+    Returns:
+        forecasts (dict): A dictionary with the same keys as 'locations' and the compact forecast, as values (None if the request failed).
+    """
+
+    forecasts = {}
+    missing = {}
+
+    for name, info in locations.items():
+        forecasts[name] = WeatherCache.cacheGet(store, WeatherCache.cacheKey(ENDPOINT, *info['coord']))
+        if forecasts[name] is None:
+            missing[name] = info
+
+    if not missing:
+        return forecasts
+
+    for name, weather_info in FetchEngine.fetchAll(ENDPOINT, missing, maxWorkers, priority=priority).items():
+        try:
+            with Metrics.span('parseForecast'):
+                forecast = compactForecast(weather_info)
+        except (TypeError, KeyError, AttributeError, ValueError):
+            continue
+
+        WeatherCache.cachePut(store, WeatherCache.cacheKey(ENDPOINT, *missing[name]['coord']), forecast, forecast['expires'])
+        forecasts[name] = forecast
+
+    return forecasts
+
+def getForecast(lat, lon, horizons=None):
+    """
+    Reads some horizons of the forecast of a location from 'store', without requests.
+
+    Parameters:
+        lat (float): Latitude of the location.
+        lon (float): Longitude of the location.
+        horizons (tuple): Forecast horizons, in hours (multiples of 3, up to 120). If None, 'HORIZONS' is used.
+
+    Returns:
+        parsed_data (dict): A dictionary with the 'rain_<h>h' and 'percent_<h>h' values of each horizon,
+        or None if the location has no valid forecast in memory.
+    """
+
+    forecast = WeatherCache.cacheGet(store, WeatherCache.cacheKey(ENDPOINT, lat, lon))
+    if forecast is None:
+        return None
+
+    return forecastHorizons(forecast, horizons)
+
+def forWeatherPoints(dist,lat1,lon1,radius_point,maxWorkers=None,plan=None,horizons=None):
     
     """
     Get forecasted weather in the respective points that were returned by getPoints in mathModule.
@@ -99,32 +238,24 @@ def forWeatherPoints(dist,lat1,lon1,radius_point):
         lat1 (float): Latitude of the center location.
         lon1 (float): Longitude of the center location.
         radius_point (float): distance, in kilometers, between points.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        plan (dict): Query plan of the request (see 'QueryPlan' module). If None, a new plan is built from the other parameters.
+        horizons (tuple): Forecast horizons, in hours (multiples of 3, up to 120). If None, 'HORIZONS' is used.
 
     Returns:
         points (dict): A dictionary with the several points, as keys, and forecast weather information, as values, including the coordinates calculated previously.
     """
     
-    base_url = 'https://api.openweathermap.org/data/2.5/forecast?'
-    api_key = 'cd625bdba0ced920ac5b1dc2f68a634f'
-    
-    points = MathOthers.getPoints(dist,lat1,lon1,radius_point)
+    if plan is None:
+        plan = QueryPlan.buildPlan(dist, lat1, lon1, radius_point)
+
+    horizons = checkHorizons(horizons)
+    points = QueryPlan.planPoints(plan)
+    forecasts = getForecasts(points, maxWorkers, FetchEngine.nearestFirst(plan['lat'], plan['lon']))
     
-    for point,coordinates in points.items():
-        
-        lat,lon = coordinates['coord']
-        
-        paramsAdd = {
-            'lat': lat,
-            'lon': lon,
-            'appid': api_key,
-            'units': 'metric'
-        }
-        
+    for point,forecast in forecasts.items():
         try:
-            response = requests.get(base_url, params=paramsAdd)
-            response.raise_for_status()
-            weather_info = response.json()
-            points[point]['weather'] = parseWeatherInfo(weather_info)
+            points[point]['weather'] = forecastHorizons(forecast, horizons)
         except:
             print(f"Failed to fetch weather data for {point}")
         
@@ -0,0 +1,224 @@
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+
+import numpy as np
+
+import HttpClient
+import MathOthers
+import Metrics
+import WeatherCache
+
+"""
+This module converts city names and country codes into coordinates, without calling the API for the cities of the cities file.
+
+The first lookup builds a name index of the cities file ('worldcities.csv'): every city is found by its 'city' and 'city_ascii'
+names, normalized so the matching ignores case, accents and punctuation ('normalizeName()'), and filtered by its 'iso2' or 'iso3'
+country code. When several cities match, the most populated one is used. The index is built from the binary city database of the
+'MathOthers' module, so the CSV file is only parsed again when it changes.
+
+Only the names without a local match are sent to the OpenWeatherMap Geocoding API. Its answers are kept in a cache (see
+'WeatherCache' module) with a SQLite file ('CACHE_FILE'), so each name is requested once, even across runs.
+
+Notes:
+    - The index is built once per process and cities file. Batch runs that resolve many centers then cost a dictionary lookup each.
+    - If the cities file is missing or can't be read, every name goes to the API (and its cache).
+    - Coordinates change very rarely, so the cached answers expire after 'CACHE_TTL' (30 days).
+    - The API cache ('cache') is created on the first name without a local match, in 'CACHE_FILE' of the working directory.
+    It can be replaced before, for example by a cache that only lives in memory: Geocoder.cache = WeatherCache.createCache().
+
+Functions in this module:
+
+- 'normalizeName()': Normalizes a name for matching: no accents, lower case and single spaces.
+- 'loadNameIndex()': Builds the name index of a cities file once and keeps it in memory.
+- 'lookupCity()': Returns the coordinates of a city from the name index.
+- 'fetchCity()': Returns the coordinates of a city from the OpenWeatherMap Geocoding API.
+- 'geocode()': Returns the coordinates of a city, from the name index or, if not found, from the cached API.
+"""
+
+CITIES_FILE = "worldcities.csv"
+CACHE_FILE = "geocode.sqlite"
+CACHE_TTL = 30 * 24 * 3600
+ENDPOINT = '/geo/1.0/direct'
+
+_nameIndexes = {}
+cache = None
+_lock = threading.Lock()
+_SEPARATORS = re.compile(r'[\W_]+')
+
+def normalizeName(name):
+    """
+    Normalizes a name for matching: the accents are removed (Unicode NFKD decomposition), the letters are case-folded, and
+    punctuation and repeated spaces become single spaces. For example, 'Saint-Étienne' becomes 'saint etienne'.
+
+    Parameters:
+        name (str): A city name or a country code.
+
+    Returns:
+        str: The normalized name.
+    """
+    name = str(name)
+    if not name.isascii():
+        name = ''.join(char for char in unicodedata.normalize('NFKD', name) if not unicodedata.combining(char))
+    return ' '.join(_SEPARATORS.sub(' ', name.casefold()).split())
+
+def loadNameIndex(filePath=None):
+    """
+    Builds the name index of a cities file, and keeps it in memory. The index is only built the first time; the following calls
+    return the same index.
+
+    Note:
+        The columns come from the spatial index of 'MathOthers.loadCityIndex()', which memory-maps the binary city database
+        when it is up to date, so the CSV file is only parsed (with pandas) when it changes.
+
+    Parameters:
+        filePath (str): Path of the cities file. If None, 'CITIES_FILE' is used.
+
+    Returns:
+        index (dict): A dictionary with the city 'lat', 'lon', 'population', 'iso2' and 'iso3' (one value per city), and the 'names'
+        dictionary, with the normalized names, as keys, and the positions of the cities with that name, as values.
+
+    Raises:
+        FileNotFoundError: If neither the file nor its binary city database exist.
+        ValueError: If the file has no 'city', 'lat' and 'lng' columns.
+    """
+    if filePath is None:
+        filePath = CITIES_FILE
+
+    key = os.path.abspath(filePath)
+    if key in _nameIndexes:
+        return _nameIndexes[key]
+
+    cities = MathOthers.loadCityIndex(filePath)
+
+    with Metrics.span('loadNameIndex'):
+        positions = np.arange(len(cities['lat']))
+        names = {}
+        for position, (name, asciiName) in enumerate(zip(MathOthers.cityNames(cities, positions),
+                                                         MathOthers.cityNames(cities, positions, 'ascii'))):
+            variant = normalizeName(name) if name else None
+            if variant is not None:
+                names.setdefault(variant, []).append(position)
+            # Most 'city_ascii' names are the 'city' name itself, which is then only normalized once
+            if asciiName and asciiName != name:
+                asciiVariant = normalizeName(asciiName)
+                if asciiVariant != variant:
+                    names.setdefault(asciiVariant, []).append(position)
+
+    index = {
+        'lat': cities['lat'],
+        'lon': cities['lon'],
+        'population': cities['population'],
+        'iso2': [code.decode() for code in cities['iso2'].tolist()],
+        'iso3': [code.decode() for code in cities['iso3'].tolist()],
+        'names': names
+    }
+    _nameIndexes[key] = index
+
+    return index
+
+def lookupCity(name, code=None, index=None):
+    """
+    Returns the coordinates of a city from the name index, without calling the API.
+
+    Parameters:
+        name (str): Name of the city. Case, accents and punctuation are ignored.
+        code (str): Country code of the city (ISO 3166 alpha-2 or alpha-3). If None, the cities of every country match.
+        index (dict): Name index returned by 'loadNameIndex()'. If None, the index of 'CITIES_FILE' is used.
+
+    Returns:
+        tuple: (lat, lon) of the most populated matching city, or None if no city matches.
+    """
+    if index is None:
+        index = loadNameIndex()
+
+    positions = index['names'].get(normalizeName(name), [])
+    if code is not None and code.strip():
+        code = code.strip().upper()
+        positions = [position for position in positions if code in (index['iso2'][position], index['iso3'][position])]
+
+    if not positions:
+        return None
+
+    best = max(positions, key=lambda position: index['population'][position])
+    return float(index['lat'][best]), float(index['lon'][best])
+
+def fetchCity(name, code=None):
+    """
+    Returns the coordinates of a city from the OpenWeatherMap Geocoding API.
+
+    Parameters:
+        name (str): Name of the city.
+        code (str): Country code of the city (ISO 3166 format). If None, the API chooses the country.
+
+    Returns:
+        tuple: (lat, lon) of the first result.
+
+    Raises:
+        requests.exceptions.RequestException: If the request to the API fails.
+        ValueError: If the API has no results for the city.
+    """
+    query = name.strip() if code is None else f'{name.strip()},{code.strip()}'
+
+    response = HttpClient.get(ENDPOINT, {'q': query})
+    response.raise_for_status()
+
+    data = response.json()
+
+    if len(data) == 0:
+        raise ValueError("No results returned from the API.")
+
+    return data[0]['lat'], data[0]['lon']
+
+def _apiCache():
+    # The SQLite file is only created when a name is not found locally
+    global cache
+
+    with _lock:
+        if cache is None:
+            try:
+                cache = WeatherCache.createCache(CACHE_TTL, dbPath=CACHE_FILE)
+            except sqlite3.Error:
+                cache = WeatherCache.createCache(CACHE_TTL)
+            Metrics.registerCache('geocode', cache)
+
+    return cache
+
+def geocode(name, code=None, index=None):
+    """
+    Returns the coordinates of a city: from the name index if the city is in the cities file, otherwise from the API, whose
+    answers are cached in 'CACHE_FILE'.
+
+    Parameters:
+        name (str): Name of the city.
+        code (str): Country code of the city (ISO 3166 alpha-2 or alpha-3).
+        index (dict): Name index returned by 'loadNameIndex()'. If None, the index of 'CITIES_FILE' is used (if the file exists).
+
+    Returns:
+        tuple: (lat, lon) of the city.
+
+    Raises:
+        requests.exceptions.RequestException: If the request to the API fails.
+        ValueError: If the city isn't in the cities file and the API has no results for it.
+    """
+    if index is None:
+        try:
+            index = loadNameIndex()
+        except (OSError, ValueError):
+            index = None
+
+    if index is not None:
+        found = lookupCity(name, code, index)
+        if found is not None:
+            return found
+
+    key = f'{ENDPOINT}:{normalizeName(name)}:{normalizeName(code or "")}'
+
+    found = WeatherCache.cacheGet(_apiCache(), key)
+    if found is None:
+        found = fetchCity(name, code)
+        WeatherCache.cachePut(_apiCache(), key, list(found))
+
+    return tuple(found)
@@ -0,0 +1,120 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+"""
+This module provides the HTTP client shared by every module that calls the OpenWeatherMap API.
+
+All requests go through a single 'requests' session with a pool of keep-alive connections, so the TCP and TLS handshakes are
+paid once per connection instead of once per location. The client also keeps the API root URL and the API key in one place.
+
+Notes:
+    - 'POOL_SIZE' should be at least the concurrency limit of the 'FetchEngine' module, otherwise requests wait for a free connection.
+    - 'TIMEOUT' is a (connect, read) tuple, in seconds.
+
+Functions in this module:
+
+- 'configure()': Changes the API root, API key, pool size or timeouts, and resets the shared session.
+- 'getSession()': Returns the shared session, creating it if needed.
+- 'get()': Sends a GET request to an OpenWeatherMap endpoint using the shared session.
+- 'connectionStats()': Reports how many connections were opened and how many requests reused an open connection.
+"""
+
+API_ROOT = 'https://api.openweathermap.org'
+API_KEY = '########################'
+POOL_SIZE = 32
+TIMEOUT = (5, 30)
+
+_session = None
+_lock = threading.Lock()
+
+def configure(root=None, key=None, poolSize=None, timeout=None):
+    """
+    Changes the client settings and resets the shared session. Parameters left as None keep their current value.
+
+    Parameters:
+        root (str): Root URL of the API, for example 'https://api.openweathermap.org'.
+        key (str): OpenWeatherMap API key.
+        poolSize (int): Maximum number of connections kept open to the API.
+        timeout (tuple): (connect, read) timeouts, in seconds.
+
+    Returns:
+        None.
+    """
+    global API_ROOT, API_KEY, POOL_SIZE, TIMEOUT, _session
+
+    with _lock:
+        if root is not None:
+            API_ROOT = root.rstrip('/')
+        if key is not None:
+            API_KEY = key
+        if poolSize is not None:
+            POOL_SIZE = int(poolSize)
+        if timeout is not None:
+            TIMEOUT = timeout
+
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def getSession():
+    """
+    Returns the shared session, creating it on the first call.
+
+    Parameters:
+        None.
+
+    Returns:
+        session (requests.Session): Session with a pool of 'POOL_SIZE' keep-alive connections.
+    """
+    global _session
+
+    with _lock:
+        if _session is None:
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, pool_block=True)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+
+        return _session
+
+def get(path, params):
+    """
+    Sends a GET request to an OpenWeatherMap endpoint using the shared session. The API key is added to the parameters.
+
+    Parameters:
+        path (str): Path of the endpoint, for example '/data/2.5/weather'.
+        params (dict): Query parameters of the request.
+
+    Returns:
+        response (requests.Response): The response of the API.
+    """
+    paramsAdd = dict(params, appid=API_KEY)
+
+    return getSession().get(API_ROOT + path, params=paramsAdd, timeout=TIMEOUT)
+
+def connectionStats():
+    """
+    Reports how many connections were opened and how many requests reused an already open connection.
+
+    Parameters:
+        None.
+
+    Returns:
+        dict: A dictionary with the 'requests', 'opened' and 'reused' counters since the session was created.
+    """
+    opened = 0
+    sent = 0
+
+    if _session is not None:
+        for adapter in set(_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+                    sent += pool.num_requests
+
+    return {'requests': sent, 'opened': opened, 'reused': max(0, sent - opened)}
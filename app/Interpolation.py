@@ -0,0 +1,150 @@
+import numpy as np
+
+import ForecastWeather
+import MathOthers
+import Metrics
+
+"""
+This module provides the spatial interpolation of the weather, so a fine grid of points can be filled from the weather of a coarse
+grid of samples.
+
+Every grid point costs two requests to the API, so the number of requests of a dense grid grows with the square of its resolution.
+In the interpolation mode, only a coarse grid of samples is requested (see 'QueryPlan.planSamples()'), and the 'rain_current' and
+forecast values of each point of the fine grid are estimated by inverse distance weighting (IDW) of its nearest samples: each
+sample weighs 1 / distance ** 'POWER'. The number of requests then depends on the spacing of the samples, not on the resolution
+of the grid.
+
+Notes:
+    - The distances are great-circle distances, computed in blocks with the unit vectors of the points, like 'MathOthers.anyWithin()'.
+    - A point within 'EXACT_KM' of a sample takes the values of that sample, and is not flagged as interpolated.
+    - Samples whose requests failed are left out, value by value. If none of the nearest samples has a value, the value is missing.
+
+Functions in this module:
+
+- 'idwWeights()': Returns the nearest samples of each point and their weights.
+- 'interpolateValues()': Interpolates a matrix of sample values at the points.
+- 'interpolateGrid()': Fills a grid of points with the weather of the samples.
+"""
+
+NEIGHBOURS = 8
+POWER = 2
+EXACT_KM = 0.5
+DECIMALS = 2
+
+def idwWeights(points, samples, neighbours=NEIGHBOURS, power=POWER, chunk=4096):
+    """
+    Returns the nearest samples of each point and their inverse distance weights.
+
+    Parameters:
+        points (array-like): Latitude and longitude pairs, in degrees, with shape (n, 2).
+        samples (array-like): Latitude and longitude pairs, in degrees, with shape (m, 2).
+        neighbours (int): Number of samples used for each point.
+        power (float): Power of the distance in the weights.
+        chunk (int): Number of points compared at a time.
+
+    Returns:
+        tuple: (indexes, weights, exact), where 'indexes' and 'weights' have shape (n, k), with k = min(neighbours, m), and 'exact'
+        is True for the points within 'EXACT_KM' of a sample (only that sample has a weight).
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    samples = np.asarray(samples, dtype=float).reshape(-1, 2)
+    k = min(neighbours, len(samples))
+
+    indexes = np.zeros((len(points), k), dtype=np.int64)
+    weights = np.zeros((len(points), k))
+    exact = np.zeros(len(points), dtype=bool)
+    if k == 0:
+        return indexes, weights, exact
+
+    sampleXyz = MathOthers.toUnitVectors(samples[:, 0], samples[:, 1])
+
+    for start in range(0, len(points), chunk):
+        xyz = MathOthers.toUnitVectors(points[start:start + chunk, 0], points[start:start + chunk, 1])
+        dots = xyz @ sampleXyz.T
+
+        nearest = np.argpartition(-dots, k - 1, axis=1)[:, :k] if k < len(samples) else np.broadcast_to(np.arange(k), dots.shape)
+        dist = MathOthers.R * np.arccos(np.clip(np.take_along_axis(dots, nearest, axis=1), -1, 1))
+
+        close = dist < EXACT_KM
+        blockExact = close.any(axis=1)
+        blockWeights = np.where(blockExact[:, None], close, 1 / np.maximum(dist, EXACT_KM) ** power)
+
+        indexes[start:start + len(xyz)] = nearest
+        weights[start:start + len(xyz)] = blockWeights
+        exact[start:start + len(xyz)] = blockExact
+
+    return indexes, weights, exact
+
+def interpolateValues(values, indexes, weights):
+    """
+    Interpolates a matrix of sample values at the points, as the weighted mean of the values of their nearest samples.
+    Missing values (NaN) are left out of the mean.
+
+    Parameters:
+        values (numpy.ndarray): Values of the samples, with shape (m, f): one row per sample and one column per variable.
+        indexes (numpy.ndarray): Nearest samples of each point, with shape (n, k), from 'idwWeights()'.
+        weights (numpy.ndarray): Weights of the nearest samples, with shape (n, k), from 'idwWeights()'.
+
+    Returns:
+        numpy.ndarray: The interpolated values, with shape (n, f). NaN if none of the nearest samples has the value.
+    """
+    nearValues = values[indexes]
+    valid = ~np.isnan(nearValues)
+    nearWeights = weights[:, :, None] * valid
+
+    total = nearWeights.sum(axis=1)
+    weighted = (nearWeights * np.where(valid, nearValues, 0)).sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, weighted / total, np.nan)
+
+def interpolateGrid(samples, grid, horizons=None, neighbours=NEIGHBOURS, power=POWER):
+    """
+    Fills a grid of points with the weather of the samples.
+
+    Parameters:
+        samples (dict): The weather of the samples, as returned by 'WeatherInfoJunction.weatherPoints()'.
+        grid (dict): A dictionary with the 'lat' and 'lon' arrays of the points, and optionally their 'ids' (see 'MathOthers.getGrid()').
+        horizons (tuple): Forecast horizons, in hours. If None, 'ForecastWeather.HORIZONS' is used.
+        neighbours (int): Number of samples used for each point.
+        power (float): Power of the distance in the weights.
+
+    Returns:
+        forecast (dict): A dictionary with the points, as keys, and the same records as 'WeatherInfoJunction.weatherPoints()', as values,
+        with an 'interpolated' flag (False if the point is a sample).
+    """
+    fields = ['rain_current']
+    for hours in ForecastWeather.checkHorizons(horizons):
+        fields += [f'rain_{hours}h', f'percent_{hours}h']
+
+    # One row per sample; the values of the failed requests are NaN
+    values = np.full((len(samples), len(fields)), np.nan)
+    for row, record in enumerate(samples.values()):
+        forecast = record.get('weather') or {}
+        for column, field in enumerate(fields):
+            value = record.get(field) if column == 0 else forecast.get(field)
+            if value is not None:
+                values[row, column] = value
+
+    with Metrics.span('interpolate'):
+        sampleCoords = [record['coord'] for record in samples.values()]
+        indexes, weights, exact = idwWeights(np.column_stack((grid['lat'], grid['lon'])), sampleCoords, neighbours, power)
+        interpolated = np.round(interpolateValues(values, indexes, weights), DECIMALS)
+
+    names = grid.get('ids')
+    if names is None:
+        names = ['point' + str(pointIndex) for pointIndex in range(1, len(grid['lat']) + 1)]
+
+    results = {}
+    for name, lat, lon, row, isExact in zip(names, grid['lat'].tolist(), grid['lon'].tolist(), interpolated.tolist(), exact.tolist()):
+        record = {'coord': (lat, lon)}
+
+        # The forecast is missing, as for a failed request, if any of its values could not be interpolated
+        if not any(value != value for value in row[1:]):
+            record['weather'] = dict(zip(fields[1:], row[1:]))
+
+        record['rain_current'] = None if row[0] != row[0] else row[0]
+        record['interpolated'] = not isExact
+        results[name] = record
+
+    return results
@@ -0,0 +1,166 @@
+import math
+
+import numpy as np
+
+import MathOthers
+
+"""
+This module provides a global lattice of points, so that overlapping queries (and repeated runs) use exactly the same points.
+
+The grid of 'MathOthers.getGrid()' starts at the corner of each query, so two nearby queries produce points that never coincide
+and can't share cached weather. In the lattice, the points are fixed for the whole globe: the rows are 'radius_point' km apart,
+from pole to pole, and each row is divided into as many cells as fit at that latitude, so every cell has about the same area.
+Each cell has a stable ID, 'cell<level>_<row>_<col>', where the level is the distance between points rounded to whole kilometers.
+
+Notes:
+    - The lattice only depends on the level, so two queries with the same distance between points share every cell they have in common.
+    - A query returns the cells whose center is within the great-circle distance of the center point, so it works near the poles and
+    across the antimeridian.
+
+Functions in this module:
+
+- 'latticeLevel()': Returns the lattice level of a distance between points.
+- 'latticeShape()': Returns the number of rows and the number of cells of each row of a lattice.
+- 'cellCenter()': Returns the coordinates of the center of lattice cells.
+- 'snapToLattice()': Returns the lattice cell that contains each coordinate.
+- 'cellIds()': Builds the IDs of lattice cells.
+- 'getLatticeGrid()': Returns the lattice cells within a distance from a central location.
+"""
+
+def latticeLevel(radius_point):
+    """
+    Returns the lattice level of a distance between points, which is the distance rounded to whole kilometers (at least 1).
+
+    Parameters:
+        radius_point (float): distance, in km, between points.
+
+    Returns:
+        int: The lattice level.
+    """
+    return max(1, int(round(radius_point)))
+
+def latticeShape(level):
+    """
+    Returns the number of rows of a lattice and the number of cells of each row.
+
+    Parameters:
+        level (int): The lattice level (distance between points, in km).
+
+    Returns:
+        tuple: (rows (int), cells per row (numpy.ndarray), latitude step in degrees (float)).
+    """
+    rows = max(1, int(round(math.pi * MathOthers.R / level)))
+    step_lat = 180 / rows
+    row_lat = -90 + (np.arange(rows) + 0.5) * step_lat
+    columns = np.maximum(1, np.round(360 * np.cos(np.radians(row_lat)) / step_lat)).astype(np.int64)
+
+    return rows, columns, step_lat
+
+def cellCenter(level, row, col):
+    """
+    Returns the coordinates of the center of lattice cells, rounded to 4 decimals.
+
+    Parameters:
+        level (int): The lattice level.
+        row (array-like): Row index of each cell (0 is the southernmost row).
+        col (array-like): Column index of each cell (0 starts at longitude -180).
+
+    Returns:
+        tuple: (lat, lon) arrays with the coordinates of each cell.
+    """
+    rows, columns, step_lat = latticeShape(level)
+    row = np.asarray(row, dtype=np.int64)
+    col = np.asarray(col, dtype=np.int64)
+
+    lat = -90 + (row + 0.5) * step_lat
+    lon = -180 + (col + 0.5) * (360 / columns[row])
+
+    return np.round(lat, 4), np.round(lon, 4)
+
+def snapToLattice(level, lat, lon):
+    """
+    Returns the lattice cell that contains each coordinate.
+
+    Parameters:
+        level (int): The lattice level.
+        lat (array-like): Latitudes in degrees.
+        lon (array-like): Longitudes in degrees.
+
+    Returns:
+        tuple: (row, col) arrays with the indices of each cell.
+    """
+    rows, columns, step_lat = latticeShape(level)
+    lat = np.asarray(lat, dtype=float)
+    lon = (np.asarray(lon, dtype=float) + 180) % 360
+
+    row = np.clip(np.floor((lat + 90) / step_lat), 0, rows - 1).astype(np.int64)
+    col = np.floor(lon / (360 / columns[row])).astype(np.int64) % columns[row]
+
+    return row, col
+
+def cellIds(level, row, col):
+    """
+    Builds the IDs of lattice cells.
+
+    Parameters:
+        level (int): The lattice level.
+        row (array-like): Row index of each cell.
+        col (array-like): Column index of each cell.
+
+    Returns:
+        list: The 'cell<level>_<row>_<col>' ID of each cell.
+    """
+    return [f'cell{level}_{r}_{c}' for r, c in zip(np.asarray(row).tolist(), np.asarray(col).tolist())]
+
+def getLatticeGrid(dist, lat1, lon1, radius_point):
+    """
+    Returns the lattice cells whose center is within a distance from a central location.
+
+    Parameters:
+        dist (float): The distance in kilometers within which to select cells.
+        lat1 (float): Latitude of the central location.
+        lon1 (float): Longitude of the central location.
+        radius_point (float): distance, in km, between points. It is rounded to the lattice level.
+
+    Returns:
+        grid (dict): A dictionary with the 'lat' and 'lon' arrays of the cell centers, their 'row' and 'col' indices, the lattice
+        'level' and the cell 'ids', ordered from south to north and west to east.
+    """
+    level = latticeLevel(radius_point)
+    rows, columns, step_lat = latticeShape(level)
+    angle = dist / MathOthers.R
+    band = math.degrees(angle)
+
+    first = max(0, int(math.floor((lat1 - band + 90) / step_lat)))
+    last = min(rows - 1, int(math.floor((lat1 + band + 90) / step_lat)))
+    row_index = np.arange(first, last + 1)
+
+    # Candidate columns of each row: the cells within the widest longitude span of the circle (the whole row if it contains a pole)
+    step_lon = 360 / columns[row_index]
+    if abs(lat1) + band + step_lat >= 90:
+        span = np.full(len(row_index), 180.0)
+    else:
+        span = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat1)))) + step_lon
+    start = np.floor((lon1 - span + 180) / step_lon).astype(np.int64)
+    counts = np.minimum(columns[row_index], np.ceil(2 * span / step_lon).astype(np.int64) + 1)
+
+    row = np.repeat(row_index, counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    col = (np.repeat(start, counts) + offset) % columns[row]
+
+    lat, lon = cellCenter(level, row, col)
+    inside = MathOthers.toUnitVectors(lat, lon) @ MathOthers.toUnitVectors(lat1, lon1) >= math.cos(min(angle, math.pi))
+    row, col, lat, lon = row[inside], col[inside], lat[inside], lon[inside]
+
+    # The wrapped candidates of rows near the poles may repeat; keep each cell once, in lattice order
+    order = np.unique(row * int(columns.max()) + col, return_index=True)[1]
+    row, col, lat, lon = row[order], col[order], lat[order], lon[order]
+
+    return {
+        'lat': lat,
+        'lon': lon,
+        'row': row,
+        'col': col,
+        'level': level,
+        'ids': cellIds(level, row, col)
+    }
@@ -1,8 +1,12 @@
+import argparse
 from pprint import pprint
 
 import DataIntroduction
+import Metrics
 import WeatherInfoJunction
 import MathOthers
+import OutputFormats
+import QueryPlan
 
 """
 This module serves as the main entry point for the weather information system.It allows the user to choose different methods 
@@ -13,15 +17,23 @@ The module relies on input data handled by the 'DataIntroduction' module and pro
 from the 'WeatherInfoJunction' and 'MathOthers' modules.
 
 The main function in this module is 'getWeather()', which drives the user interaction.
+
+Usage:
+    python Main.py [--metrics FILE] [--profile FILE] [--format FORMAT]
+
+With '--metrics', the stage timings, request latencies and cache hit ratios of the run are written when the program exits
+(as JSON if FILE ends in '.json', otherwise in the Prometheus text format). With '--profile', a cProfile of the run is also saved.
+With '--format', each result is written to a file of that format (see 'OutputFormats' module), without asking the user.
 """
 
-def getWeather():
+def getWeather(fmt=None):
     """
     Receives the input data from the DataIntroduction module and gets weather 
     information based on the user's choice of how to obtain the data.
 
     Parameters:
-        none.
+        fmt (str): Output format of the result files (see 'OutputFormats' module). If None, the user is asked whether to write a
+        JSON file.
 
     Returns:
         None. It prints a dictionary containing weather information based on the user's choice.
@@ -46,19 +58,26 @@ def getWeather():
 
             if choice == '1':
                 aux = WeatherInfoJunction.weatherCities(dist, lat1, lon1, 1)
-                MathOthers.generateJson(aux)
+                MathOthers.generateJson(aux, fmt, forecastKey='rain_forecast')
                 pprint(aux)
             elif choice == '2':
                 aux = WeatherInfoJunction.weatherPoints(dist, lat1, lon1, 2, False)
-                MathOthers.generateJson(aux)
+                MathOthers.generateJson(aux, fmt, forecastKey='weather')
                 pprint(aux)
             else:
-                aux = WeatherInfoJunction.weatherBoth(dist, lat1, lon1, 3)
-                MathOthers.generateJson(aux)
+                # The plan tells the cities from the points, whose records look the same when a forecast request failed
+                plan = QueryPlan.buildPlan(dist, lat1, lon1)
+                aux = WeatherInfoJunction.weatherBoth(dist, lat1, lon1, 3, plan)
+                MathOthers.generateJson(aux, fmt, forecastKey=QueryPlan.planForecastKeys(plan))
                 pprint(aux)
         else:
             print("Invalid choice. Please, choose a valid option.\n")
 
 if __name__ == '__main__':
-    
-    getWeather()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Gets weather information for cities and points.")
+    parser.add_argument('--metrics', default=None, help="write the metrics of the run to this file (.json or Prometheus text)")
+    parser.add_argument('--profile', default=None, help="save a cProfile of the run to this file")
+    parser.add_argument('--format', default=None, choices=OutputFormats.FORMATS, help="write each result to a file of this format, without asking")
+    args = parser.parse_args()
+
+    Metrics.runInstrumented(lambda: getWeather(args.format), args.metrics, args.profile)
\ No newline at end of file
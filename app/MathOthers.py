@@ -1,29 +1,61 @@
+import contextlib
 import math
+import mmap
 import json
 import os
 
-import pandas as pd
+import numpy as np
+
+import Metrics
 
 """
 This module provides functions to calculate distances between geographical points, generate a grid of points within a specified distance, 
 and filter cities from a dataset based on proximity to a central location. 
 Additionally, it includes functionality to export the generated weather data to a JSON file.
 
-The 'MatheOthers' module makes use of several external libraries and built-in modules to handle mathematical calculations ('math' package), 
-file handling('os' and 'json' package), and data processing ('pandas' package).
+The 'MatheOthers' module makes use of several external libraries and built-in modules to handle mathematical calculations ('math' and 'numpy' packages), 
+file handling('os' and 'json' package), and data processing ('pandas' package, only to read the CSV file).
+
+The cities file is read only once per process and kept in memory as a spatial index: the cities are sorted by latitude and stored
+as unit vectors, so the cities within a great-circle distance are found by scanning only a narrow latitude band.
+This also gives correct results near the poles and across the antimeridian (longitude +180/-180).
+
+The first time the CSV file is read, the index is also saved as a binary city database next to it (a directory with the
+'CITY_DB_SUFFIX' suffix, see 'buildCityDatabase()'): one '.npy' file per column and the city names as UTF-8 blobs.
+The next processes memory-map these files instead of parsing the CSV file, so a short query neither imports pandas nor reads
+the whole table. The database is rebuilt when the CSV file changes.
 
 Functions in this module:
 
 - 'haversineDist()': Computes the distance between two latitude/longitude points using the Haversine formula.
+- 'haversineMany()': Computes the distance matrix between two lists of latitude/longitude points, using NumPy.
+- 'haversineWithin()': Returns only the pairs of points, from two lists, that are closer than a given distance.
+- 'anyWithin()': Checks, for each point of a list, if any point of another list is closer than a given distance.
 - 'getPoint_()': Calculates a new point's coordinates based on distance and bearing from a given starting point.
 - 'rangePoints()': Determines the latitude and longitude range for a given distance around a central point.
-- 'getCities()': Reads a CSV file with city data and filters cities within a given distance from a central point.
-- 'getPoints()': Generates a grid of points around a central location within a specified distance.
-- 'generateJson()': Exports weather-related information to a JSON file, based on the user's choice.
+- 'toUnitVectors()': Converts latitudes and longitudes into unit vectors (x, y, z) on the sphere.
+- 'buildCityDatabase()': Converts the CSV file with city data into the binary city database.
+- 'loadCityIndex()': Loads the spatial index of the cities once (from the binary city database, or from the CSV file) and keeps it in memory.
+- 'cityNames()': Returns the names of some cities of the spatial index.
+- 'citiesWithin()': Returns the cities of the spatial index within a given great-circle distance from a central point.
+- 'getCities()': Returns the cities within a given distance from a central point.
+- 'getGrid()': Generates a grid of points around a central location within a specified distance, as NumPy arrays.
+- 'gridToPoints()': Converts a grid generated by 'getGrid()' into a dictionary of points.
+- 'getPoints()': Generates a grid of points around a central location within a specified distance, as a dictionary.
+- 'writeJson()': Writes weather-related information to a JSON file, without user interaction.
+- 'writeStream()': Writes location records, one at a time as they arrive, as NDJSON or JSON text sequences.
+- 'generateJson()': Exports weather-related information to a JSON file, based on the user's choice, or to a file of a given format.
 
 """
 
 R = 6371
+CITIES_FILE = "worldcities.csv"
+CITY_DB_SUFFIX = ".citydb"
+CITY_DB_VERSION = 2
+CITY_DB_COLUMNS = ('lat', 'lon', 'xyz', 'rows', 'nameOffsets', 'asciiOffsets', 'population', 'iso2', 'iso3')
+CITY_DB_BLOBS = {'nameBlob': 'names.bin', 'asciiBlob': 'ascii.bin'}
+
+_cityIndexes = {}
 
 def haversineDist(point1,point2):
 
@@ -55,6 +87,98 @@ def haversineDist(point1,point2):
     distance = R * c
     return round(distance, 2)
 
+def haversineMany(points1, points2):
+
+    """
+    Calculate the Haversine distance between every point of a list and every point of another list, using NumPy.
+
+    Parameters:
+        points1 (array-like): Latitude and longitude pairs, in degrees, with shape (n, 2).
+        points2 (array-like): Latitude and longitude pairs, in degrees, with shape (m, 2).
+
+    Returns:
+        numpy.ndarray: A matrix with shape (n, m) containing the distances in kilometers, rounded as in 'haversineDist()'.
+    """
+
+    points1 = np.radians(np.asarray(points1, dtype=float).reshape(-1, 2))
+    points2 = np.radians(np.asarray(points2, dtype=float).reshape(-1, 2))
+
+    lat1 = points1[:, 0, None]
+    lon1 = points1[:, 1, None]
+    lat2 = points2[None, :, 0]
+    lon2 = points2[None, :, 1]
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(np.clip(1 - a, 0, None)))
+
+    return np.round(R * c, 2)
+
+def haversineWithin(points1, points2, dist, chunk=2048):
+
+    """
+    Returns the pairs of points, one from each list, whose Haversine distance is less than 'dist'.
+    The distance matrix is computed in blocks of 'chunk' rows, so large lists do not need the full matrix in memory.
+
+    Parameters:
+        points1 (array-like): Latitude and longitude pairs, in degrees, with shape (n, 2).
+        points2 (array-like): Latitude and longitude pairs, in degrees, with shape (m, 2).
+        dist (float): Distance in kilometers.
+        chunk (int): Number of rows of 'points1' compared at a time.
+
+    Returns:
+        tuple: (rows, cols, distances) arrays, where rows index 'points1', cols index 'points2' and distances are in kilometers.
+    """
+
+    points1 = np.asarray(points1, dtype=float).reshape(-1, 2)
+    rows, cols, distances = [], [], []
+
+    for start in range(0, len(points1), chunk):
+        block = haversineMany(points1[start:start + chunk], points2)
+        blockRows, blockCols = np.nonzero(block < dist)
+        rows.append(blockRows + start)
+        cols.append(blockCols)
+        distances.append(block[blockRows, blockCols])
+
+    if not rows:
+        return (np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0))
+
+    return (np.concatenate(rows), np.concatenate(cols), np.concatenate(distances))
+
+def anyWithin(points, others, dist, chunk=4096):
+
+    """
+    Checks, for each point of a list, if any point of another list is less than 'dist' kilometers away.
+
+    Note:
+        The points are compared as unit vectors (the great-circle distance is less than 'dist' when their dot product is greater
+        than cos(dist / R)), so a block of comparisons is a single matrix product.
+
+    Parameters:
+        points (array-like): Latitude and longitude pairs, in degrees, with shape (n, 2).
+        others (array-like): Latitude and longitude pairs, in degrees, with shape (m, 2). For example, the cities.
+        dist (float): Distance in kilometers.
+        chunk (int): Number of points compared at a time.
+
+    Returns:
+        numpy.ndarray: A boolean array with n values, True if the point has another point closer than 'dist'.
+    """
+
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    others = np.asarray(others, dtype=float).reshape(-1, 2)
+    mask = np.zeros(len(points), dtype=bool)
+
+    if len(points) == 0 or len(others) == 0:
+        return mask
+
+    pointsXyz = toUnitVectors(points[:, 0], points[:, 1])
+    othersXyz = toUnitVectors(others[:, 0], others[:, 1])
+    threshold = math.cos(min(dist / R, math.pi))
+
+    for start in range(0, len(points), chunk):
+        mask[start:start + chunk] = (pointsXyz[start:start + chunk] @ othersXyz.T > threshold).any(axis=1)
+
+    return mask
+
 def getPoint_(dist, brng, lat1, lon1):
     
     """
@@ -108,24 +232,33 @@ def rangePoints(dist, lat1, lon1):
     
     return (round(lat_max,4),round(lat_min,4),round(lon_max,4),round(lon_min,4))
 
-def getCities(dist,lat1,lon1):
+def toUnitVectors(lat, lon):
     """
-    Reads a file containing cities and their coordinates, and returns a dictionary
-    with cities within the specified distance from the given latitude and longitude.
+    Converts latitudes and longitudes into unit vectors on the sphere.
 
     Parameters:
-        dist (float): Distance in kilometers to determine the range of cities.
-        lat1 (float): Latitude of the central point.
-        lon1 (float): Longitude of the central point.
+        lat (array-like): Latitudes in degrees.
+        lon (array-like): Longitudes in degrees.
 
     Returns:
-        cities (dict): A dictionary with city names as keys and their coordinates as values.
+        numpy.ndarray: An array with shape (n, 3) containing the (x, y, z) coordinates of each point.
     """
-    filePath = "worldcities.csv"
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cosLat = np.cos(lat)
+
+    return np.stack((cosLat * np.cos(lon), cosLat * np.sin(lon), np.sin(lat)), axis=-1)
+
+def _readCityFile(filePath):
+    # pandas is only needed to parse the CSV file, so it is imported here and not when the module is loaded
+    import pandas as pd
 
-    # Read the CSV file
+    # Only the empty cells are missing values: 'NA' is the code of Namibia and 'Nan' is a city
+    wanted = {'city', 'city_ascii', 'lat', 'lng', 'iso2', 'iso3', 'population'}
     try:
-        df = pd.read_csv(filePath, usecols=['city', 'lat', 'lng'])
+        with Metrics.span('loadCityIndex'):
+            df = pd.read_csv(filePath, usecols=lambda column: column in wanted, keep_default_na=False,
+                             na_values={'lat': '', 'lng': '', 'population': ''})
     except FileNotFoundError:
         raise FileNotFoundError(f"The file at {filePath} was not found.")
     except pd.errors.EmptyDataError:
@@ -134,20 +267,286 @@ def getCities(dist,lat1,lon1):
         raise ValueError(f"The file at {filePath} is corrupted or improperly formatted.")
     except Exception:
         raise Exception(f"An unexpected error occurred while reading the file")
-    
-    # Get the range of latitudes and longitudes
+
+    if not {'city', 'lat', 'lng'} <= set(df.columns):
+        raise ValueError(f"The file at {filePath} has no 'city', 'lat' and 'lng' columns.")
+
+    return df
+
+def _encodeNames(names):
+    # The names are kept as a single UTF-8 blob, with the start of each name in the offsets (and the end of the blob last)
+    encoded = [str(name).encode() for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=offsets[1:])
+
+    return offsets, b''.join(encoded)
+
+def _indexFromTable(df):
+    lat = df['lat'].to_numpy(dtype=float)
+    lon = df['lng'].to_numpy(dtype=float)
+    order = np.argsort(lat, kind='stable')
+    column = lambda name, default: df[name].to_numpy(dtype=object)[order] if name in df.columns else [default] * len(order)
+
+    nameOffsets, nameBlob = _encodeNames(df['city'].to_numpy(dtype=object)[order])
+    asciiOffsets, asciiBlob = _encodeNames(column('city_ascii', ''))
+    population = df['population'].to_numpy(dtype=float)[order] if 'population' in df.columns else np.zeros(len(order))
+
+    # The country codes are ASCII, so they are kept as fixed-width byte strings, which can be memory-mapped
+    return {
+        'lat': lat[order],
+        'lon': lon[order],
+        'xyz': toUnitVectors(lat[order], lon[order]),
+        'rows': order,
+        'nameOffsets': nameOffsets,
+        'nameBlob': nameBlob,
+        'asciiOffsets': asciiOffsets,
+        'asciiBlob': asciiBlob,
+        'population': np.nan_to_num(population),
+        'iso2': np.array([str(code).upper().encode() for code in column('iso2', '')], dtype='S3'),
+        'iso3': np.array([str(code).upper().encode() for code in column('iso3', '')], dtype='S3')
+    }
+
+def _sourceStamp(filePath):
+    info = os.stat(filePath)
+    return {'version': CITY_DB_VERSION, 'size': info.st_size, 'mtime': info.st_mtime_ns}
+
+def _saveCityDatabase(index, dbPath, stamp):
+    os.makedirs(dbPath, exist_ok=True)
+
+    # The stamp is removed first and written last, so a partly written database is never used
+    metaPath = os.path.join(dbPath, 'meta.json')
+    if os.path.exists(metaPath):
+        os.remove(metaPath)
+
+    for column in CITY_DB_COLUMNS:
+        np.save(os.path.join(dbPath, column + '.npy'), index[column])
+    for blob, fileName in CITY_DB_BLOBS.items():
+        with open(os.path.join(dbPath, fileName), 'wb') as outfile:
+            outfile.write(index[blob])
+
+    with open(metaPath + '.tmp', 'w', encoding='utf-8') as outfile:
+        json.dump(dict(stamp, count=len(index['lat'])), outfile)
+    os.replace(metaPath + '.tmp', metaPath)
+
+def _loadCityDatabase(dbPath, stamp):
+    try:
+        with open(os.path.join(dbPath, 'meta.json'), encoding='utf-8') as infile:
+            meta = json.load(infile)
+    except (OSError, ValueError):
+        return None
+
+    # A database without its CSV file is used as is; otherwise it must have been built from the current file
+    if meta.get('version') != CITY_DB_VERSION or (stamp is not None and (meta.get('size'), meta.get('mtime')) != (stamp['size'], stamp['mtime'])):
+        return None
+
+    with Metrics.span('loadCityIndex'):
+        index = {column: np.load(os.path.join(dbPath, column + '.npy'), mmap_mode='r') for column in CITY_DB_COLUMNS}
+        for blob, fileName in CITY_DB_BLOBS.items():
+            offsets = index[blob.replace('Blob', 'Offsets')]
+            with open(os.path.join(dbPath, fileName), 'rb') as infile:
+                index[blob] = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) if offsets[-1] else b''
+
+    return index
+
+def buildCityDatabase(filePath=None, dbPath=None):
+    """
+    Converts a file containing cities and their coordinates into the binary city database, which 'loadCityIndex()' memory-maps
+    instead of parsing the CSV file. 'loadCityIndex()' already does this the first time it reads a CSV file, so this function
+    is only needed to prepare the database in advance (for example, when installing the program).
+
+    Note:
+        The database is a directory with the index columns ('lat', 'lon', 'xyz' unit vectors and the 'rows' of the file, sorted
+        by latitude) as '.npy' files, the 'city' and 'city_ascii' names as UTF-8 blobs ('names.bin' and 'ascii.bin', with their
+        'nameOffsets' and 'asciiOffsets'), the 'population', 'iso2' and 'iso3' columns used by the 'Geocoder' module, and a
+        'meta.json' file with the size and modification time of the CSV file it was built from.
+
+    Parameters:
+        filePath (str): Path of the CSV file. If None, 'CITIES_FILE' is used.
+        dbPath (str): Path of the database directory. If None, the CSV path with the 'CITY_DB_SUFFIX' suffix is used.
+
+    Returns:
+        dbPath (str): Path of the database directory.
+    """
+    if filePath is None:
+        filePath = CITIES_FILE
+    if dbPath is None:
+        dbPath = os.path.splitext(filePath)[0] + CITY_DB_SUFFIX
+
+    _saveCityDatabase(_indexFromTable(_readCityFile(filePath)), dbPath, _sourceStamp(filePath))
+    return dbPath
+
+def loadCityIndex(filePath=None):
+    """
+    Loads the cities and their coordinates as a spatial index, and keeps it in memory.
+    The cities are only loaded the first time; the following calls return the same index.
+
+    Note:
+        If the binary city database of the file exists and is up to date (see 'buildCityDatabase()'), it is memory-mapped.
+        Otherwise the CSV file is read and the database is saved for the next processes (if the directory is writable).
+
+    Parameters:
+        filePath (str): Path of the CSV file. If None, 'CITIES_FILE' is used.
+
+    Returns:
+        index (dict): A dictionary with the city 'lat' and 'lon' sorted by latitude, their unit vectors ('xyz'), their position in
+        the file ('rows'), their names (a UTF-8 'nameBlob', with the start of each name in 'nameOffsets', and the same for the
+        'city_ascii' names in 'asciiBlob' and 'asciiOffsets'), their 'population' and their 'iso2' and 'iso3' codes (as bytes).
+    """
+    if filePath is None:
+        filePath = CITIES_FILE
+
+    key = os.path.abspath(filePath)
+    if key in _cityIndexes:
+        return _cityIndexes[key]
+
+    dbPath = os.path.splitext(filePath)[0] + CITY_DB_SUFFIX
+    stamp = _sourceStamp(filePath) if os.path.exists(filePath) else None
+    index = _loadCityDatabase(dbPath, stamp)
+
+    if index is None:
+        index = _indexFromTable(_readCityFile(filePath))
+        try:
+            _saveCityDatabase(index, dbPath, stamp)
+        except OSError:
+            pass
+
+    _cityIndexes[key] = index
+
+    return index
+
+def cityNames(index, selected, column='name'):
+    """
+    Returns the names of some cities of the spatial index.
+
+    Parameters:
+        index (dict): Spatial index returned by 'loadCityIndex()'.
+        selected (array-like): Positions of the cities in the index.
+        column (str): 'name' for the 'city' names, or 'ascii' for the 'city_ascii' names.
+
+    Returns:
+        list: The names of the cities.
+    """
+    offsets = index[column + 'Offsets']
+    blob = index[column + 'Blob']
+    starts = offsets[selected].tolist()
+    ends = offsets[np.asarray(selected) + 1].tolist()
+
+    return [blob[start:end].decode() for start, end in zip(starts, ends)]
+
+def citiesWithin(dist, lat1, lon1, index=None):
+    """
+    Returns the cities of the spatial index within a great-circle distance from a central point.
+
+    Note:
+        Only the cities in the latitude band [lat1 - dist, lat1 + dist] are compared, so the query does not scan the whole table.
+        The distance is compared on the sphere, so there is no special case for the poles or the antimeridian.
+
+    Parameters:
+        dist (float): Distance in kilometers.
+        lat1 (float): Latitude of the central point.
+        lon1 (float): Longitude of the central point.
+        index (dict): Spatial index returned by 'loadCityIndex()'. If None, the index of 'CITIES_FILE' is used.
+
+    Returns:
+        cities (dict): A dictionary with city names as keys and their coordinates as values, in the order of the file.
+    """
+    if index is None:
+        index = loadCityIndex()
+
+    angle = dist / R
+    band = math.degrees(angle)
+    start = np.searchsorted(index['lat'], lat1 - band, side='left')
+    end = np.searchsorted(index['lat'], lat1 + band, side='right')
+
+    center = toUnitVectors(lat1, lon1)
+    inside = index['xyz'][start:end] @ center >= math.cos(min(angle, math.pi))
+    selected = np.flatnonzero(inside) + start
+    selected = selected[np.argsort(index['rows'][selected], kind='stable')]
+
+    names = cityNames(index, selected)
+    lats = index['lat'][selected].tolist()
+    lons = index['lon'][selected].tolist()
+
+    return {name: {'coord': (lat, lon)} for name, lat, lon in zip(names, lats, lons)}
+
+def getCities(dist,lat1,lon1):
+    """
+    Returns a dictionary with the cities within the specified distance from the given latitude and longitude.
+    The cities file is read only on the first call (see 'loadCityIndex()').
+
+    Parameters:
+        dist (float): Distance in kilometers to determine the range of cities.
+        lat1 (float): Latitude of the central point.
+        lon1 (float): Longitude of the central point.
+
+    Returns:
+        cities (dict): A dictionary with city names as keys and their coordinates as values.
+    """
+    return citiesWithin(dist, lat1, lon1)
+
+def getGrid(dist, lat1, lon1, radius_point):
+    """
+    Generates a grid of points within a specified distance from a central location, in a single NumPy pass.
+
+    Note:
+        The grid is the same as the one of the previous point-by-point generator: rows start at the northern limit and are
+        'radius_point' km apart, and the points of each row are 'radius_point' km apart, starting one step east of the western limit.
+        There is no minimum distance between points, so dense grids can be generated quickly.
+
+    Parameters:
+        dist (float): The distance in kilometers within which to generate points.
+        lat1 (float): Latitude of the central location.
+        lon1 (float): Longitude of the central location.
+        radius_point (float): distance, in km, between points.
+
+    Returns:
+        grid (dict): A dictionary with the 'lat' and 'lon' arrays of the points, ordered from north to south and west to east.
+    """
+    if radius_point <= 0:
+        raise ValueError("The distance between points must be greater than 0.")
+
     lat_max, lat_min, lon_max, lon_min = rangePoints(dist, lat1, lon1)
-    
-    # Filter the cities within the specified range
-    filtered_df = df[(df['lat'] >= lat_min) & (df['lat'] <= lat_max) & (df['lng'] >= lon_min) & (df['lng'] <= lon_max)]
-    
-    # Create the dictionary with city names and their coordinates
-    cities = {
-        row['city']: {'coord': (row['lat'], row['lng'])}
-        for _, row in filtered_df.iterrows()
+
+    # Coordinates are rounded to 4 decimals, so the grid is built in integer units of 0.0001 degrees
+    scale = 10 ** 4
+    angle = radius_point / R
+    step_lat = max(1, round(math.degrees(angle) * scale))
+    rows = (round(lat_max * scale) - round(lat_min * scale)) // step_lat + 1
+
+    # Latitude of each row and the longitude step, east, at that latitude (same formula as getPoint_ with bearing pi/2)
+    row_lat = (round(lat_max * scale) - step_lat * np.arange(rows)) / scale
+    phi = np.radians(row_lat)
+    phi2 = np.arcsin(np.sin(phi) * math.cos(angle))
+    step_lon = np.degrees(np.arctan2(math.sin(angle) * np.cos(phi), math.cos(angle) - np.sin(phi) * np.sin(phi2)))
+    step_lon = np.maximum(1, np.round(step_lon * scale)).astype(np.int64)
+
+    counts = (round(lon_max * scale) - round(lon_min * scale)) // step_lon + 1
+    row = np.repeat(np.arange(rows), counts)
+    column = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+
+    return {
+        'lat': row_lat[row],
+        'lon': (round(lon_min * scale) + column * step_lon[row]) / scale
+    }
+
+def gridToPoints(grid):
+    """
+    Converts a grid generated by 'getGrid()' into the dictionary of points used by the other modules.
+
+    Parameters:
+        grid (dict): A dictionary with the 'lat' and 'lon' arrays of the points, and optionally their 'ids'.
+
+    Returns:
+        points (dict): A dictionary with the point IDs (or 'point1', 'point2', ... if the grid has none) as keys and the coordinates of each point as values.
+    """
+    names = grid.get('ids')
+    if names is None:
+        names = ['point' + str(pointIndex) for pointIndex in range(1, len(grid['lat']) + 1)]
+
+    return {
+        name: {'coord': (lat, lon)}
+        for name, lat, lon in zip(names, grid['lat'].tolist(), grid['lon'].tolist())
     }
-    
-    return cities
 
 def getPoints(dist, lat1, lon1,radius_point):
     """
@@ -162,55 +561,101 @@ def getPoints(dist, lat1, lon1,radius_point):
     Returns:
         points (dict): A dictionary containing generated points with their coordinates.
     """
-    lat_max, lat_min, lon_max, lon_min = rangePoints(dist, lat1, lon1)
+    return gridToPoints(getGrid(dist, lat1, lon1, radius_point))
 
-    lat_control = lat_max
-    lon_control = lon_min
-    points = {}
-    pointIndex = 1
-    
-    # Generate points within the bounding box
-    while lat_min <= lat_control <= lat_max:
-        while lon_min <= lon_control <= lon_max:
-            point_key = 'point' + str(pointIndex)
-
-            lon_control = round(getPoint_(radius_point, math.pi/2, lat_control, lon_control)[1], 4)
-            points[point_key] = {'coord': (lat_control, lon_control)}
-            pointIndex += 1
-        
-        # Calculate the next latitude using the getPoint_ function
-        lat_control = round(getPoint_(radius_point, math.pi, lat_control, lon_min)[0], 4)
-        lon_control = lon_min
-    
-    return points
+def writeJson(dataDict, file_name):
+    """
+    Writes weather-related information to a JSON file, without asking the user.
 
-def generateJson(dataDict):
+    Parameters:
+        dataDict (dict): A dictionary containing the weather information (or a 'ResultStore.WeatherView').
+        file_name (str): Path of the file to write.
+
+    Returns:
+        None.
+    """
+    if not isinstance(dataDict, dict):
+        dataDict = dataDict.copy()
+
+    with Metrics.span('writeJson'), open(file_name, "w") as outfile:
+        json.dump(dataDict, outfile)
+
+def writeStream(records, outfile, fmt='ndjson'):
+    """
+    Writes location records one at a time, as they arrive, so the file can be read while it is being written and the records
+    don't have to be kept in memory. Each record is written as a JSON object with the location 'name' and its values.
+
+    Parameters:
+        records (iterable): (name, record) tuples, for example from 'WeatherInfoJunction.iterWeatherPoints()'.
+        outfile (str or file): Path of the file to write, or an open text file (for example, 'sys.stdout').
+        fmt (str): 'ndjson' (one object per line) or 'json-seq' (RFC 7464: each object starts with the record separator character).
+
+    Returns:
+        int: The number of records written.
+    """
+    if fmt not in ('ndjson', 'json-seq'):
+        raise ValueError(f"Unknown stream format: {fmt}. Use 'ndjson' or 'json-seq'.")
+
+    prefix = '\x1e' if fmt == 'json-seq' else ''
+    count = 0
+
+    with contextlib.ExitStack() as stack:
+        if isinstance(outfile, str):
+            outfile = stack.enter_context(open(outfile, 'w', encoding='utf-8'))
+
+        for name, record in records:
+            with Metrics.span('writeStream'):
+                outfile.write(prefix + json.dumps({'name': name, **record}) + '\n')
+                outfile.flush()
+            count += 1
+
+    return count
+
+def generateJson(dataDict, fmt=None, file_name=None, forecastKey=None):
     """
     Generates a file containing the weather information considering the user's choice.
+    If a format is given, the file is written without asking the user.
 
     Parameters:
         dataDict (dict): A dictionary containing all information related to the user's choice.
+        fmt (str): Output format (see 'OutputFormats' module), for example 'json.gz' or 'npz'. If None, the user is asked
+        whether to write a JSON file.
+        file_name (str): Path of the file to write. If None, 'weatherInfo' with the extension of the format is used, with a
+        number if the file exists.
+        forecastKey (str or dict): Key of the forecast of the locations, for the columnar formats (see 'OutputFormats.writeResult()').
 
     Returns:
         None.
     """
+    # Imported here because 'OutputFormats' imports this module indirectly (through 'ResultStore' and 'ForecastWeather')
+    import OutputFormats
+
+    if fmt is not None and fmt not in OutputFormats.FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}. Use one of {', '.join(OutputFormats.FORMATS)}.")
 
-    file_name = "weatherInfo.json"
+    extension = OutputFormats.EXTENSIONS[fmt or 'json']
     i = 0
 
+    if file_name is None:
+        file_name = f"weatherInfo{extension}"
+        while os.path.exists(file_name):
+            i += 1
+            file_name = f"weatherInfo({i}){extension}"
+
+    if fmt is not None:
+        OutputFormats.writeResult(dataDict, file_name, fmt, forecastKey)
+        print(f"\nFile '{file_name}' has been created successfully.\n\n")
+        return
+
     while True:
         choice = input("Do you want a JSON file with the weather information? (y/n):\n")
 
         if choice in ['y', 'n','Y','N']:
             if choice == 'y' or choice == 'Y':
-                while os.path.exists(file_name):
-                    i += 1
-                    file_name = f"weatherInfo({i}).json"
-                with open(file_name, "w") as outfile:
-                    json.dump(dataDict, outfile)
+                writeJson(dataDict, file_name)
                 print(f"\nFile '{file_name}' has been created successfully.\n\n")
                 return
             else:
                 return
         else:
-            print("\nInvalid answer. Please, select 'y' for yes and 'n' for no.\n\n")
\ No newline at end of file
+            print("\nInvalid answer. Please, select 'y' for yes and 'n' for no.\n\n")
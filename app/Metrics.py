@@ -0,0 +1,283 @@
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+import WeatherCache
+
+"""
+This module provides the instrumentation of a run: how long each stage takes, how long each request to the API takes and how it
+ended, and how well the caches work.
+
+The other modules record into this module as they run:
+
+- Stages (for example, 'loadCityIndex', 'cities', 'grid', 'fetch:<endpoint>', 'parseJson', 'landSeaFilter', 'writeJson', 'write:<format>') are timed with 'span()'.
+- Requests are recorded by the 'FetchEngine' module with 'observeRequest()', in a latency histogram per endpoint ('LATENCY_BUCKETS'
+  seconds), with a count per status code ('error' when no response was received), and retries with 'countRetry()'.
+- Caches (see 'WeatherCache' module) are registered with 'registerCache()', so their hit ratio is reported.
+
+At the end of a run, 'writeMetrics()' exports everything as a JSON summary or as a Prometheus text file (for the node exporter
+textfile collector). 'profiled()' also captures a cProfile of the run.
+
+Notes:
+    - The recording functions are thread-safe and cheap, so the instrumentation is always on.
+    - cProfile only profiles the thread that enabled it, so the requests sent by the worker threads of the 'FetchEngine' module show
+    up as time waiting in 'fetchAll()'; their latency is in the request histograms.
+
+Functions in this module:
+
+- 'span()': Context manager that records the time spent in a stage.
+- 'observeRequest()': Records the latency and the status of a request.
+- 'countRetry()': Records a retried request.
+- 'registerCache()': Registers a cache, so its counters are reported.
+- 'resetMetrics()': Removes every recorded value.
+- 'metricsSummary()': Returns every recorded value as a dictionary.
+- 'prometheusText()': Returns every recorded value in the Prometheus text format.
+- 'writeMetrics()': Writes the metrics to a JSON or Prometheus text file.
+- 'profiled()': Context manager that captures a cProfile of the code it runs.
+- 'runInstrumented()': Runs a function with the metrics and profile switches of the command line programs.
+"""
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+_stages = {}
+_requests = {}
+_retries = {}
+_caches = {}
+
+@contextmanager
+def span(stage):
+    """
+    Context manager that records the time spent in a stage. A stage can be entered many times (and from many threads);
+    the number of calls and the total time are kept.
+
+    Parameters:
+        stage (str): Name of the stage.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            info = _stages.setdefault(stage, {'calls': 0, 'seconds': 0.0})
+            info['calls'] += 1
+            info['seconds'] += elapsed
+
+def observeRequest(endpoint, seconds, status):
+    """
+    Records the latency and the status of a request.
+
+    Parameters:
+        endpoint (str): Path of the endpoint.
+        seconds (float): Time until the response was received.
+        status: HTTP status code (int), or 'error' if no response was received.
+
+    Returns:
+        None.
+    """
+    with _lock:
+        info = _requests.get(endpoint)
+        if info is None:
+            info = _requests[endpoint] = {'buckets': [0] * len(LATENCY_BUCKETS), 'count': 0, 'seconds': 0.0, 'status': {}}
+
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                info['buckets'][i] += 1
+                break
+
+        info['count'] += 1
+        info['seconds'] += seconds
+        info['status'][str(status)] = info['status'].get(str(status), 0) + 1
+
+def countRetry(endpoint):
+    """
+    Records a retried request.
+
+    Parameters:
+        endpoint (str): Path of the endpoint.
+
+    Returns:
+        None.
+    """
+    with _lock:
+        _retries[endpoint] = _retries.get(endpoint, 0) + 1
+
+def registerCache(name, cache):
+    """
+    Registers a cache, so its counters and hit ratio are reported.
+
+    Parameters:
+        name (str): Name of the cache in the reports.
+        cache (dict): A cache created by 'WeatherCache.createCache()'.
+
+    Returns:
+        None.
+    """
+    with _lock:
+        _caches[name] = cache
+
+def resetMetrics():
+    """
+    Removes every recorded value. The registered caches are kept.
+
+    Parameters:
+        None.
+
+    Returns:
+        None.
+    """
+    with _lock:
+        _stages.clear()
+        _requests.clear()
+        _retries.clear()
+
+def metricsSummary():
+    """
+    Returns every recorded value.
+
+    Parameters:
+        None.
+
+    Returns:
+        dict: A dictionary with the 'stages', 'requests' (with the latency 'histogram' and the mean latency), 'retries' and 'caches'
+        (see 'WeatherCache.cacheStats()').
+    """
+    with _lock:
+        caches = dict(_caches)
+        summary = {
+            'stages': {stage: dict(info) for stage, info in _stages.items()},
+            'requests': {},
+            'retries': dict(_retries),
+            'caches': {}
+        }
+
+        for endpoint, info in _requests.items():
+            summary['requests'][endpoint] = {
+                'count': info['count'],
+                'meanSeconds': info['seconds'] / info['count'] if info['count'] else 0.0,
+                'status': dict(info['status']),
+                'histogram': {str(bound): count for bound, count in zip(LATENCY_BUCKETS, info['buckets'])}
+            }
+            summary['requests'][endpoint]['histogram']['+Inf'] = info['count'] - sum(info['buckets'])
+
+    # The cache counters are read outside the lock, since each cache has its own
+    for name, cache in caches.items():
+        summary['caches'][name] = WeatherCache.cacheStats(cache)
+
+    return summary
+
+def prometheusText():
+    """
+    Returns every recorded value in the Prometheus text format.
+
+    Parameters:
+        None.
+
+    Returns:
+        str: The metrics, with the 'owm_' prefix.
+    """
+    summary = metricsSummary()
+    with _lock:
+        requests = {endpoint: (list(info['buckets']), info['count'], info['seconds']) for endpoint, info in _requests.items()}
+
+    lines = [
+        '# HELP owm_stage_seconds_total Time spent in each stage.',
+        '# TYPE owm_stage_seconds_total counter'
+    ]
+    lines += [f'owm_stage_seconds_total{{stage="{stage}"}} {info["seconds"]:.6f}' for stage, info in summary['stages'].items()]
+    lines += ['# HELP owm_stage_calls_total Number of times each stage ran.', '# TYPE owm_stage_calls_total counter']
+    lines += [f'owm_stage_calls_total{{stage="{stage}"}} {info["calls"]}' for stage, info in summary['stages'].items()]
+
+    lines += ['# HELP owm_request_seconds Latency of the requests to the API.', '# TYPE owm_request_seconds histogram']
+    for endpoint, (buckets, count, seconds) in requests.items():
+        total = 0
+        for bound, bucket in zip(LATENCY_BUCKETS, buckets):
+            total += bucket
+            lines.append(f'owm_request_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {total}')
+        lines.append(f'owm_request_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {count}')
+        lines.append(f'owm_request_seconds_sum{{endpoint="{endpoint}"}} {seconds:.6f}')
+        lines.append(f'owm_request_seconds_count{{endpoint="{endpoint}"}} {count}')
+
+    lines += ['# HELP owm_responses_total Responses of the API, by status code.', '# TYPE owm_responses_total counter']
+    for endpoint, info in summary['requests'].items():
+        lines += [f'owm_responses_total{{endpoint="{endpoint}",status="{status}"}} {count}' for status, count in info['status'].items()]
+
+    lines += ['# HELP owm_retries_total Retried requests.', '# TYPE owm_retries_total counter']
+    lines += [f'owm_retries_total{{endpoint="{endpoint}"}} {count}' for endpoint, count in summary['retries'].items()]
+
+    lines += ['# HELP owm_cache_hit_ratio Fraction of the cache lookups that were hits.', '# TYPE owm_cache_hit_ratio gauge']
+    lines += [f'owm_cache_hit_ratio{{cache="{name}"}} {info["hitRatio"]:.6f}' for name, info in summary['caches'].items()]
+    lines += ['# HELP owm_cache_lookups_total Cache lookups, by result.', '# TYPE owm_cache_lookups_total counter']
+    for name, info in summary['caches'].items():
+        lines.append(f'owm_cache_lookups_total{{cache="{name}",result="hit"}} {info["hits"]}')
+        lines.append(f'owm_cache_lookups_total{{cache="{name}",result="miss"}} {info["misses"]}')
+
+    return '\n'.join(lines) + '\n'
+
+def writeMetrics(filePath):
+    """
+    Writes the metrics to a file: a JSON summary if the name ends in '.json', otherwise the Prometheus text format.
+
+    Parameters:
+        filePath (str): Path of the file to write.
+
+    Returns:
+        None.
+    """
+    with open(filePath, 'w', encoding='utf-8') as outfile:
+        if filePath.lower().endswith('.json'):
+            json.dump(metricsSummary(), outfile, indent=4)
+        else:
+            outfile.write(prometheusText())
+
+@contextmanager
+def profiled(filePath=None, top=25):
+    """
+    Context manager that captures a cProfile of the code it runs. The profile is saved to a file (it can be read with 'pstats'
+    or 'snakeviz') and the functions with the highest cumulative time are printed.
+
+    Parameters:
+        filePath (str): Path of the profile file. If None, nothing is profiled.
+        top (int): Number of functions printed.
+    """
+    if filePath is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(filePath)
+
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(top)
+        print(report.getvalue())
+        print(f"Profile written to '{filePath}'.")
+
+def runInstrumented(function, metricsPath=None, profilePath=None):
+    """
+    Runs a function with the '--metrics' and '--profile' switches of the command line programs ('Main' and 'Batch' modules).
+
+    Parameters:
+        function (function): Function to run, without parameters.
+        metricsPath (str): Path of the metrics file, written at the end of the run (even if it fails). If None, no file is written.
+        profilePath (str): Path of the profile file. If None, nothing is profiled.
+
+    Returns:
+        The value returned by 'function'.
+    """
+    try:
+        with profiled(profilePath):
+            return function()
+    finally:
+        if metricsPath is not None:
+            writeMetrics(metricsPath)
+            print(f"Metrics written to '{metricsPath}'.")
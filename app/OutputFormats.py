@@ -0,0 +1,254 @@
+import gzip
+import json
+
+import numpy as np
+
+import Metrics
+import ResultStore
+
+"""
+This module writes and reads the weather results in several file formats, chosen by name or by the file extension:
+
+- 'json': JSON text, with the standard library (the format of 'MathOthers.writeJson()').
+- 'orjson': the same JSON text, encoded with the 'orjson' package, several times faster.
+- 'json.gz': gzip compressed JSON.
+- 'json.zst': Zstandard compressed JSON (needs the 'zstandard' package).
+- 'npz': the columns of a result store (see 'ResultStore' module) and the location names, in a NumPy '.npz' file.
+- 'parquet': the same columns, and the names, in a Parquet file (needs the 'pyarrow' package).
+
+The JSON formats keep the structure of the result dictionaries. The columnar formats ('npz' and 'parquet') keep one row per location,
+so they are much smaller and faster to read for large grids, and they are read back as 'ResultStore.WeatherView' objects.
+A result of 'Batch.runBatch()' (a dictionary with the job names, as keys, and a weather result, as values) is written with an extra
+'job' column, and read back as a dictionary of views.
+
+Notes:
+    - The compressed JSON formats use 'orjson' when it is installed, and the standard library otherwise.
+    - The optional packages are imported only when their format is used. If one is missing, an 'ImportError' says which package
+    to install.
+    - The columnar formats keep the forecast horizons of the store ('ForecastWeather.HORIZONS' for dictionaries).
+
+Functions in this module:
+
+- 'formatFromPath()': Returns the format of a file, from its extension.
+- 'writeResult()': Writes a weather result (or a batch result) to a file.
+- 'readResult()': Reads a file written by 'writeResult()'.
+"""
+
+FORMATS = ('json', 'orjson', 'json.gz', 'json.zst', 'npz', 'parquet')
+JSON_FORMATS = ('json', 'orjson', 'json.gz', 'json.zst')
+EXTENSIONS = {'json': '.json', 'orjson': '.json', 'json.gz': '.json.gz', 'json.zst': '.json.zst', 'npz': '.npz', 'parquet': '.parquet'}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+def _requirePackage(name, fmt):
+    # The optional packages are imported only when their format is used
+    try:
+        return __import__(name)
+    except ImportError:
+        raise ImportError(f"The '{fmt}' format needs the '{name}' package. Install it with 'pip install {name}'.") from None
+
+def _dumpJson(dataDict):
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(dataDict).encode()
+    return orjson.dumps(dataDict, option=orjson.OPT_SERIALIZE_NUMPY)
+
+def _loadJson(data):
+    try:
+        import orjson
+    except ImportError:
+        return json.loads(data)
+    return orjson.loads(data)
+
+def _isBatch(dataDict):
+    first = next(iter(dataDict.values()), None)
+    return isinstance(first, (dict, ResultStore.WeatherView)) and 'coord' not in first
+
+def _columnTable(dataDict, forecastKey=None):
+    # One structured array of rows, the location names and, for a batch result, the job of each row
+    if not _isBatch(dataDict):
+        store = dataDict.store if isinstance(dataDict, ResultStore.WeatherView) else ResultStore.fromWeather(dataDict, forecastKey=forecastKey).store
+        return store['rows'][:store['count']], store['names'], None
+
+    tables, names, jobs = [], [], []
+    for job, weather in dataDict.items():
+        rows, jobNames, _ = _columnTable(weather, None if forecastKey is None else forecastKey[job])
+        tables.append(rows)
+        names += jobNames
+        jobs += [job] * len(jobNames)
+
+    return np.concatenate(tables), names, jobs
+
+def _viewFromColumns(rows, names):
+    horizons = [int(name[len('rain_'):-1]) for name in rows.dtype.names if name.startswith('rain_') and name != 'rain_current']
+    store = ResultStore.createStore(horizons, capacity=len(names))
+
+    store['rows'][:len(names)] = rows
+    store['names'] = list(names)
+    store['index'] = {name: row for row, name in enumerate(store['names'])}
+    store['count'] = len(names)
+
+    return ResultStore.WeatherView(store)
+
+def _viewsFromColumns(rows, names, jobs):
+    if jobs is None:
+        return _viewFromColumns(rows, names)
+
+    jobs = np.asarray(jobs)
+    result = {}
+    for job in dict.fromkeys(jobs.tolist()):
+        selected = np.flatnonzero(jobs == job)
+        result[job] = _viewFromColumns(rows[selected], [names[row] for row in selected.tolist()])
+    return result
+
+def _writeNpz(dataDict, filePath, forecastKey=None):
+    rows, names, jobs = _columnTable(dataDict, forecastKey)
+    arrays = {'rows': rows, 'names': np.array(names, dtype=str)}
+    if jobs is not None:
+        arrays['jobs'] = np.array(jobs, dtype=str)
+
+    with open(filePath, 'wb') as outfile:
+        np.savez(outfile, **arrays)
+
+def _readNpz(filePath):
+    with np.load(filePath) as data:
+        jobs = data['jobs'].tolist() if 'jobs' in data.files else None
+        return _viewsFromColumns(data['rows'], data['names'].tolist(), jobs)
+
+def _writeParquet(dataDict, filePath, forecastKey=None):
+    _requirePackage('pyarrow', 'parquet')
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows, names, jobs = _columnTable(dataDict, forecastKey)
+    table = {'name': pa.array(names, type=pa.string())}
+    if jobs is not None:
+        table['job'] = pa.array(jobs, type=pa.string())
+    for column in rows.dtype.names:
+        table[column] = pa.array(rows[column])
+
+    pq.write_table(pa.table(table), filePath)
+
+def _readParquet(filePath):
+    _requirePackage('pyarrow', 'parquet')
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(filePath)
+    names = table.column('name').to_pylist()
+    jobs = table.column('job').to_pylist() if 'job' in table.column_names else None
+
+    columns = [column for column in table.column_names if column not in ('name', 'job')]
+    horizons = [int(column[len('rain_'):-1]) for column in columns if column.startswith('rain_') and column != 'rain_current']
+    rows = np.zeros(len(names), dtype=ResultStore.createStore(horizons, capacity=1)['rows'].dtype)
+    for column in columns:
+        rows[column] = table.column(column).to_numpy()
+
+    return _viewsFromColumns(rows, names, jobs)
+
+def formatFromPath(filePath):
+    """
+    Returns the format of a file, from its extension.
+
+    Parameters:
+        filePath (str): Path of the file.
+
+    Returns:
+        str: One of 'FORMATS'. Files with an unknown extension are 'json'.
+    """
+    lower = filePath.lower()
+    for fmt in ('json.gz', 'json.zst', 'npz', 'parquet'):
+        if lower.endswith(EXTENSIONS[fmt]):
+            return fmt
+    return 'json'
+
+def writeResult(dataDict, filePath, fmt=None, forecastKey=None):
+    """
+    Writes a weather result, or a batch result, to a file.
+
+    Parameters:
+        dataDict (dict): A result of a 'WeatherInfoJunction' function (or a 'ResultStore.WeatherView'), or a dictionary with job
+        names, as keys, and such results, as values.
+        filePath (str): Path of the file to write.
+        fmt (str): One of 'FORMATS'. If None, it is taken from the file extension ('formatFromPath()').
+        forecastKey (str or dict): Key of the forecast of the locations, which gives their 'kind' in the columnar formats (see
+        'ResultStore.fromWeather()'). For a batch result, a dictionary with the key of each job. If None, it is taken from the
+        records, so a city whose forecast request failed is written as a point.
+
+    Returns:
+        None.
+
+    Raises:
+        ValueError: If the format is unknown.
+        ImportError: If the format needs a package that is not installed.
+    """
+    fmt = formatFromPath(filePath) if fmt is None else fmt
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}. Use one of {', '.join(FORMATS)}.")
+
+    # The JSON encoders need dictionaries, not the views of the columnar mode
+    if fmt in JSON_FORMATS:
+        if not isinstance(dataDict, dict):
+            dataDict = dataDict.copy()
+        if _isBatch(dataDict):
+            dataDict = {job: weather if isinstance(weather, dict) else weather.copy() for job, weather in dataDict.items()}
+
+    with Metrics.span(f'write:{fmt}'):
+        if fmt == 'json':
+            with open(filePath, 'w') as outfile:
+                json.dump(dataDict, outfile)
+        elif fmt == 'orjson':
+            orjson = _requirePackage('orjson', fmt)
+            with open(filePath, 'wb') as outfile:
+                outfile.write(orjson.dumps(dataDict, option=orjson.OPT_SERIALIZE_NUMPY))
+        elif fmt == 'json.gz':
+            with gzip.open(filePath, 'wb', compresslevel=GZIP_LEVEL) as outfile:
+                outfile.write(_dumpJson(dataDict))
+        elif fmt == 'json.zst':
+            zstandard = _requirePackage('zstandard', fmt)
+            with open(filePath, 'wb') as outfile:
+                outfile.write(zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(_dumpJson(dataDict)))
+        elif fmt == 'npz':
+            _writeNpz(dataDict, filePath, forecastKey)
+        else:
+            _writeParquet(dataDict, filePath, forecastKey)
+
+def readResult(filePath, fmt=None):
+    """
+    Reads a file written by 'writeResult()'.
+
+    Parameters:
+        filePath (str): Path of the file.
+        fmt (str): One of 'FORMATS'. If None, it is taken from the file extension.
+
+    Returns:
+        dict: The result. The JSON formats give dictionaries (with the coordinates as lists); the columnar formats give a
+        'ResultStore.WeatherView' (or, for a batch result, a dictionary of views).
+
+    Raises:
+        ValueError: If the format is unknown.
+        ImportError: If the format needs a package that is not installed.
+    """
+    fmt = formatFromPath(filePath) if fmt is None else fmt
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}. Use one of {', '.join(FORMATS)}.")
+
+    with Metrics.span(f'read:{fmt}'):
+        if fmt == 'json':
+            with open(filePath) as infile:
+                return json.load(infile)
+        elif fmt == 'orjson':
+            orjson = _requirePackage('orjson', fmt)
+            with open(filePath, 'rb') as infile:
+                return orjson.loads(infile.read())
+        elif fmt == 'json.gz':
+            with gzip.open(filePath, 'rb') as infile:
+                return _loadJson(infile.read())
+        elif fmt == 'json.zst':
+            zstandard = _requirePackage('zstandard', fmt)
+            with open(filePath, 'rb') as infile:
+                return _loadJson(zstandard.ZstdDecompressor().decompress(infile.read()))
+        elif fmt == 'npz':
+            return _readNpz(filePath)
+        else:
+            return _readParquet(filePath)
@@ -0,0 +1,162 @@
+import Lattice
+import MathOthers
+import Metrics
+
+"""
+This module provides the query plan, which holds the locations of a single user request (center point, distances,
+cities and grid points), so they are computed once and shared by every function that needs them.
+
+Without a plan, each of the 'CurrentWeather', 'ForecastWeather' and 'WeatherInfoJunction' functions calls 'MathOthers.getCities()'
+and 'MathOthers.getPoints()' on its own, reading the cities file and building the grid several times for the same request.
+
+Notes:
+    - A plan is a dictionary. The cities and points are only computed the first time they are needed.
+    - In lattice mode, the grid points are the cells of the global lattice of the 'Lattice' module instead of a grid built from
+    the center point, so overlapping queries share points (and cached weather).
+    - In interpolation mode ('coarse_point'), only the samples of a coarser grid are fetched, and the grid points are interpolated
+    from them (see 'Interpolation' module).
+    - The functions that fetch weather add information to the location dictionaries, so 'planCities()' and 'planPoints()'
+    return copies, leaving the plan unchanged.
+
+Functions in this module:
+
+- 'buildPlan()': Creates the query plan for a center point, a distance and (optionally) a distance between points.
+- 'planCities()': Returns the cities of a plan, resolving them on the first call.
+- 'planGrid()': Returns the grid of a plan as NumPy arrays, generating it on the first call.
+- 'planPoints()': Returns the grid points of a plan as a dictionary.
+- 'planSamples()': Returns the samples of a plan in interpolation mode, whose weather is fetched to interpolate the grid points.
+- 'planForecastKeys()': Returns the key of the forecast in the record of each location of a plan.
+"""
+
+def buildPlan(dist, lat1, lon1, radius_point=None, lattice=False, coarse_point=None):
+    """
+    Creates the query plan for a center point.
+
+    Parameters:
+        dist (float): Distance in kilometers from the center point.
+        lat1 (float): Latitude of the center point.
+        lon1 (float): Longitude of the center point.
+        radius_point (float): Distance, in kilometers, between points. Only needed if grid points are used.
+        lattice (bool): If True, the grid points are the cells of the global lattice (see 'Lattice' module).
+        coarse_point (float): Distance, in kilometers, between the samples of the interpolation mode. If None, every grid point is fetched.
+
+    Returns:
+        plan (dict): A dictionary with the request parameters. The 'cities', 'grid', 'points' and 'samples' entries are filled when first needed.
+    """
+    return {
+        'dist': dist,
+        'lat': lat1,
+        'lon': lon1,
+        'radius_point': radius_point,
+        'lattice': lattice,
+        'coarse_point': coarse_point,
+        'cities': None,
+        'grid': None,
+        'points': None,
+        'samples': None
+    }
+
+def _copyLocations(locations):
+    return {name: {'coord': info['coord']} for name, info in locations.items()}
+
+def planCities(plan):
+    """
+    Returns the cities within the distance of the plan, resolving them with 'MathOthers.getCities()' on the first call.
+
+    Parameters:
+        plan (dict): A query plan created by 'buildPlan()'.
+
+    Returns:
+        cities (dict): A new dictionary with city names as keys and their coordinates as values.
+    """
+    if plan['cities'] is None:
+        with Metrics.span('cities'):
+            plan['cities'] = MathOthers.getCities(plan['dist'], plan['lat'], plan['lon'])
+
+    return _copyLocations(plan['cities'])
+
+def planGrid(plan):
+    """
+    Returns the grid of the plan, generating it with 'MathOthers.getGrid()' (or 'Lattice.getLatticeGrid()' in lattice mode) on the first call.
+
+    Parameters:
+        plan (dict): A query plan created by 'buildPlan()', with a 'radius_point'.
+
+    Returns:
+        grid (dict): A dictionary with the 'lat' and 'lon' arrays of the grid points. It must not be modified.
+    """
+    if plan['radius_point'] is None:
+        raise ValueError("The query plan has no distance between points.")
+
+    if plan['grid'] is None:
+        with Metrics.span('grid'):
+            if plan['lattice']:
+                plan['grid'] = Lattice.getLatticeGrid(plan['dist'], plan['lat'], plan['lon'], plan['radius_point'])
+            else:
+                plan['grid'] = MathOthers.getGrid(plan['dist'], plan['lat'], plan['lon'], plan['radius_point'])
+
+    return plan['grid']
+
+def planPoints(plan):
+    """
+    Returns the grid points of the plan as a dictionary, built from 'planGrid()' on the first call.
+
+    Parameters:
+        plan (dict): A query plan created by 'buildPlan()', with a 'radius_point'.
+
+    Returns:
+        points (dict): A new dictionary containing the generated points with their coordinates.
+    """
+    if plan['points'] is None:
+        plan['points'] = MathOthers.gridToPoints(planGrid(plan))
+
+    return _copyLocations(plan['points'])
+
+def planSamples(plan):
+    """
+    Returns the samples of a plan in interpolation mode: the points of a grid (or of the lattice, in lattice mode) with 'coarse_point'
+    km between them, built on the first call. Their weather is fetched, and the grid points are interpolated from it.
+
+    Parameters:
+        plan (dict): A query plan created by 'buildPlan()', with a 'coarse_point'.
+
+    Returns:
+        samples (dict): A new dictionary containing the samples with their coordinates.
+    """
+    if plan['coarse_point'] is None:
+        raise ValueError("The query plan has no distance between samples.")
+
+    if plan['samples'] is None:
+        with Metrics.span('grid'):
+            if plan['lattice']:
+                grid = Lattice.getLatticeGrid(plan['dist'], plan['lat'], plan['lon'], plan['coarse_point'])
+            else:
+                grid = MathOthers.getGrid(plan['dist'], plan['lat'], plan['lon'], plan['coarse_point'])
+        plan['samples'] = MathOthers.gridToPoints(grid)
+
+    return _copyLocations(plan['samples'])
+
+def planForecastKeys(plan):
+    """
+    Returns the key of the forecast in the record of each location of the plan: 'rain_forecast' for the cities and 'weather' for
+    the grid points (if the plan has a 'radius_point'). A result with both, such as the one of 'WeatherInfoJunction.weatherBoth()',
+    can't tell them apart from its records, since a record whose forecast request failed has no forecast key.
+
+    Parameters:
+        plan (dict): A query plan created by 'buildPlan()'.
+
+    Returns:
+        forecastKeys (dict): A new dictionary with the location names, as keys, and their forecast key, as values.
+    """
+    forecastKeys = {}
+
+    if plan['radius_point'] is not None:
+        planGrid(plan)
+        if plan['points'] is None:
+            plan['points'] = MathOthers.gridToPoints(plan['grid'])
+        forecastKeys.update(dict.fromkeys(plan['points'], 'weather'))
+
+    planCities(plan)
+    forecastKeys.update(dict.fromkeys(plan['cities'], 'rain_forecast'))
+
+    return forecastKeys
@@ -0,0 +1,239 @@
+import mmap
+import os
+import time
+
+import numpy as np
+
+import ForecastWeather
+import Lattice
+import Metrics
+
+"""
+This module provides the rain field file: a memory-mapped binary file with the rain and forecast values of every cell of a global
+lattice (see 'Lattice' module), which is updated in place, so several simulator processes can map it and read new values without
+parsing or copying a JSON file.
+
+File layout (little-endian):
+
+- A header ('HEADER'): the magic bytes, the layout version, the lattice level, the number of cells and fields, the sequence counter,
+  the active buffer and the time of the last update, followed by the field names (16 bytes each).
+- At 'DATA_OFFSET', two buffers, each with one float32 array per field ('rain_current', then 'rain_<h>h' and 'percent_<h>h' of each
+  horizon), indexed by lattice cell: the cell (row, col) is at 'rowOffsets[row] + col'. Missing values are NaN.
+
+Updates never change the buffer that the readers use: the writer fills the inactive buffer, then switches the active buffer, and then
+copies the same values into the other buffer, so both buffers stay equal. The sequence counter is odd while the active buffer
+changes and it is incremented at each switch, so a reader that sees the same even sequence before and after reading knows that its
+values are consistent; otherwise it reads again ('readRainField()').
+
+Notes:
+    - A file must have a single writer at a time. Any number of processes can read it.
+    - The whole lattice is allocated: 8 bytes per field and cell (two float32 buffers), so about 32 MB at the default level of
+    25 km with the default horizons.
+    - Python has no memory barriers, so the protocol relies on the stores reaching the other processes in program order, which
+    x86 processors guarantee. On weakly ordered processors (ARM), a reader could in rare cases miss an update in progress.
+
+Functions in this module:
+
+- 'createRainField()': Creates a rain field file for a lattice level.
+- 'openRainField()': Maps a rain field file, for reading or for updating.
+- 'closeRainField()': Unmaps a rain field file.
+- 'cellIndex()': Returns the position of the lattice cell of each coordinate.
+- 'updateRainField()': Writes the values of a weather result into the file.
+- 'readRainField()': Returns consistent values of some coordinates.
+"""
+
+MAGIC = b'OWMRAIN1'
+LAYOUT_VERSION = 1
+LEVEL = 25
+DATA_OFFSET = 4096
+NAME_SIZE = 16
+READ_RETRIES = 1000
+
+HEADER = np.dtype([
+    ('magic', 'S8'), ('version', '<u4'), ('level', '<u4'), ('cells', '<u8'), ('fields', '<u4'), ('reserved', '<u4'),
+    ('sequence', '<u8'), ('active', '<u4'), ('padding', '<u4'), ('updated', '<f8')
+])
+
+def _fieldNames(horizons):
+    fields = ['rain_current']
+    for hours in ForecastWeather.checkHorizons(horizons):
+        fields += [f'rain_{hours}h', f'percent_{hours}h']
+    return fields
+
+def createRainField(filePath, level=LEVEL, horizons=None):
+    """
+    Creates a rain field file for a lattice level, with every value missing (NaN). An existing file is replaced.
+
+    Parameters:
+        filePath (str): Path of the file.
+        level (int): The lattice level (distance between cells, in km).
+        horizons (tuple): Forecast horizons, in hours. If None, 'ForecastWeather.HORIZONS' is used.
+
+    Returns:
+        None.
+    """
+    fields = _fieldNames(horizons)
+    if len(fields) * NAME_SIZE + HEADER.itemsize > DATA_OFFSET:
+        raise ValueError("Too many forecast horizons for the header.")
+
+    rows, columns, step_lat = Lattice.latticeShape(level)
+    cells = int(columns.sum())
+
+    header = np.zeros(1, dtype=HEADER)
+    header[0] = (MAGIC, LAYOUT_VERSION, level, cells, len(fields), 0, 0, 0, 0, time.time())
+    names = np.array(fields, dtype=f'S{NAME_SIZE}')
+
+    # The file is written under a temporary name, so readers never map a partly created file
+    with open(filePath + '.tmp', 'wb') as outfile:
+        outfile.write(header.tobytes())
+        outfile.write(names.tobytes())
+        outfile.seek(DATA_OFFSET)
+
+        missing = np.full(min(cells, 1 << 20), np.nan, dtype=np.float32).tobytes()
+        for _ in range(2 * len(fields)):
+            for start in range(0, cells, 1 << 20):
+                outfile.write(missing[:4 * (min(cells, start + (1 << 20)) - start)])
+
+    os.replace(filePath + '.tmp', filePath)
+
+def openRainField(filePath, writable=False):
+    """
+    Maps a rain field file. Readers map it read-only; the values are shared with the file, so nothing is copied.
+
+    Parameters:
+        filePath (str): Path of the file.
+        writable (bool): If True, the file is mapped for 'updateRainField()'.
+
+    Returns:
+        field (dict): The mapped file, with its 'header' (a structured array view), the 'level', the 'fields', the lattice
+        'rowOffsets' and the 'buffers' (a float32 view with shape (2, fields, cells)).
+
+    Raises:
+        ValueError: If the file is not a rain field file of this layout version.
+    """
+    with open(filePath, 'r+b' if writable else 'rb') as infile:
+        mapped = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+    header = np.frombuffer(mapped, dtype=HEADER, count=1)
+    if header['magic'][0] != MAGIC or header['version'][0] != LAYOUT_VERSION:
+        mapped.close()
+        raise ValueError(f"The file at {filePath} is not a rain field file (version {LAYOUT_VERSION}).")
+
+    level = int(header['level'][0])
+    cells = int(header['cells'][0])
+    count = int(header['fields'][0])
+    names = np.frombuffer(mapped, dtype=f'S{NAME_SIZE}', count=count, offset=HEADER.itemsize)
+    rows, columns, step_lat = Lattice.latticeShape(level)
+
+    return {
+        'mmap': mapped,
+        'header': header,
+        'level': level,
+        'fields': [name.decode() for name in names.tolist()],
+        'rowOffsets': np.concatenate(([0], np.cumsum(columns)[:-1])),
+        'buffers': np.frombuffer(mapped, dtype='<f4', count=2 * count * cells, offset=DATA_OFFSET).reshape(2, count, cells)
+    }
+
+def closeRainField(field):
+    """
+    Unmaps a rain field file. The arrays of the field can't be used afterwards.
+
+    Parameters:
+        field (dict): A field returned by 'openRainField()'.
+
+    Returns:
+        None.
+    """
+    # The views on the map must be released before it can be closed
+    mapped = field['mmap']
+    field.clear()
+    mapped.close()
+
+def cellIndex(field, lat, lon):
+    """
+    Returns the position, in the buffers of the file, of the lattice cell that contains each coordinate.
+
+    Parameters:
+        field (dict): A field returned by 'openRainField()'.
+        lat (array-like): Latitudes in degrees.
+        lon (array-like): Longitudes in degrees.
+
+    Returns:
+        numpy.ndarray: The position of each cell.
+    """
+    row, col = Lattice.snapToLattice(field['level'], lat, lon)
+    return field['rowOffsets'][row] + col
+
+def updateRainField(field, weather):
+    """
+    Writes the values of a weather result into the cells of its locations, without a reader ever seeing a partial update.
+    The locations are snapped to the lattice of the file; if several locations fall in the same cell, the last one is kept.
+
+    Parameters:
+        field (dict): A field returned by 'openRainField()' with 'writable=True'.
+        weather (dict): A result of a 'WeatherInfoJunction' function (or the changes published by 'RefreshScheduler.run()').
+
+    Returns:
+        int: The new sequence number.
+    """
+    if not weather:
+        return int(field['header']['sequence'][0])
+
+    coords = np.array([record['coord'] for record in weather.values()], dtype=float)
+    values = np.full((len(field['fields']), len(weather)), np.nan, dtype=np.float32)
+
+    for column, record in enumerate(weather.values()):
+        forecast = record.get('rain_forecast') or record.get('weather') or {}
+        for row, name in enumerate(field['fields']):
+            value = record.get(name) if name == 'rain_current' else forecast.get(name)
+            if value is not None:
+                values[row, column] = value
+
+    with Metrics.span('updateRainField'):
+        cells = cellIndex(field, coords[:, 0], coords[:, 1])
+        header = field['header']
+        active = int(header['active'][0])
+
+        # 1. The inactive buffer gets the new values; 2. it becomes active; 3. the other buffer gets the same values
+        field['buffers'][1 - active][:, cells] = values
+
+        header['sequence'] += 1
+        header['active'] = 1 - active
+        header['updated'] = time.time()
+        header['sequence'] += 1
+
+        field['buffers'][active][:, cells] = values
+
+    return int(header['sequence'][0])
+
+def readRainField(field, lat, lon):
+    """
+    Returns the values of the lattice cells of some coordinates, all from the same update.
+
+    Parameters:
+        field (dict): A field returned by 'openRainField()'.
+        lat (array-like): Latitudes in degrees.
+        lon (array-like): Longitudes in degrees.
+
+    Returns:
+        tuple: (values (dict), sequence (int)), with the field names, as keys, and a float32 array with the value of each coordinate
+        (NaN if missing), as values, and the sequence number of the update they come from.
+
+    Raises:
+        RuntimeError: If no consistent read was possible after 'READ_RETRIES' attempts.
+    """
+    cells = cellIndex(field, lat, lon)
+    header = field['header']
+
+    for _ in range(READ_RETRIES):
+        sequence = int(header['sequence'][0])
+        if sequence % 2:
+            time.sleep(0)
+            continue
+
+        values = field['buffers'][int(header['active'][0])][:, cells].copy()
+
+        if int(header['sequence'][0]) == sequence:
+            return dict(zip(field['fields'], values)), sequence
+
+    raise RuntimeError("The rain field file is being updated too often to read it.")
@@ -0,0 +1,174 @@
+import threading
+import time
+
+import CurrentWeather
+import FetchEngine
+import ForecastWeather
+import WeatherCache
+
+"""
+This module provides an incremental refresh scheduler, which keeps the weather of a set of locations up to date and publishes
+only what changed.
+
+Instead of getting the weather of the whole region again, the scheduler tracks the age of each location and only refreshes
+the stale ones: the current weather every 'CURRENT_INTERVAL' seconds (OpenWeatherMap updates it about every 10 minutes) and the
+forecast when its 3 hour slot ends (see 'ForecastWeather' module). After each refresh, only the locations whose 'rain_current' or
+forecast values changed are published, so the work downstream is proportional to the change, not to the size of the region.
+
+Notes:
+    - A scheduler is a dictionary created by 'createScheduler()' from the result of a 'WeatherInfoJunction' function.
+    - If a request fails, the location keeps its previous values and is refreshed again on the next tick.
+
+Functions in this module:
+
+- 'createScheduler()': Creates a scheduler for the locations of a weather result.
+- 'staleLocations()': Returns the locations whose current weather or forecast must be refreshed.
+- 'refresh()': Refreshes the stale locations and returns the records that changed.
+- 'run()': Refreshes the locations periodically and publishes the changes, until stopped.
+"""
+
+CURRENT_INTERVAL = 600
+TICK = 60
+
+def createScheduler(weather, forecastKey, horizons=None, now=None):
+    """
+    Creates a scheduler for the locations of a weather result. The result is assumed to be fresh.
+
+    Parameters:
+        weather (dict): A result of 'WeatherInfoJunction.weatherCities()', 'weatherPoints()' or 'weatherBoth()'.
+        forecastKey (str or dict): Key of the forecast of every location ('rain_forecast' for cities, 'weather' for points), or a
+        dictionary with the key of each location (see 'QueryPlan.planForecastKeys()'). A record whose forecast request failed has
+        no forecast key, so it can't be taken from the records.
+        horizons (tuple): Forecast horizons, in hours, kept in the records. If None, 'ForecastWeather.HORIZONS' is used.
+        now (float): Current time (as returned by 'time.time()'). If None, the current time is used.
+
+    Returns:
+        scheduler (dict): The scheduler, with a copy of the records and the time of their last refresh.
+    """
+    if now is None:
+        now = time.time()
+
+    locations = {}
+    for name, info in weather.items():
+        record = dict(info)
+        key = forecastKey if isinstance(forecastKey, str) else forecastKey[name]
+        forecastExpires = (now // ForecastWeather.SLOT + 1) * ForecastWeather.SLOT
+
+        # A location whose forecast request failed has no forecast yet, so it is refreshed on the next tick
+        if record.get(key) is not None:
+            record[key] = dict(record[key])
+        else:
+            forecastExpires = now
+
+        locations[name] = {
+            'record': record,
+            'forecastKey': key,
+            'currentAt': now,
+            'forecastExpires': forecastExpires
+        }
+
+    return {
+        'locations': locations,
+        'horizons': ForecastWeather.checkHorizons(horizons),
+        'currentInterval': CURRENT_INTERVAL
+    }
+
+def staleLocations(scheduler, now=None):
+    """
+    Returns the locations whose current weather or forecast must be refreshed.
+
+    Parameters:
+        scheduler (dict): A scheduler created by 'createScheduler()'.
+        now (float): Current time. If None, the current time is used.
+
+    Returns:
+        tuple: (locations with a stale current weather (dict), locations with a stale forecast (dict)), with the location names,
+        as keys, and a dictionary with the 'coord' tuple, as values.
+    """
+    if now is None:
+        now = time.time()
+
+    current = {}
+    forecast = {}
+
+    for name, location in scheduler['locations'].items():
+        coord = {'coord': location['record']['coord']}
+
+        if now - location['currentAt'] >= scheduler['currentInterval']:
+            current[name] = coord
+        if now >= location['forecastExpires']:
+            forecast[name] = coord
+
+    return current, forecast
+
+def refresh(scheduler, maxWorkers=None, now=None):
+    """
+    Refreshes the stale locations and returns the records that changed. The new responses are also stored in the caches of the
+    'CurrentWeather' and 'ForecastWeather' modules.
+
+    Parameters:
+        scheduler (dict): A scheduler created by 'createScheduler()'.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        now (float): Current time. If None, the current time is used.
+
+    Returns:
+        changes (dict): A dictionary with the names of the locations whose values changed, as keys, and their new records, as values.
+    """
+    if now is None:
+        now = time.time()
+
+    locations = scheduler['locations']
+    staleCurrent, staleForecast = staleLocations(scheduler, now)
+    changed = set()
+
+    # The current weather is requested without the cache, since the scheduler decides when it is stale
+    for name, weather_data in FetchEngine.fetchAll(CurrentWeather.ENDPOINT, staleCurrent, maxWorkers).items():
+        if weather_data is None:
+            continue
+
+        location = locations[name]
+        WeatherCache.cachePut(CurrentWeather.cache, WeatherCache.cacheKey(CurrentWeather.ENDPOINT, *location['record']['coord']), weather_data)
+        location['currentAt'] = now
+
+        rain_current = weather_data.get('rain', {}).get('1h', 0)
+        if location['record'].get('rain_current') != rain_current:
+            location['record']['rain_current'] = rain_current
+            changed.add(name)
+
+    for name, forecast in ForecastWeather.getForecasts(staleForecast, maxWorkers).items():
+        if forecast is None:
+            continue
+
+        location = locations[name]
+        location['forecastExpires'] = max(forecast['expires'], (now // ForecastWeather.SLOT + 1) * ForecastWeather.SLOT)
+
+        parsed_data = ForecastWeather.forecastHorizons(forecast, scheduler['horizons'], now)
+        if location['record'].get(location['forecastKey']) != parsed_data:
+            location['record'][location['forecastKey']] = parsed_data
+            changed.add(name)
+
+    return {name: dict(locations[name]['record']) for name in locations if name in changed}
+
+def run(scheduler, publish, tick=TICK, maxWorkers=None, stop=None):
+    """
+    Refreshes the stale locations every 'tick' seconds and publishes the records that changed, until 'stop' is set.
+
+    Parameters:
+        scheduler (dict): A scheduler created by 'createScheduler()'.
+        publish (function): Function called with the dictionary of changed records, when there are changes.
+        tick (float): Seconds between checks for stale locations.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        stop (threading.Event): Event that stops the scheduler when set. If None, it runs forever.
+
+    Returns:
+        None.
+    """
+    if stop is None:
+        stop = threading.Event()
+
+    while not stop.is_set():
+        changes = refresh(scheduler, maxWorkers)
+        if changes:
+            publish(changes)
+
+        stop.wait(tick)
@@ -0,0 +1,267 @@
+from collections.abc import ItemsView, Mapping, ValuesView
+
+import numpy as np
+
+import ForecastWeather
+
+"""
+This module provides a compact, columnar representation of the weather results, for large grids.
+
+The results of the 'WeatherInfoJunction' functions are dictionaries with one nested dictionary per location, which costs more
+than a kilobyte per location and is slow to iterate. A result store keeps the same information in a single structured NumPy
+array, with one row per location (an integer ID, the coordinates, the current rain and the forecast of each horizon), and a
+table with the location names. A row takes less than a hundred bytes, and a column (for example, every 'rain_current') can be
+used as a NumPy array without any loop.
+
+'WeatherView' is a read-only dictionary view over a store: it has the same keys and values as the result dictionaries, built
+on demand, so the code that expects the dictionaries keeps working.
+
+Notes:
+    - A store is a dictionary created by 'createStore()'. Missing values (failed requests) are NaN in the columns, and the
+    'flags' column tells if the current weather ('HAS_CURRENT') and the forecast ('HAS_FORECAST') of each row are present, and
+    the 'interpolated' flag of the records of the interpolation mode ('HAS_INTERPOLATED', with its value in 'INTERPOLATED').
+    - The 'kind' column is 0 for cities (forecast under 'rain_forecast') and 1 for points (forecast under 'weather'). It is given by
+    the 'forecastKey' of the records, since a record whose forecast request failed has no forecast key to tell it.
+
+Functions in this module:
+
+- 'createStore()': Creates an empty result store.
+- 'addRecord()': Adds a location record to a store.
+- 'fromRecords()': Builds a store from (name, record) tuples, for example from a 'WeatherInfoJunction' generator.
+- 'fromWeather()': Builds a store from a result dictionary.
+- 'getRecord()': Returns the record of a row, in the same form as the result dictionaries.
+- 'iterRecords()': Yields the (name, record) tuples of every row, in order.
+- 'columns()': Returns the filled part of every column.
+"""
+
+HAS_CURRENT = 1
+HAS_FORECAST = 2
+HAS_INTERPOLATED = 4
+INTERPOLATED = 8
+FORECAST_KEYS = ('rain_forecast', 'weather')
+
+def createStore(horizons=None, capacity=1024):
+    """
+    Creates an empty result store.
+
+    Parameters:
+        horizons (tuple): Forecast horizons, in hours, kept in the store. If None, 'ForecastWeather.HORIZONS' is used.
+        capacity (int): Initial number of rows. The store grows when it is full.
+
+    Returns:
+        store (dict): The store, with the 'rows' structured array, the 'names' table, the 'index' of each name and the row 'count'.
+    """
+    horizons = ForecastWeather.checkHorizons(horizons)
+
+    fields = [('id', 'i4'), ('lat', 'f8'), ('lon', 'f8'), ('kind', 'i1'), ('flags', 'i1'), ('rain_current', 'f8')]
+    for hours in horizons:
+        fields += [(f'rain_{hours}h', 'f8'), (f'percent_{hours}h', 'f8')]
+
+    return {
+        'horizons': horizons,
+        'rows': np.zeros(max(1, capacity), dtype=fields),
+        'names': [],
+        'index': {},
+        'count': 0
+    }
+
+def _forecastKeyOf(forecastKey, name, record):
+    # Without a forecast key, only a record with a forecast tells its kind; the others are stored as points
+    if forecastKey is None:
+        return 'rain_forecast' if 'rain_forecast' in record else 'weather'
+    if isinstance(forecastKey, str):
+        return forecastKey
+    return forecastKey[name]
+
+def addRecord(store, name, record, forecastKey=None):
+    """
+    Adds a location record to a store. If the name is already in the store, its row is replaced.
+
+    Parameters:
+        store (dict): A store created by 'createStore()'.
+        name (str): Name of the location.
+        record (dict): The record, as in the result dictionaries ('coord', 'rain_current', 'rain_forecast' or 'weather' and, optionally, 'interpolated').
+        forecastKey (str): Key of the forecast of the record ('rain_forecast' for a city, 'weather' for a point). If None, it is
+        taken from the record, which is only right if the record has a forecast.
+
+    Returns:
+        int: The ID (row) of the location.
+    """
+    row = store['index'].get(name)
+
+    if row is None:
+        row = store['count']
+        if row == len(store['rows']):
+            grown = np.zeros(2 * len(store['rows']), dtype=store['rows'].dtype)
+            grown[:row] = store['rows']
+            store['rows'] = grown
+
+        store['names'].append(name)
+        store['index'][name] = row
+        store['count'] += 1
+
+    kind = FORECAST_KEYS.index(_forecastKeyOf(forecastKey, name, record))
+    forecast = record.get(FORECAST_KEYS[kind])
+    current = record.get('rain_current')
+    flags = (HAS_CURRENT if current is not None else 0) | (HAS_FORECAST if forecast is not None else 0)
+    if 'interpolated' in record:
+        flags |= HAS_INTERPOLATED | (INTERPOLATED if record['interpolated'] else 0)
+
+    values = [row, record['coord'][0], record['coord'][1], kind, flags, np.nan if current is None else current]
+    for hours in store['horizons']:
+        if forecast is None:
+            values += [np.nan, np.nan]
+        else:
+            values += [forecast[f'rain_{hours}h'], forecast[f'percent_{hours}h']]
+
+    store['rows'][row] = tuple(values)
+    return row
+
+def fromRecords(records, horizons=None, names=None, forecastKey=None):
+    """
+    Builds a store from (name, record) tuples, without keeping the records.
+
+    Parameters:
+        records (iterable): (name, record) tuples, for example from 'WeatherInfoJunction.iterWeatherPoints()'.
+        horizons (tuple): Forecast horizons of the records. If None, 'ForecastWeather.HORIZONS' is used.
+        names (list): If given, a row is reserved for each name first, so the store keeps this order even if the records arrive
+        in another one. Every name must then have a record.
+        forecastKey (str or dict): Key of the forecast of every record ('rain_forecast' for cities, 'weather' for points), or a
+        dictionary with the key of each name (see 'QueryPlan.planForecastKeys()'). If None, it is taken from each record.
+
+    Returns:
+        WeatherView: A dictionary view over the new store (the store is in 'view.store').
+    """
+    store = createStore(horizons, capacity=len(names) if names is not None else 1024)
+
+    if names is not None:
+        for row, name in enumerate(names):
+            store['names'].append(name)
+            store['index'][name] = row
+        store['count'] = len(store['names'])
+
+    for name, record in records:
+        addRecord(store, name, record, _forecastKeyOf(forecastKey, name, record))
+
+    return WeatherView(store)
+
+def fromWeather(weather, horizons=None, forecastKey=None):
+    """
+    Builds a store from a result dictionary of the 'WeatherInfoJunction' functions.
+
+    Parameters:
+        weather (dict): The result dictionary.
+        horizons (tuple): Forecast horizons of the records. If None, 'ForecastWeather.HORIZONS' is used.
+        forecastKey (str or dict): Key of the forecast of every record, or a dictionary with the key of each name (see 'fromRecords()').
+
+    Returns:
+        WeatherView: A dictionary view over the new store.
+    """
+    store = createStore(horizons, capacity=len(weather))
+
+    for name, record in weather.items():
+        addRecord(store, name, record, _forecastKeyOf(forecastKey, name, record))
+
+    return WeatherView(store)
+
+def getRecord(store, row):
+    """
+    Returns the record of a row, in the same form as the values of the result dictionaries.
+
+    Parameters:
+        store (dict): A store created by 'createStore()'.
+        row (int): The ID (row) of the location.
+
+    Returns:
+        record (dict): A new dictionary with the 'coord', the forecast (if present) and the 'rain_current'.
+    """
+    return _buildRecord(store['rows'].dtype.names[6:], store['rows'][row].tolist())
+
+def iterRecords(store, chunk=4096):
+    """
+    Yields the (name, record) tuples of every row, in order. The rows are converted to Python values a chunk at a time,
+    which is much faster than reading them one by one.
+
+    Parameters:
+        store (dict): A store created by 'createStore()'.
+        chunk (int): Number of rows converted at a time.
+
+    Yields:
+        tuple: (name, record), with the same record as 'getRecord()'.
+    """
+    forecastNames = store['rows'].dtype.names[6:]
+
+    for start in range(0, store['count'], chunk):
+        rows = store['rows'][start:min(start + chunk, store['count'])].tolist()
+        for name, values in zip(store['names'][start:start + chunk], rows):
+            yield name, _buildRecord(forecastNames, values)
+
+def _buildRecord(forecastNames, values):
+    # values: id, lat, lon, kind, flags, rain_current, then the forecast columns
+    record = {'coord': (values[1], values[2])}
+
+    if values[4] & HAS_FORECAST:
+        record[FORECAST_KEYS[values[3]]] = dict(zip(forecastNames, values[6:]))
+
+    record['rain_current'] = values[5] if values[4] & HAS_CURRENT else None
+    if values[4] & HAS_INTERPOLATED:
+        record['interpolated'] = bool(values[4] & INTERPOLATED)
+    return record
+
+def columns(store):
+    """
+    Returns the filled part of every column of a store, without copying.
+
+    Parameters:
+        store (dict): A store created by 'createStore()'.
+
+    Returns:
+        dict: A dictionary with the column names, as keys, and NumPy arrays, as values.
+    """
+    rows = store['rows'][:store['count']]
+    return {name: rows[name] for name in rows.dtype.names}
+
+class WeatherView(Mapping):
+    """
+    Read-only dictionary view over a result store. The records are built when they are read.
+    """
+    __slots__ = ('store',)
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, name):
+        return getRecord(self.store, self.store['index'][name])
+
+    def __iter__(self):
+        return iter(self.store['names'])
+
+    def __len__(self):
+        return self.store['count']
+
+    def __contains__(self, name):
+        return name in self.store['index']
+
+    def items(self):
+        return _Items(self)
+
+    def values(self):
+        return _Values(self)
+
+    def copy(self):
+        return dict(iterRecords(self.store))
+
+    def __repr__(self):
+        return repr(self.copy())
+
+class _Items(ItemsView):
+    __slots__ = ()
+
+    def __iter__(self):
+        return iterRecords(self._mapping.store)
+
+class _Values(ValuesView):
+    __slots__ = ()
+
+    def __iter__(self):
+        return (record for name, record in iterRecords(self._mapping.store))
@@ -0,0 +1,187 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+"""
+This module provides a response cache for the OpenWeatherMap requests, so repeated or overlapping queries do not spend
+API calls (and waiting time) on coordinates that were fetched recently.
+
+The cache is keyed on the endpoint and the coordinates rounded to a fixed step ('QUANTUM' degrees), so points that are almost
+in the same place share the same entry. Each entry expires after a time-to-live (TTL), and when the cache is full the least
+recently used entry is removed. An entry can also be stored with its own expiry time (for example, the end of a forecast slot).
+Optionally, the entries are also kept in a SQLite file, so they survive between runs.
+
+Notes:
+    - A cache is a dictionary created by 'createCache()'. Its counters ('hits', 'misses', 'expired', 'evictions') can be read with
+    'cacheStats()', to tune the TTL against how fresh the data must be.
+    - The current weather of OpenWeatherMap is updated about every 10 minutes, which is the default TTL of the 'CurrentWeather' cache.
+
+Functions in this module:
+
+- 'createCache()': Creates a cache with a TTL, a maximum size and an optional SQLite file.
+- 'cacheKey()': Builds the cache key of an endpoint and a pair of coordinates.
+- 'cacheGet()': Returns the value stored for a key, if it has not expired.
+- 'cachePut()': Stores a value for a key.
+- 'cacheClear()': Removes every entry of a cache.
+- 'cacheStats()': Returns the counters of a cache.
+"""
+
+QUANTUM = 0.01
+
+def createCache(ttl=600, maxSize=10000, dbPath=None):
+    """
+    Creates a cache.
+
+    Parameters:
+        ttl (float): Time-to-live of each entry, in seconds.
+        maxSize (int): Maximum number of entries kept in memory. The least recently used entry is removed first.
+        dbPath (str): Path of a SQLite file where the entries are also kept. If None, the cache only lives in memory.
+
+    Returns:
+        cache (dict): The new cache.
+    """
+    cache = {
+        'ttl': ttl,
+        'maxSize': maxSize,
+        'entries': OrderedDict(),
+        'lock': threading.Lock(),
+        'db': None,
+        'hits': 0,
+        'misses': 0,
+        'expired': 0,
+        'evictions': 0
+    }
+
+    if dbPath is not None:
+        db = sqlite3.connect(dbPath, check_same_thread=False)
+        db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires REAL, value TEXT)")
+        db.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        db.commit()
+        cache['db'] = db
+
+    return cache
+
+def cacheKey(endpoint, lat, lon):
+    """
+    Builds the cache key of an endpoint and a pair of coordinates, rounded to 'QUANTUM' degrees.
+
+    Parameters:
+        endpoint (str): Path of the OpenWeatherMap endpoint.
+        lat (float): Latitude of the location.
+        lon (float): Longitude of the location.
+
+    Returns:
+        str: The cache key.
+    """
+    return f'{endpoint}:{round(lat / QUANTUM)}:{round(lon / QUANTUM)}'
+
+def cacheGet(cache, key):
+    """
+    Returns the value stored for a key, if it exists and has not expired. The SQLite file is checked when the key is not in memory.
+
+    Parameters:
+        cache (dict): A cache created by 'createCache()'.
+        key (str): The cache key.
+
+    Returns:
+        The stored value, or None if there is no valid entry.
+    """
+    now = time.time()
+
+    with cache['lock']:
+        entry = cache['entries'].get(key)
+
+        if entry is None and cache['db'] is not None:
+            row = cache['db'].execute("SELECT expires, value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                entry = (row[0], json.loads(row[1]))
+                _store(cache, key, entry)
+
+        if entry is None:
+            cache['misses'] += 1
+            return None
+
+        if now >= entry[0]:
+            del cache['entries'][key]
+            cache['expired'] += 1
+            cache['misses'] += 1
+            return None
+
+        cache['entries'].move_to_end(key)
+        cache['hits'] += 1
+        return entry[1]
+
+def cachePut(cache, key, value, expires=None):
+    """
+    Stores a value for a key, removing the least recently used entry if the cache is full.
+
+    Parameters:
+        cache (dict): A cache created by 'createCache()'.
+        key (str): The cache key.
+        value: The value to store. It must be convertible to JSON if the cache has a SQLite file.
+        expires (float): Time (as returned by 'time.time()') at which the entry expires. If None, the entry expires after the TTL of the cache.
+
+    Returns:
+        None.
+    """
+    if expires is None:
+        expires = time.time() + cache['ttl']
+
+    entry = (expires, value)
+
+    with cache['lock']:
+        _store(cache, key, entry)
+
+        if cache['db'] is not None:
+            cache['db'].execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, entry[0], json.dumps(value)))
+            cache['db'].commit()
+
+def _store(cache, key, entry):
+    entries = cache['entries']
+    entries[key] = entry
+    entries.move_to_end(key)
+
+    while len(entries) > cache['maxSize']:
+        entries.popitem(last=False)
+        cache['evictions'] += 1
+
+def cacheClear(cache):
+    """
+    Removes every entry of a cache, including the ones in its SQLite file. The counters are kept.
+
+    Parameters:
+        cache (dict): A cache created by 'createCache()'.
+
+    Returns:
+        None.
+    """
+    with cache['lock']:
+        cache['entries'].clear()
+
+        if cache['db'] is not None:
+            cache['db'].execute("DELETE FROM cache")
+            cache['db'].commit()
+
+def cacheStats(cache):
+    """
+    Returns the counters of a cache.
+
+    Parameters:
+        cache (dict): A cache created by 'createCache()'.
+
+    Returns:
+        dict: A dictionary with the 'hits', 'misses', 'expired' and 'evictions' counters, the current 'size' and the 'hitRatio'.
+    """
+    with cache['lock']:
+        lookups = cache['hits'] + cache['misses']
+
+        return {
+            'hits': cache['hits'],
+            'misses': cache['misses'],
+            'expired': cache['expired'],
+            'evictions': cache['evictions'],
+            'size': len(cache['entries']),
+            'hitRatio': cache['hits'] / lookups if lookups else 0.0
+        }
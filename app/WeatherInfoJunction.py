@@ -1,7 +1,16 @@
+import asyncio
+import threading
+
 import CurrentWeather
+import FetchEngine
 import ForecastWeather
+import Interpolation
 import MathOthers
 import DataIntroduction
+import Metrics
+import QueryPlan
+import ResultStore
+import WeatherCache
 
 """
 This module provides functionality to retrieve and combine current weather and forecast weather information for cities and points 
@@ -14,6 +23,24 @@ Modules used:
 - 'ForecastWeather': Handles retrieval of forecast weather data.
 - 'MathOthers': Provides mathematical functions, such as distance calculations.
 - 'DataIntroduction': Manages user input and data gathering for distances and points.
+- 'Metrics': Records the time spent in each stage.
+- 'QueryPlan': Holds the cities and points of a request, so they are computed only once.
+- 'FetchEngine': Sends the current and forecast requests of each location together, in the pipelined mode.
+- 'ResultStore': Keeps the results in compact columns, in the columnar mode.
+- 'Interpolation': Fills the grid points from a coarser grid of samples, in the interpolation mode.
+
+In the pipelined mode ('pipelined=True'), the current weather and the forecast of each location are requested together, and each
+record is finished as soon as its two responses arrive ('streamWeather()'), instead of running the whole current weather pass and
+then the whole forecast pass. The first records are ready much sooner, and no intermediate dictionaries are kept.
+In the columnar mode ('columnar=True', which is also pipelined), the records go straight into a 'ResultStore', and the functions
+return a read-only dictionary view over it, which uses much less memory for large grids.
+In the interpolation mode ('coarse_point'), only the samples of a coarser grid are fetched, and the values of the grid points are
+interpolated from them (see 'Interpolation' module); each point has an 'interpolated' flag.
+
+The generator variants ('iterWeatherCities()', 'iterWeatherPoints()', 'iterWeatherBoth()') yield one (name, record) tuple at a time,
+as each location is finished, so a consumer can start while a large grid is still being fetched, and the results never have to be
+kept in memory as a whole (see 'MathOthers.writeStream()'). The async generator variants ('asyncWeatherCities()', ...) do the same
+for 'asyncio' programs; the requests run in a background thread, so the event loop is never blocked.
 
 Functions in this module:
 
@@ -22,9 +49,12 @@ Functions in this module:
 considering user options.
 - 'weatherBoth()': Combines weather information for both cities and points based on user-defined criteria, 
 including distance from specified locations.
+- 'streamWeather()': Yields the combined current and forecast weather of each location as soon as it is ready.
+- 'iterWeatherCities()', 'iterWeatherPoints()', 'iterWeatherBoth()': Generator variants of the functions above, without user interaction.
+- 'asyncWeatherCities()', 'asyncWeatherPoints()', 'asyncWeatherBoth()': Async generator variants of the functions above.
 """
 
-def weatherCities(dist,lat1,lon1,option):
+def weatherCities(dist,lat1,lon1,option,plan=None,pipelined=False,columnar=False):
     
     """
     Combines current weather and forecast weather informarions for cities within a specified distance.
@@ -34,6 +64,9 @@ def weatherCities(dist,lat1,lon1,option):
         lat1 (float): Latitude of the center location.
         lon1 (float): Longitude of the center location.
         option (int): User's choice in the main menu
+        plan (dict): Query plan of the request (see 'QueryPlan' module). If None, a new plan is built.
+        pipelined (bool): If True, the current weather and the forecast of each city are requested together (see 'streamWeather()').
+        columnar (bool): If True, the results are kept in a 'ResultStore' and a 'ResultStore.WeatherView' is returned.
 
     Returns:
         forecast (dict): A dictionary with city names, as keys, and current and forecast weather information combined, as values, including the coordinates calculated previously.
@@ -41,15 +74,21 @@ def weatherCities(dist,lat1,lon1,option):
     if option == 1:
         print("\nPlease, wait for results.\n")
     
-    current = CurrentWeather.curWeatherCities(dist,lat1,lon1)
-    forecast = ForecastWeather.forWeatherCities(dist,lat1,lon1)
+    if plan is None:
+        plan = QueryPlan.buildPlan(dist, lat1, lon1)
+
+    if pipelined or columnar:
+        return _collect(QueryPlan.planCities(plan), 'rain_forecast', plan, columnar)
+
+    current = CurrentWeather.curWeatherCities(dist,lat1,lon1,plan=plan)
+    forecast = ForecastWeather.forWeatherCities(dist,lat1,lon1,plan=plan)
 
     for city,value in forecast.items():
         forecast[city]['rain_current'] = current[city]['rain_current']
     
     return forecast
 
-def weatherPoints(dist,lat1,lon1,option,radius_aux):
+def weatherPoints(dist,lat1,lon1,option,radius_aux,plan=None,pipelined=False,columnar=False,coarse_point=None):
     
     """
     Combines current weather and forecast weather informations for points within a specified distance.
@@ -60,29 +99,51 @@ def weatherPoints(dist,lat1,lon1,option,radius_aux):
         lon1 (float): Longitude of the center location.
         option (int): User's choice in the main menu.
         radius_aux (float): distance, in kilometrs, between points.
+        plan (dict): Query plan of the request (see 'QueryPlan' module). If it has a 'radius_point', the user is not asked for it.
+        pipelined (bool): If True, the current weather and the forecast of each point are requested together (see 'streamWeather()').
+        columnar (bool): If True, the results are kept in a 'ResultStore' and a 'ResultStore.WeatherView' is returned.
+        coarse_point (float): If given (or if the plan has one), only the samples 'coarse_point' km apart are fetched, and the points are
+        interpolated from them (see 'Interpolation' module).
 
     Returns:
         forecast (dict): A dictionary with the several points, as keys, and current and forecast weather information combined, as values, including the coordinates calculated previously.
     """
     # If the users option is "weather in land/sea" (3), we don't want to ask the user the radius_point twice
     # We will use the radius_point calculated before in weatherCities function
-    if option == 3:
+    if plan is not None and plan['radius_point'] is not None:
+        radius_point = plan['radius_point']
+    elif option == 3:
         radius_point = radius_aux
     else:
         radius_point = DataIntroduction.getDistPoints(dist)
         
         # "radius_point" contains the last input asked to the user
         print("\nPlease, wait for results.\n")
+
+    if plan is None:
+        plan = QueryPlan.buildPlan(dist, lat1, lon1, radius_point)
+    else:
+        plan['radius_point'] = radius_point
+
+    if coarse_point is not None:
+        plan['coarse_point'] = coarse_point
+
+    if plan['coarse_point'] is not None:
+        weather = _interpolate(plan)
+        return ResultStore.fromWeather(weather, forecastKey='weather') if columnar else weather
+
+    if pipelined or columnar:
+        return _collect(QueryPlan.planPoints(plan), 'weather', plan, columnar)
     
-    current = CurrentWeather.curWeatherPoints(dist,lat1,lon1,radius_point)
-    forecast = ForecastWeather.forWeatherPoints(dist,lat1,lon1,radius_point)
+    current = CurrentWeather.curWeatherPoints(dist,lat1,lon1,radius_point,plan=plan)
+    forecast = ForecastWeather.forWeatherPoints(dist,lat1,lon1,radius_point,plan=plan)
     
     for point,value in forecast.items():
         forecast[point]['rain_current'] = current[point]['rain_current']
     
     return forecast
 
-def weatherBoth(dist, lat1, lon1, option):
+def weatherBoth(dist, lat1, lon1, option, plan=None, pipelined=False, columnar=False, coarse_point=None):
     """
     Combines weather information for both cities and points within this criteria:
         On land: get weather for cities and points that are more than a certain distance* in km from cities;
@@ -95,41 +156,281 @@ def weatherBoth(dist, lat1, lon1, option):
         lat1 (float): Latitude of the central location.
         lon1 (float): Longitude of the central location.
         option (int): User's choice in the main menu
+        plan (dict): Query plan of the request (see 'QueryPlan' module). If it has a 'radius_point', the user is not asked for it.
+        pipelined (bool): If True, the current weather and the forecast of each location are requested together (see 'streamWeather()').
+        columnar (bool): If True, the results are kept in a 'ResultStore' and a 'ResultStore.WeatherView' is returned.
+        coarse_point (float): If given (or if the plan has one), the points are interpolated from samples 'coarse_point' km apart
+        (see 'weatherPoints()'). The cities are always fetched.
 
     Returns:
         dict: A dictionary containing combined weather information for cities and points.
     """
-    radius_point = DataIntroduction.getDistPoints(dist)
+    if plan is None or plan['radius_point'] is None:
+        radius_point = DataIntroduction.getDistPoints(dist)
+
+        # "radius_point" contains the last input asked to the user
+        print("\nPlease, wait for results.\n")
+
+        if plan is None:
+            plan = QueryPlan.buildPlan(dist, lat1, lon1, radius_point)
+        else:
+            plan['radius_point'] = radius_point
+    else:
+        radius_point = plan['radius_point']
+
+    if coarse_point is not None:
+        plan['coarse_point'] = coarse_point
 
-    # "radius_point" contains the last input asked to the user
-    print("\nPlease, wait for results.\n")
+    if columnar and plan['coarse_point'] is None:
+        return ResultStore.fromRecords(iterWeatherBoth(dist, lat1, lon1, radius_point, plan), forecastKey=QueryPlan.planForecastKeys(plan))
 
-    weather_cities = weatherCities(dist, lat1, lon1, option)
-    weather_points = weatherPoints(dist, lat1, lon1, option, radius_point)
+    weather_cities = weatherCities(dist, lat1, lon1, option, plan, pipelined)
+    weather_points = weatherPoints(dist, lat1, lon1, option, radius_point, plan, pipelined)
     
-    cities = MathOthers.getCities(dist, lat1, lon1)
-    points = MathOthers.getPoints(dist, lat1, lon1, radius_point)
+    cities = QueryPlan.planCities(plan)
+    points = QueryPlan.planPoints(plan)
     
     condition = False
-    pointCoords = [coords['coord'] for coords in points.values()]
     
     if weather_cities:
-        for cityName, cityInfo in cities.items():
-            city_coord = cityInfo['coord']
-            distances = {
-                pointName: MathOthers.haversineDist(city_coord, pointInfo['coord'])
-                for pointName, pointInfo in points.items()
-            }
-            
-            for pointName, distance in distances.items():
-                if distance < radius_point and points[pointName]['coord'] in pointCoords:
-                    pointCoords.remove(points[pointName]['coord'])
-        
-        if pointCoords:
-            for pointName, pointInfo in weather_points.items():
-                if pointInfo['coord'] in pointCoords:
-                    weather_cities[pointName] = pointInfo
+        cityCoords = [cityInfo['coord'] for cityInfo in cities.values()]
+        pointCoords = [pointInfo['coord'] for pointInfo in points.values()]
+
+        # A point is kept only if no city is closer than "radius_point"
+        with Metrics.span('landSeaFilter'):
+            nearCity = MathOthers.anyWithin(pointCoords, cityCoords, radius_point)
+
+            for pointName, near in zip(points, nearCity):
+                if not near and pointName in weather_points:
+                    weather_cities[pointName] = weather_points[pointName]
     else:
         condition = True
-    
-    return weather_points if condition else weather_cities
\ No newline at end of file
+
+    weather = weather_points if condition else weather_cities
+    return ResultStore.fromWeather(weather, forecastKey=QueryPlan.planForecastKeys(plan)) if columnar else weather
+
+def streamWeather(locations, forecastKey, maxWorkers=None, horizons=None, priority=None):
+    """
+    Yields the combined current and forecast weather of each location as soon as it is ready. Locations with both values in the
+    caches of the 'CurrentWeather' and 'ForecastWeather' modules are yielded first; for the others, only the missing values are
+    requested, and the two requests of each location are sent together.
+
+    Parameters:
+        locations (dict): A dictionary with location names, as keys, and a dictionary with the 'coord' tuple, as values.
+        forecastKey (str): Key of the forecast in each record ('rain_forecast' for cities, 'weather' for points).
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        horizons (tuple): Forecast horizons, in hours. If None, 'ForecastWeather.HORIZONS' is used.
+        priority (function): Order in which the locations are requested (see 'FetchEngine.fetchAll()').
+
+    Yields:
+        tuple: (name, record), where the record has the 'coord', the forecast (missing if its request failed) and the 'rain_current'
+        (None if its request failed), as in the results of 'weatherCities()' and 'weatherPoints()'.
+    """
+    horizons = ForecastWeather.checkHorizons(horizons)
+    missing = {}
+
+    for name, info in locations.items():
+        current = WeatherCache.cacheGet(CurrentWeather.cache, WeatherCache.cacheKey(CurrentWeather.ENDPOINT, *info['coord']))
+        forecast = WeatherCache.cacheGet(ForecastWeather.store, WeatherCache.cacheKey(ForecastWeather.ENDPOINT, *info['coord']))
+
+        if current is not None and forecast is not None:
+            yield name, _record(name, info['coord'], current, forecast, forecastKey, horizons)
+            continue
+
+        endpoints = [endpoint for endpoint, value in ((CurrentWeather.ENDPOINT, current), (ForecastWeather.ENDPOINT, forecast)) if value is None]
+        missing[name] = {'coord': info['coord'], 'endpoints': endpoints, 'current': current, 'forecast': forecast}
+
+    for name, responses in FetchEngine.streamAll(missing, maxWorkers, priority):
+        info = missing.pop(name)
+        current = info['current']
+        forecast = info['forecast']
+
+        if CurrentWeather.ENDPOINT in responses and responses[CurrentWeather.ENDPOINT] is not None:
+            current = responses[CurrentWeather.ENDPOINT]
+            WeatherCache.cachePut(CurrentWeather.cache, WeatherCache.cacheKey(CurrentWeather.ENDPOINT, *info['coord']), current)
+
+        if ForecastWeather.ENDPOINT in responses and responses[ForecastWeather.ENDPOINT] is not None:
+            try:
+                with Metrics.span('parseForecast'):
+                    forecast = ForecastWeather.compactForecast(responses[ForecastWeather.ENDPOINT])
+                WeatherCache.cachePut(ForecastWeather.store, WeatherCache.cacheKey(ForecastWeather.ENDPOINT, *info['coord']), forecast, forecast['expires'])
+            except (TypeError, KeyError, AttributeError, ValueError):
+                forecast = None
+
+        yield name, _record(name, info['coord'], current, forecast, forecastKey, horizons)
+
+def _record(name, coord, current, forecast, forecastKey, horizons):
+    # Same keys, in the same order, as the records of the two-pass functions
+    record = {'coord': coord}
+
+    if forecast is not None:
+        record[forecastKey] = ForecastWeather.forecastHorizons(forecast, horizons)
+    else:
+        print(f"Failed to fetch weather data for {name}")
+
+    if current is not None:
+        record['rain_current'] = current.get('rain', {}).get('1h', 0)
+    else:
+        print(f"Error fetching weather data for {name}")
+        record['rain_current'] = None
+
+    return record
+
+def _collect(locations, forecastKey, plan, columnar=False):
+    # The records are put in the order of the locations, as they complete
+    records = streamWeather(locations, forecastKey, priority=FetchEngine.nearestFirst(plan['lat'], plan['lon']))
+
+    if columnar:
+        return ResultStore.fromRecords(records, names=list(locations), forecastKey=forecastKey)
+
+    results = dict.fromkeys(locations)
+    for name, record in records:
+        results[name] = record
+
+    return results
+
+def _interpolate(plan):
+    # Only the samples are fetched; the grid points are interpolated from their records
+    samples = _collect(QueryPlan.planSamples(plan), 'weather', plan)
+    return Interpolation.interpolateGrid(samples, QueryPlan.planGrid(plan))
+
+def iterWeatherCities(dist, lat1, lon1, plan=None, maxWorkers=None, horizons=None):
+    """
+    Yields the combined current and forecast weather of each city within a distance, one city at a time, as it is finished.
+
+    Parameters:
+        dist (float): The distance in kilometers within which to search for cities.
+        lat1 (float): Latitude of the center location.
+        lon1 (float): Longitude of the center location.
+        plan (dict): Query plan of the request (see 'QueryPlan' module). If None, a new plan is built.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        horizons (tuple): Forecast horizons, in hours. If None, 'ForecastWeather.HORIZONS' is used.
+
+    Yields:
+        tuple: (city name, record), with the same record as the values of 'weatherCities()'.
+    """
+    if plan is None:
+        plan = QueryPlan.buildPlan(dist, lat1, lon1)
+
+    yield from streamWeather(QueryPlan.planCities(plan), 'rain_forecast', maxWorkers, horizons, FetchEngine.nearestFirst(plan['lat'], plan['lon']))
+
+def iterWeatherPoints(dist, lat1, lon1, radius_point, plan=None, maxWorkers=None, horizons=None):
+    """
+    Yields the combined current and forecast weather of each grid point within a distance, one point at a time, as it is finished.
+
+    Parameters:
+        dist (float): The distance in kilometers within which to generate points.
+        lat1 (float): Latitude of the center location.
+        lon1 (float): Longitude of the center location.
+        radius_point (float): distance, in kilometers, between points.
+        plan (dict): Query plan of the request (see 'QueryPlan' module). If None, a new plan is built.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        horizons (tuple): Forecast horizons, in hours. If None, 'ForecastWeather.HORIZONS' is used.
+
+    Yields:
+        tuple: (point name, record), with the same record as the values of 'weatherPoints()'.
+    """
+    if plan is None:
+        plan = QueryPlan.buildPlan(dist, lat1, lon1, radius_point)
+    else:
+        plan['radius_point'] = radius_point
+
+    yield from streamWeather(QueryPlan.planPoints(plan), 'weather', maxWorkers, horizons, FetchEngine.nearestFirst(plan['lat'], plan['lon']))
+
+def iterWeatherBoth(dist, lat1, lon1, radius_point, plan=None, maxWorkers=None, horizons=None):
+    """
+    Yields the weather of the cities and of the points that are more than 'radius_point' km from every city (the same locations
+    as 'weatherBoth()'), one location at a time. The cities come first. The points near a city are removed before the requests,
+    so they are never fetched.
+
+    Parameters:
+        dist (float): The distance in kilometers within which to search for cities and points.
+        lat1 (float): Latitude of the central location.
+        lon1 (float): Longitude of the central location.
+        radius_point (float): distance, in kilometers, between points.
+        plan (dict): Query plan of the request (see 'QueryPlan' module). If None, a new plan is built.
+        maxWorkers (int): Maximum number of concurrent requests. If None, the 'FetchEngine' default is used.
+        horizons (tuple): Forecast horizons, in hours. If None, 'ForecastWeather.HORIZONS' is used.
+
+    Yields:
+        tuple: (location name, record), with the same records as the values of 'weatherBoth()'.
+    """
+    if plan is None:
+        plan = QueryPlan.buildPlan(dist, lat1, lon1, radius_point)
+    else:
+        plan['radius_point'] = radius_point
+
+    priority = FetchEngine.nearestFirst(plan['lat'], plan['lon'])
+    cities = QueryPlan.planCities(plan)
+    points = QueryPlan.planPoints(plan)
+
+    with Metrics.span('landSeaFilter'):
+        cityCoords = [cityInfo['coord'] for cityInfo in cities.values()]
+        pointCoords = [pointInfo['coord'] for pointInfo in points.values()]
+        nearCity = MathOthers.anyWithin(pointCoords, cityCoords, radius_point)
+        farPoints = {name: info for (name, info), near in zip(points.items(), nearCity) if not near}
+
+    yield from streamWeather(cities, 'rain_forecast', maxWorkers, horizons, priority)
+    yield from streamWeather(farPoints, 'weather', maxWorkers, horizons, priority)
+
+async def asyncWeatherCities(dist, lat1, lon1, plan=None, maxWorkers=None, horizons=None):
+    """
+    Async generator variant of 'iterWeatherCities()'.
+    """
+    async for item in _asyncIterate(iterWeatherCities(dist, lat1, lon1, plan, maxWorkers, horizons)):
+        yield item
+
+async def asyncWeatherPoints(dist, lat1, lon1, radius_point, plan=None, maxWorkers=None, horizons=None):
+    """
+    Async generator variant of 'iterWeatherPoints()'.
+    """
+    async for item in _asyncIterate(iterWeatherPoints(dist, lat1, lon1, radius_point, plan, maxWorkers, horizons)):
+        yield item
+
+async def asyncWeatherBoth(dist, lat1, lon1, radius_point, plan=None, maxWorkers=None, horizons=None):
+    """
+    Async generator variant of 'iterWeatherBoth()'.
+    """
+    async for item in _asyncIterate(iterWeatherBoth(dist, lat1, lon1, radius_point, plan, maxWorkers, horizons)):
+        yield item
+
+async def _asyncIterate(generator):
+    # The generator runs in a background thread; its items (or its error) are passed to the event loop through a queue
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def put(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # The event loop was closed after the consumer stopped
+            stop.set()
+
+    def produce():
+        try:
+            for item in generator:
+                if stop.is_set():
+                    break
+                put(item)
+        except Exception as e:
+            put(done, e)
+        finally:
+            generator.close()
+            put(done)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+
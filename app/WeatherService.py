@@ -0,0 +1,229 @@
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+import Batch
+import CurrentWeather
+import DataIntroduction
+import FetchEngine
+import ForecastWeather
+import HttpClient
+import MathOthers
+import Metrics
+import QueryPlan
+import WeatherCache
+
+"""
+This module provides a long-running local weather service, so the network simulator can ask for the weather of a region
+without starting the program (and reading the cities file) every time.
+
+The service keeps its state warm between requests: the city index is loaded at startup, the query plans (cities and grid points)
+of recent regions are kept in memory, and the weather caches of the 'CurrentWeather' and 'ForecastWeather' modules are shared
+by every request.
+
+Endpoints (HTTP GET, JSON responses):
+
+- '/cities', '/points', '/both': The same as the options 1, 2 and 3 of the main menu. The parameters are 'lat' and 'lon'
+  (or 'city' and 'country'), 'dist', and 'spacing' for '/points' and '/both'. With 'lattice=1', the points are taken from
+  the global lattice (see 'Lattice' module). With 'coarse', the points are interpolated from samples 'coarse' km apart
+  (see 'Interpolation' module).
+- '/forecast': The forecast of a location, from memory, with the parameters 'lat', 'lon' and 'hours' (for example, 'hours=3,6,24').
+- '/stats': The counters of the caches and of the HTTP connections.
+- '/metrics': The stage timings, request latencies and cache hit ratios (see 'Metrics' module), in the Prometheus text format.
+
+Usage:
+    python WeatherService.py [--host 127.0.0.1] [--port 8080] [--owm-root URL] [--workers N] [--calls-per-minute N]
+
+Functions in this module:
+
+- 'getPlan()': Returns the query plan of a region, reusing the plans of recent requests.
+- 'handleQuery()': Answers a region request.
+- 'handleForecast()': Answers a forecast request.
+- 'serviceStats()': Returns the counters of the caches and of the HTTP connections.
+- 'startService()': Starts the service in a background thread.
+"""
+
+PLAN_TTL = 86400
+ROUTES = {'/cities': 1, '/points': 2, '/both': 3}
+
+plans = WeatherCache.createCache(PLAN_TTL, maxSize=256)
+Metrics.registerCache('plans', plans)
+
+def getPlan(job, lattice=False):
+    """
+    Returns the query plan of a region. The plans of recent regions are kept in memory, so their cities and grid points are reused.
+
+    Parameters:
+        job (dict): A job returned by 'Batch.parseJob()', with coordinates.
+        lattice (bool): If True, the grid points are taken from the global lattice.
+
+    Returns:
+        plan (dict): The query plan of the region.
+    """
+    key = f"plan:{job['dist']}:{job['lat']}:{job['lon']}:{job['spacing']}:{lattice}:{job['coarse']}"
+    plan = WeatherCache.cacheGet(plans, key)
+
+    if plan is None:
+        plan = QueryPlan.buildPlan(job['dist'], job['lat'], job['lon'], job['spacing'], lattice, job['coarse'])
+        WeatherCache.cachePut(plans, key, plan)
+
+    return plan
+
+def handleQuery(mode, query):
+    """
+    Answers a region request.
+
+    Parameters:
+        mode (int): The option of the main menu (1 for cities, 2 for points, 3 for both).
+        query (dict): The parameters of the request.
+
+    Returns:
+        tuple: (HTTP status (int), response (dict)).
+    """
+    row = dict(query, mode=str(mode), name='request')
+
+    try:
+        job = Batch.parseJob(row, 1)
+    except ValueError as e:
+        return 400, {'error': str(e)}
+
+    if job['lat'] is None or job['lon'] is None:
+        try:
+            job['lat'], job['lon'] = DataIntroduction.geocodeCity(job['city'], job['country'])
+        except (requests.exceptions.RequestException, IndexError, KeyError, ValueError):
+            return 404, {'error': f"Error fetching coordinates for {job['city']}."}
+
+    plan = getPlan(job, query.get('lattice', '0') not in ('0', 'false', ''))
+
+    return 200, Batch.runJob(job, plan)
+
+def handleForecast(query):
+    """
+    Answers a forecast request, from memory. The location must have been part of a previous region request.
+
+    Parameters:
+        query (dict): The parameters of the request ('lat', 'lon' and, optionally, 'hours').
+
+    Returns:
+        tuple: (HTTP status (int), response (dict)).
+    """
+    try:
+        lat = float(query['lat'])
+        lon = float(query['lon'])
+        horizons = tuple(int(hours) for hours in query.get('hours', '3,6').split(','))
+        forecast = ForecastWeather.getForecast(lat, lon, horizons)
+    except KeyError:
+        return 400, {'error': "The parameters 'lat' and 'lon' are required."}
+    except ValueError as e:
+        return 400, {'error': str(e)}
+
+    if forecast is None:
+        return 404, {'error': "There is no forecast in memory for this location."}
+
+    return 200, forecast
+
+def serviceStats():
+    """
+    Returns the counters of the caches and of the HTTP connections.
+
+    Parameters:
+        None.
+
+    Returns:
+        dict: The counters of the 'current', 'forecast' and 'plans' caches and of the 'connections'.
+    """
+    return {
+        'current': WeatherCache.cacheStats(CurrentWeather.cache),
+        'forecast': WeatherCache.cacheStats(ForecastWeather.store),
+        'plans': WeatherCache.cacheStats(plans),
+        'connections': HttpClient.connectionStats()
+    }
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, contentType='application/json'):
+        body = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        try:
+            if url.path in ROUTES:
+                self._send(*handleQuery(ROUTES[url.path], query))
+            elif url.path == '/forecast':
+                self._send(*handleForecast(query))
+            elif url.path == '/stats':
+                self._send(200, serviceStats())
+            elif url.path == '/metrics':
+                self._send(200, Metrics.prometheusText(), 'text/plain; version=0.0.4')
+            else:
+                self._send(404, {'error': f"Unknown path: {url.path}"})
+        except Exception as e:
+            self._send(500, {'error': f"An unexpected error occurred: {e}"})
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+def startService(host='127.0.0.1', port=8080):
+    """
+    Loads the city index and starts the service in a background thread.
+
+    Parameters:
+        host (str): Address to listen on.
+        port (int): Port to listen on. If 0, a free port is chosen.
+
+    Returns:
+        server (ThreadingHTTPServer): The running server. Its root URL is in 'server.url'. Call 'server.shutdown()' to stop it.
+    """
+    MathOthers.loadCityIndex()
+
+    server = _Server((host, port), _Handler)
+    server.url = f'http://{host}:{server.server_address[1]}'
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the local weather service.")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    parser.add_argument('--port', type=int, default=8080, help="port to listen on")
+    parser.add_argument('--owm-root', default=None, help="root URL of the OpenWeatherMap API (for example, a local mock server)")
+    parser.add_argument('--workers', type=int, default=None, help="maximum number of concurrent requests to the API")
+    parser.add_argument('--calls-per-minute', type=float, default=None, help="calls-per-minute limit of the account (0 for no limit)")
+    args = parser.parse_args(argv)
+
+    if args.owm_root:
+        HttpClient.configure(root=args.owm_root)
+    if args.workers:
+        HttpClient.configure(poolSize=max(HttpClient.POOL_SIZE, args.workers))
+        FetchEngine.MAX_WORKERS = args.workers
+    if args.calls_per_minute is not None:
+        FetchEngine.setRateLimit(args.calls_per_minute or None)
+
+    server = startService(args.host, args.port)
+    print(f"Weather service listening on {server.url}")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import AdaptiveGrid
+import CurrentWeather
+import FetchEngine
+import Fixtures
+import ForecastWeather
+import HttpClient
+import MockServer
+import QueryPlan
+import WeatherCache
+import WeatherInfoJunction
+
+"""
+Compares the adaptive grid (see 'AdaptiveGrid' module) with uniform grids, on a region of the mock rain field with dry areas and
+rain fronts.
+
+The reference is a dense uniform grid, fetched point by point. Each method is then evaluated at the points of the reference grid:
+the adaptive grid with 'queryTree()' for several call budgets, and the interpolation mode (a uniform grid of samples, see
+'Interpolation' module) with about the same number of calls. The script reports the calls, the time, and the mean and maximum
+absolute error of 'rain_current', overall and at the points where it rains. The mock rain field is smooth, so the thresholds are
+lower than the defaults (the cells are split on the differences that a storm front would make with real weather).
+
+Usage:
+    python BenchAdaptive.py [latency_seconds]
+"""
+
+DIST, LAT, LON, RADIUS_POINT = 300, 13.0, 10.0, 10
+COARSE = 100
+BUDGETS = [300, 600, 1200]
+RAIN_THRESHOLD, POP_THRESHOLD = 0.05, 0.02
+
+def clearCaches():
+    WeatherCache.cacheClear(CurrentWeather.cache)
+    WeatherCache.cacheClear(ForecastWeather.store)
+
+def errors(values, reference):
+    diffs = [abs(values[name] - value) for name, value in reference.items() if value is not None and values.get(name) is not None]
+    wet = [abs(values[name] - value) for name, value in reference.items() if value and values.get(name) is not None]
+    return sum(diffs) / len(diffs), max(diffs), sum(wet) / max(1, len(wet))
+
+def report(label, calls, elapsed, values, reference):
+    mae, worst, wetMae = errors(values, reference)
+    print(f"{label:<26} {calls:>6} {elapsed:>8.2f} {mae:>8.3f} {worst:>8.3f} {wetMae:>9.3f}")
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.005
+    Fixtures.useCityTable(os.path.join(tempfile.gettempdir(), 'owm-bench'))
+    server = MockServer.startServer(latency)
+    HttpClient.configure(root=server.url)
+    FetchEngine.setRateLimit(None)
+
+    print(f"{'method':<26} {'calls':>6} {'seconds':>8} {'MAE':>8} {'max':>8} {'wet MAE':>9}")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            plan = QueryPlan.buildPlan(DIST, LAT, LON, RADIUS_POINT)
+            start = time.perf_counter()
+            grid = WeatherInfoJunction.weatherPoints(DIST, LAT, LON, 2, RADIUS_POINT, plan, pipelined=True)
+            elapsed = time.perf_counter() - start
+        reference = {name: record['rain_current'] for name, record in grid.items()}
+        report(f'uniform {RADIUS_POINT} km (reference)', 2 * len(grid), elapsed, reference, reference)
+
+        for budget in BUDGETS:
+            clearCaches()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                tree = AdaptiveGrid.buildTree(DIST, LAT, LON, COARSE, budget, RAIN_THRESHOLD, POP_THRESHOLD)
+            elapsed = time.perf_counter() - start
+
+            values = {name: (AdaptiveGrid.queryTree(tree, *record['coord']) or {}).get('rain_current') for name, record in grid.items()}
+            report(f'adaptive (budget {budget})', tree['calls'], elapsed, values, reference)
+
+            # A uniform grid of samples with about the same number of calls
+            clearCaches()
+            coarse = COARSE
+            while 2 * len(QueryPlan.planSamples(QueryPlan.buildPlan(DIST, LAT, LON, RADIUS_POINT, coarse_point=coarse * 0.9))) <= tree['calls']:
+                coarse *= 0.9
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                plan = QueryPlan.buildPlan(DIST, LAT, LON, RADIUS_POINT, coarse_point=coarse)
+                weather = WeatherInfoJunction.weatherPoints(DIST, LAT, LON, 2, RADIUS_POINT, plan)
+            elapsed = time.perf_counter() - start
+
+            values = {name: record['rain_current'] for name, record in weather.items()}
+            report(f'uniform samples {coarse:.0f} km', 2 * len(QueryPlan.planSamples(plan)), elapsed, values, reference)
+    finally:
+        MockServer.stopServer(server)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import Attenuation
+import MathOthers
+import MockServer
+
+"""
+Measures the rain attenuation grid (see 'Attenuation' module): the time to build it from a weather result, and the time of a
+routing query (the attenuation at a coordinate, for every rain field and frequency) with the grid against the per-query work
+without it (finding the nearest location in the result dictionary and computing k * R ** alpha).
+
+The weather result is synthetic (a grid of points with the mock rain field), so no server is needed.
+
+Usage:
+    python BenchAttenuation.py [points_spacing_km]
+"""
+
+DIST, LAT, LON = 500, 13.0, 10.0
+QUERIES = 2000
+
+def syntheticWeather(spacing):
+    grid = MathOthers.getGrid(DIST, LAT, LON, spacing)
+    weather = {}
+    for number, (lat, lon) in enumerate(zip(grid['lat'].tolist(), grid['lon'].tolist()), start=1):
+        weather[f'point{number}'] = {
+            'coord': (lat, lon),
+            'weather': {'rain_3h': MockServer.fakeRain(lat, lon, 1), 'percent_3h': 0.5, 'rain_6h': MockServer.fakeRain(lat, lon, 2), 'percent_6h': 0.5},
+            'rain_current': MockServer.fakeRain(lat, lon)
+        }
+    return weather
+
+def perQuery(weather, lat, lon):
+    # Without the grid: the nearest location of the result, then the physics of each field and frequency
+    name = min(weather, key=lambda name: MathOthers.haversineDist((lat, lon), weather[name]['coord']))
+    record = weather[name]
+    rates = [record['rain_current'], record['weather']['rain_3h'] / 3, record['weather']['rain_6h'] / 3]
+    return Attenuation.specificAttenuation(rates, Attenuation.FREQUENCIES)
+
+def main():
+    spacing = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    weather = syntheticWeather(spacing)
+
+    rng = np.random.default_rng(0)
+    lats = LAT + rng.uniform(-3, 3, QUERIES)
+    lons = LON + rng.uniform(-3, 3, QUERIES)
+
+    start = time.perf_counter()
+    grid = Attenuation.buildAttenuationGrid(weather)
+    build = time.perf_counter() - start
+    print(f"{len(weather)} locations -> grid of {grid['rows']} x {grid['cols']} cells, {len(grid['fields'])} fields, "
+          f"{len(grid['frequencies'])} frequencies, {grid['attenuation'].nbytes / 1024:.0f} KiB, built in {build * 1000:.1f} ms")
+
+    cases = [
+        ('dictionary + physics', lambda lat, lon: perQuery(weather, lat, lon), 50),
+        ('grid, nearest', lambda lat, lon: Attenuation.lookupAttenuation(grid, lat, lon), QUERIES),
+        ('grid, bilinear', lambda lat, lon: Attenuation.lookupAttenuation(grid, lat, lon, bilinear=True), QUERIES),
+    ]
+
+    print(f"\n{'query':<24} {'us/query':>10}")
+    for label, function, count in cases:
+        start = time.perf_counter()
+        for lat, lon in zip(lats[:count].tolist(), lons[:count].tolist()):
+            function(lat, lon)
+        print(f"{label:<24} {(time.perf_counter() - start) / count * 1e6:>10.2f}")
+
+    for label, bilinear in [('grid, nearest (batch)', False), ('grid, bilinear (batch)', True)]:
+        start = time.perf_counter()
+        Attenuation.lookupAttenuation(grid, lats, lons, bilinear)
+        print(f"{label:<24} {(time.perf_counter() - start) / QUERIES * 1e6:>10.3f}")
+
+if __name__ == '__main__':
+    main()
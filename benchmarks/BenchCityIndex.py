@@ -0,0 +1,63 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import pandas as pd
+
+import Fixtures
+import MathOthers
+
+"""
+Micro-benchmark of the city radius query: the previous pandas bounding-box filter against the resident spatial index
+of 'MathOthers'.
+
+'pandas (read)' reads the CSV file and filters it on every query, as 'getCities()' did before the index.
+'pandas (loaded)' filters an already loaded DataFrame, to separate the filter cost from the file reading.
+'index' is 'MathOthers.citiesWithin()' on the resident index.
+
+Usage:
+    python BenchCityIndex.py [cities_directory]
+"""
+
+DISTANCES = [50, 200, 500]
+QUERIES = 200
+
+def pandasFilter(df, dist, lat1, lon1):
+    lat_max, lat_min, lon_max, lon_min = MathOthers.rangePoints(dist, lat1, lon1)
+    filtered_df = df[(df['lat'] >= lat_min) & (df['lat'] <= lat_max) & (df['lng'] >= lon_min) & (df['lng'] <= lon_max)]
+    return {row['city']: {'coord': (row['lat'], row['lng'])} for _, row in filtered_df.iterrows()}
+
+def pandasRead(dist, lat1, lon1):
+    return pandasFilter(pd.read_csv(MathOthers.CITIES_FILE, usecols=['city', 'lat', 'lng']), dist, lat1, lon1)
+
+def timePerQuery(function, centers, dist, repeat):
+    start = time.perf_counter()
+    for lat1, lon1 in centers[:repeat]:
+        function(dist, lat1, lon1)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.gettempdir(), 'owm-bench')
+    Fixtures.useCityTable(directory)
+
+    rng = random.Random(0)
+    centers = [(rng.gauss(38.72, 3), rng.gauss(-9.14, 3)) for _ in range(QUERIES)]
+    df = pd.read_csv(MathOthers.CITIES_FILE, usecols=['city', 'lat', 'lng'])
+
+    start = time.perf_counter()
+    MathOthers.loadCityIndex()
+    print(f"index built in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    print(f"{'dist (km)':>10} {'pandas (read) us':>17} {'pandas (loaded) us':>19} {'index us':>9}")
+    for dist in DISTANCES:
+        read = timePerQuery(pandasRead, centers, dist, 5)
+        loaded = timePerQuery(lambda *args: pandasFilter(df, *args), centers, dist, 20)
+        index = timePerQuery(MathOthers.citiesWithin, centers, dist, QUERIES)
+        print(f"{dist:>10} {read:>17.0f} {loaded:>19.0f} {index:>9.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import Fixtures
+import MathOthers
+import MockServer
+
+"""
+Measures the cold start of a single small query: a new Python process that imports the program, loads the cities and gets the
+weather of the cities within a short distance, against the local mock OpenWeatherMap server.
+
+'csv' removes the binary city database before each run, so the process imports pandas, parses the whole CSV file (as every run
+did before the database) and saves the database again. 'binary database' memory-maps the database saved by the previous run.
+The query itself is the same in both cases, so the difference is the time to load the cities.
+
+Usage:
+    python BenchColdStart.py [--runs 5] [--dist 50] [--latency 0.005] [--cities-dir DIR]
+"""
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+LAT, LON = 38.72, -9.14
+
+QUERY = """
+import sys, time
+start = time.perf_counter()
+import HttpClient, FetchEngine, QueryPlan, WeatherInfoJunction
+imported = time.perf_counter()
+HttpClient.configure(root=sys.argv[1])
+FetchEngine.setRateLimit(None)
+dist, lat, lon = float(sys.argv[2]), float(sys.argv[3]), float(sys.argv[4])
+weather = WeatherInfoJunction.weatherCities(dist, lat, lon, 0, QueryPlan.buildPlan(dist, lat, lon, dist / 2))
+done = time.perf_counter()
+print(imported - start, done - imported, len(weather), 'pandas' in sys.modules)
+"""
+
+def runQuery(url, dist):
+    """
+    Runs the query in a new process. Returns the wall time, the import time, the query time, the number of cities and if pandas was imported.
+    """
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', QUERY, url, str(dist), str(LAT), str(LON)], cwd=os.getcwd(), capture_output=True,
+                            text=True, check=True, env=dict(os.environ, PYTHONPATH=APP_DIR)).stdout
+    wall = time.perf_counter() - start
+
+    imported, query, cities, pandas = output.split()[-4:]
+    return wall, float(imported), float(query), int(cities), pandas == 'True'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures the cold start of a single small query.")
+    parser.add_argument('--runs', type=int, default=5, help="runs of each case (the median is reported)")
+    parser.add_argument('--dist', type=float, default=50, help="distance of the query, in km")
+    parser.add_argument('--latency', type=float, default=0.005, help="latency, in seconds, of the mock server")
+    parser.add_argument('--cities-dir', default=os.path.join(tempfile.gettempdir(), 'owm-bench'), help="directory of the synthetic cities file")
+    args = parser.parse_args(argv)
+
+    path = Fixtures.useCityTable(args.cities_dir)
+    dbPath = os.path.splitext(path)[0] + MathOthers.CITY_DB_SUFFIX
+    server = MockServer.startServer(args.latency)
+
+    print(f"{'case':<18} {'wall (ms)':>10} {'import (ms)':>12} {'query (ms)':>11} {'cities':>7} {'pandas':>7}")
+    try:
+        for case in ('csv', 'binary database'):
+            runs = []
+            for _ in range(args.runs):
+                if case == 'csv':
+                    shutil.rmtree(dbPath, ignore_errors=True)
+                runs.append(runQuery(server.url, args.dist))
+
+            wall, imported, query = (statistics.median(run[i] for run in runs) * 1000 for i in range(3))
+            print(f"{case:<18} {wall:>10.1f} {imported:>12.1f} {query:>11.1f} {runs[-1][3]:>7} {str(runs[-1][4]):>7}")
+    finally:
+        MockServer.stopServer(server)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import CurrentWeather
+import FetchEngine
+import ForecastWeather
+import HttpClient
+import MathOthers
+import MockServer
+import WeatherCache
+
+"""
+Benchmarks the throughput of the concurrent fetch engine against the local mock OpenWeatherMap server.
+
+The same grid of points is fetched with an increasing concurrency limit, and the number of requests per second is reported,
+along with the number of connections opened and reused by the shared 'HttpClient' session.
+
+Usage:
+    python BenchConcurrency.py [latency_seconds]
+"""
+
+WORKERS = [1, 2, 4, 8, 16, 32]
+DIST, LAT, LON, RADIUS_POINT = 200, 38.72, -9.14, 40
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+    server = MockServer.startServer(latency)
+    HttpClient.configure(root=server.url)
+    FetchEngine.setRateLimit(None)
+
+    total = len(MathOthers.getPoints(DIST, LAT, LON, RADIUS_POINT))
+    print(f"{total} points, {latency * 1000:.0f} ms latency per request\n")
+    print(f"{'workers':>8} {'seconds':>9} {'req/s':>8} {'speedup':>8} {'opened':>7} {'reused':>7}")
+
+    baseline = None
+    try:
+        for workers in WORKERS:
+            HttpClient.configure()
+            WeatherCache.cacheClear(CurrentWeather.cache)
+            WeatherCache.cacheClear(ForecastWeather.store)
+            start = time.perf_counter()
+            CurrentWeather.curWeatherPoints(DIST, LAT, LON, RADIUS_POINT, maxWorkers=workers)
+            ForecastWeather.forWeatherPoints(DIST, LAT, LON, RADIUS_POINT, maxWorkers=workers)
+            elapsed = time.perf_counter() - start
+
+            baseline = baseline or elapsed
+            stats = HttpClient.connectionStats()
+            print(f"{workers:>8} {elapsed:>9.2f} {2 * total / elapsed:>8.1f} {baseline / elapsed:>7.1f}x {stats['opened']:>7} {stats['reused']:>7}")
+    finally:
+        MockServer.stopServer(server)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import Fixtures
+import Geocoder
+import HttpClient
+import MockServer
+
+"""
+Measures how long it takes to resolve the center points of a batch run given by city name (see 'Geocoder' module):
+
+- 'api': every name is requested from the Geocoding API (of the local mock server), as before the name index.
+- 'name index': the names are found in the cities file; the first lookup also builds the index.
+- 'cached api': names that are not in the cities file, already answered by the API in an earlier run (from the SQLite cache).
+
+Usage:
+    python BenchGeocoder.py [jobs] [latency_seconds]
+"""
+
+def timed(function, names):
+    start = time.perf_counter()
+    for name, code in names:
+        function(name, code)
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    Fixtures.useCityTable(os.path.join(tempfile.gettempdir(), 'owm-bench'))
+    server = MockServer.startServer(latency)
+    HttpClient.configure(root=server.url)
+
+    Geocoder.CACHE_FILE = os.path.join(tempfile.mkdtemp(prefix='owm-geocode-'), 'geocode.sqlite')
+    names = [(f'city{number * 97}', 'cc') for number in range(jobs)]
+    unknown = [(f'Town {number}', 'CC') for number in range(jobs)]
+
+    try:
+        print(f"{jobs} cities, {latency * 1000:.0f} ms API latency\n")
+        print(f"{'geocoding':<24} {'total (ms)':>11} {'per city (ms)':>14}")
+
+        cases = [
+            ('api', Geocoder.fetchCity, names),
+            ('name index (first)', Geocoder.geocode, names[:1]),
+            ('name index', Geocoder.geocode, names),
+        ]
+        for label, function, batch in cases:
+            elapsed = timed(function, batch)
+            print(f"{label:<24} {elapsed:>11.1f} {elapsed / len(batch):>14.3f}")
+
+        timed(Geocoder.geocode, unknown)
+        # A new run: the answers are only in the SQLite file
+        Geocoder.cache = None
+        elapsed = timed(Geocoder.geocode, unknown)
+        print(f"{'cached api':<24} {elapsed:>11.1f} {elapsed / len(unknown):>14.3f}")
+    finally:
+        MockServer.stopServer(server)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import MathOthers
+
+"""
+Benchmarks the generation of the grid of points: the previous point-by-point loop of 'getPoints()' against the vectorized
+'MathOthers.getGrid()' (arrays only) and 'MathOthers.getPoints()' (arrays converted to the dictionary of points).
+
+Usage:
+    python BenchGrid.py
+"""
+
+DIST, LAT, LON = 500, 38.72, -9.14
+SPACINGS = [100, 40, 10, 2, 0.5]
+
+def loopPoints(dist, lat1, lon1, radius_point):
+    lat_max, lat_min, lon_max, lon_min = MathOthers.rangePoints(dist, lat1, lon1)
+    lat_control, lon_control = lat_max, lon_min
+    points = {}
+    pointIndex = 1
+
+    while lat_min <= lat_control <= lat_max:
+        while lon_min <= lon_control <= lon_max:
+            lon_control = round(MathOthers.getPoint_(radius_point, math.pi/2, lat_control, lon_control)[1], 4)
+            points['point' + str(pointIndex)] = {'coord': (lat_control, lon_control)}
+            pointIndex += 1
+        lat_control = round(MathOthers.getPoint_(radius_point, math.pi, lat_control, lon_min)[0], 4)
+        lon_control = lon_min
+
+    return points
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    print(f"{'spacing (km)':>13} {'points':>9} {'loop (s)':>9} {'getGrid (s)':>12} {'getPoints (s)':>14}")
+
+    for spacing in SPACINGS:
+        grid, gridTime = timed(MathOthers.getGrid, DIST, LAT, LON, spacing)
+        count = len(grid['lat'])
+
+        if count <= 10 ** 6:
+            _, pointsTime = timed(MathOthers.getPoints, DIST, LAT, LON, spacing)
+            pointsTime = f"{pointsTime:>14.3f}"
+        else:
+            pointsTime = f"{'-':>14}"
+
+        if count <= 2 * 10 ** 5:
+            _, loopTime = timed(loopPoints, DIST, LAT, LON, spacing)
+            loopTime = f"{loopTime:>9.3f}"
+        else:
+            loopTime = f"{'-':>9}"
+
+        print(f"{spacing:>13} {count:>9} {loopTime} {gridTime:>12.4f} {pointsTime}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import MathOthers
+
+"""
+Benchmarks the land/sea filtering of 'WeatherInfoJunction.weatherBoth()': the previous loop of 'haversineDist()' calls with
+'list.remove()', against 'MathOthers.anyWithin()'. Both are checked to keep the same points.
+
+Usage:
+    python BenchHaversine.py
+"""
+
+SIZES = [(100, 100), (500, 1000), (1000, 2000), (5000, 5000)]
+RADIUS_POINT = 20
+
+def loopFilter(cities, points):
+    pointCoords = list(points)
+    for city_coord in cities:
+        distances = [MathOthers.haversineDist(city_coord, point) for point in points]
+        for point, distance in zip(points, distances):
+            if distance < RADIUS_POINT and point in pointCoords:
+                pointCoords.remove(point)
+    return pointCoords
+
+def maskFilter(cities, points):
+    nearCity = MathOthers.anyWithin(points, cities, RADIUS_POINT)
+    return [point for point, near in zip(points, nearCity) if not near]
+
+def main():
+    rng = random.Random(0)
+    print(f"{'cities':>7} {'points':>7} {'loop (s)':>9} {'anyWithin (s)':>14} {'same':>5}")
+
+    for cityCount, pointCount in SIZES:
+        cities = [(rng.uniform(36, 42), rng.uniform(-12, -6)) for _ in range(cityCount)]
+        points = [(rng.uniform(36, 42), rng.uniform(-12, -6)) for _ in range(pointCount)]
+
+        start = time.perf_counter()
+        vectorized = maskFilter(cities, points)
+        vectorTime = time.perf_counter() - start
+
+        if cityCount * pointCount <= 2 * 10 ** 6:
+            start = time.perf_counter()
+            looped = loopFilter(cities, points)
+            loopTime = f"{time.perf_counter() - start:>9.2f}"
+            same = 'yes' if looped == vectorized else 'no'
+        else:
+            loopTime, same = f"{'-':>9}", '-'
+
+        print(f"{cityCount:>7} {pointCount:>7} {loopTime} {vectorTime:>14.4f} {same:>5}")
+
+if __name__ == '__main__':
+    main()
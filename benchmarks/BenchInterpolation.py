@@ -0,0 +1,83 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import CurrentWeather
+import FetchEngine
+import Fixtures
+import ForecastWeather
+import HttpClient
+import MockServer
+import QueryPlan
+import WeatherCache
+import WeatherInfoJunction
+
+"""
+Compares a dense grid fetched point by point with the interpolation mode, where only a coarse grid of samples is fetched and the
+points are interpolated from them (see 'Interpolation' module).
+
+For each distance between samples, the script reports the requests sent to the mock server, the total time, and the mean and
+maximum absolute error of 'rain_current' and 'rain_3h' against the fetched grid (the mock rain field is smooth, so the errors
+are a lower bound of the errors with real weather). The center is in a rainy part of the mock field.
+
+Usage:
+    python BenchInterpolation.py [latency_seconds]
+"""
+
+DIST, LAT, LON, RADIUS_POINT = 300, 13.0, 10.0, 10
+COARSE = [None, 30, 60, 100]
+
+def clearCaches():
+    WeatherCache.cacheClear(CurrentWeather.cache)
+    WeatherCache.cacheClear(ForecastWeather.store)
+
+def errors(weather, reference, field):
+    diffs = []
+    for name, record in reference.items():
+        value = record.get(field) if field == 'rain_current' else (record.get('weather') or {}).get(field)
+        other = weather[name].get(field) if field == 'rain_current' else (weather[name].get('weather') or {}).get(field)
+        if value is not None and other is not None:
+            diffs.append(abs(value - other))
+
+    return sum(diffs) / len(diffs), max(diffs)
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.005
+    Fixtures.useCityTable(os.path.join(tempfile.gettempdir(), 'owm-bench'))
+    server = MockServer.startServer(latency)
+    HttpClient.configure(root=server.url)
+    FetchEngine.setRateLimit(None)
+
+    print(f"{'samples (km)':>12} {'points':>7} {'interpolated':>13} {'requests':>9} {'seconds':>8} "
+          f"{'current MAE':>12} {'current max':>12} {'3h MAE':>8} {'3h max':>8}")
+    try:
+        reference = None
+        for coarse in COARSE:
+            clearCaches()
+            requests = server.stats['requests']
+            start = time.perf_counter()
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                plan = QueryPlan.buildPlan(DIST, LAT, LON, RADIUS_POINT, coarse_point=coarse)
+                weather = WeatherInfoJunction.weatherPoints(DIST, LAT, LON, 2, RADIUS_POINT, plan, pipelined=True)
+
+            elapsed = time.perf_counter() - start
+            requests = server.stats['requests'] - requests
+            reference = reference or weather
+
+            interpolated = sum(1 for record in weather.values() if record.get('interpolated'))
+            currentMae, currentMax = errors(weather, reference, 'rain_current')
+            forecastMae, forecastMax = errors(weather, reference, 'rain_3h')
+            label = 'all' if coarse is None else coarse
+            print(f"{label:>12} {len(weather):>7} {interpolated:>13} {requests:>9} {elapsed:>8.2f} "
+                  f"{currentMae:>12.3f} {currentMax:>12.3f} {forecastMae:>8.3f} {forecastMax:>8.3f}")
+    finally:
+        MockServer.stopServer(server)
+
+if __name__ == '__main__':
+    main()
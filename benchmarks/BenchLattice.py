@@ -0,0 +1,58 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import CurrentWeather
+import FetchEngine
+import HttpClient
+import MockServer
+import QueryPlan
+import WeatherCache
+
+"""
+Measures how many API calls the global lattice saves on a synthetic workload of overlapping queries.
+
+The same queries (centers scattered around one region) are run with the grid built from each center and with the global lattice
+of the 'Lattice' module, with the current weather cache shared between queries. The script reports the number of points
+requested by the queries, the number of requests that reached the mock server, and the fraction of calls saved by the cache.
+
+Usage:
+    python BenchLattice.py [queries]
+"""
+
+DIST, LAT, LON, RADIUS_POINT = 100, 38.72, -9.14, 20
+SPREAD = 0.5
+
+def runWorkload(server, centers, lattice):
+    WeatherCache.cacheClear(CurrentWeather.cache)
+    server.stats['requests'] = 0
+    points = 0
+
+    for lat1, lon1 in centers:
+        plan = QueryPlan.buildPlan(DIST, lat1, lon1, RADIUS_POINT, lattice)
+        points += len(CurrentWeather.curWeatherPoints(DIST, lat1, lon1, RADIUS_POINT, plan=plan))
+
+    return points, server.stats['requests']
+
+def main():
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rng = random.Random(0)
+    centers = [(LAT + rng.uniform(-SPREAD, SPREAD), LON + rng.uniform(-SPREAD, SPREAD)) for _ in range(queries)]
+
+    server = MockServer.startServer(0)
+    HttpClient.configure(root=server.url)
+    FetchEngine.setRateLimit(None)
+
+    print(f"{queries} queries of {DIST} km with {RADIUS_POINT} km between points, centers within {SPREAD} degrees\n")
+    print(f"{'mode':>8} {'points':>8} {'requests':>9} {'saved':>7}")
+    try:
+        for name, lattice in [('grid', False), ('lattice', True)]:
+            points, requests = runWorkload(server, centers, lattice)
+            print(f"{name:>8} {points:>8} {requests:>9} {1 - requests / points:>7.1%}")
+    finally:
+        MockServer.stopServer(server)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import MathOthers
+import MockServer
+import OutputFormats
+
+"""
+Compares the output formats of the 'OutputFormats' module on large grid results: the time to write the file, the time to read it
+back, and its size. The formats whose package is not installed are reported as such.
+
+The weather results are synthetic (grids of points with the mock rain field), so no server is needed. Before the timings, a result
+with a city whose forecast request failed is written in each columnar format and read back, to check that it is still a city.
+
+Usage:
+    python BenchOutputFormats.py [points_spacing_km ...]
+"""
+
+LAT, LON = 13.0, 10.0
+DIST = 2000
+
+def syntheticWeather(spacing):
+    grid = MathOthers.getGrid(DIST, LAT, LON, spacing)
+    weather = {}
+    for number, (lat, lon) in enumerate(zip(grid['lat'].tolist(), grid['lon'].tolist()), start=1):
+        weather[f'point{number}'] = {
+            'coord': (lat, lon),
+            'weather': {'rain_3h': MockServer.fakeRain(lat, lon, 1), 'percent_3h': 0.5, 'rain_6h': MockServer.fakeRain(lat, lon, 2), 'percent_6h': 0.5},
+            'rain_current': MockServer.fakeRain(lat, lon)
+        }
+    return weather
+
+def checkKinds(directory):
+    # 'Porto' has no forecast, as when its request fails; only the forecast key tells that it is a city
+    weather = {
+        'Lisbon': {'coord': (38.72, -9.14), 'rain_forecast': {'rain_3h': 1.0, 'percent_3h': 0.5, 'rain_6h': 2.0, 'percent_6h': 0.5}, 'rain_current': 0.5},
+        'Porto': {'coord': (41.15, -8.61), 'rain_current': 0.5},
+        'point1': {'coord': (40.0, -9.0), 'rain_current': None}
+    }
+    forecastKey = {'Lisbon': 'rain_forecast', 'Porto': 'rain_forecast', 'point1': 'weather'}
+
+    for fmt in ('npz', 'parquet'):
+        path = os.path.join(directory, 'kinds' + OutputFormats.EXTENSIONS[fmt])
+        try:
+            OutputFormats.writeResult(weather, path, fmt, forecastKey)
+            result = OutputFormats.readResult(path, fmt)
+        except ImportError:
+            continue
+
+        kinds = dict(zip(result.store['names'], result.store['rows']['kind'][:result.store['count']].tolist()))
+        assert kinds == {'Lisbon': 0, 'Porto': 0, 'point1': 1}, f"{fmt}: wrong location kinds {kinds}"
+
+def main():
+    spacings = [float(value) for value in sys.argv[1:]] or [20, 10]
+    directory = tempfile.mkdtemp(prefix='owm-formats-')
+    checkKinds(directory)
+
+    for spacing in spacings:
+        weather = syntheticWeather(spacing)
+        print(f"\n{len(weather)} points ({spacing:g} km)")
+        print(f"{'format':<10} {'write (ms)':>11} {'read (ms)':>10} {'size (MiB)':>11}")
+
+        for fmt in OutputFormats.FORMATS:
+            path = os.path.join(directory, 'weather' + OutputFormats.EXTENSIONS[fmt])
+            try:
+                start = time.perf_counter()
+                OutputFormats.writeResult(weather, path, fmt)
+                write = time.perf_counter() - start
+
+                start = time.perf_counter()
+                result = OutputFormats.readResult(path, fmt)
+                read = time.perf_counter() - start
+            except ImportError:
+                print(f"{fmt:<10} {'(package not installed)':>34}")
+                continue
+
+            assert len(result) == len(weather)
+            print(f"{fmt:<10} {write * 1000:>11.0f} {read * 1000:>10.0f} {os.path.getsize(path) / 2 ** 20:>11.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import CurrentWeather
+import FetchEngine
+import Fixtures
+import ForecastWeather
+import HttpClient
+import MockServer
+import QueryPlan
+import WeatherCache
+import WeatherInfoJunction
+
+"""
+Compares the two-pass 'weatherPoints' (every current weather request, then every forecast request) with the pipelined mode,
+where the two requests of each point are sent together and each record is finished as soon as both arrive.
+
+For each mode, the script reports the time until the first record is finished, the total time and the peak memory (tracemalloc),
+and checks that both modes return the same records.
+
+Usage:
+    python BenchPipeline.py [latency_seconds]
+"""
+
+DIST, LAT, LON, RADIUS_POINT = 300, 38.72, -9.14, 60
+
+def clearCaches():
+    WeatherCache.cacheClear(CurrentWeather.cache)
+    WeatherCache.cacheClear(ForecastWeather.store)
+
+def twoPass(server):
+    # The two-pass functions only return at the end, so the first record is ready when the last forecast arrives
+    plan = QueryPlan.buildPlan(DIST, LAT, LON, RADIUS_POINT)
+    weather = WeatherInfoJunction.weatherPoints(DIST, LAT, LON, 2, RADIUS_POINT, plan)
+    return weather, time.perf_counter()
+
+def pipelined(server):
+    plan = QueryPlan.buildPlan(DIST, LAT, LON, RADIUS_POINT)
+    points = QueryPlan.planPoints(plan)
+    weather = dict.fromkeys(points)
+    first = None
+
+    for name, record in WeatherInfoJunction.streamWeather(points, 'weather', priority=FetchEngine.nearestFirst(LAT, LON)):
+        first = first or time.perf_counter()
+        weather[name] = record
+
+    return weather, first
+
+def measure(server, function):
+    clearCaches()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        weather, first = function(server)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return weather, first - start, elapsed, peak
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+    Fixtures.useCityTable(os.path.join(tempfile.gettempdir(), 'owm-bench'))
+    server = MockServer.startServer(latency)
+    HttpClient.configure(root=server.url)
+    FetchEngine.setRateLimit(None)
+
+    print(f"{'mode':<10} {'points':>7} {'first (s)':>10} {'total (s)':>10} {'peak (KiB)':>11}")
+    try:
+        results = {}
+        for label, function in [('two-pass', twoPass), ('pipelined', pipelined)]:
+            weather, first, elapsed, peak = measure(server, function)
+            results[label] = weather
+            print(f"{label:<10} {len(weather):>7} {first:>10.3f} {elapsed:>10.3f} {peak / 1024:>11.0f}")
+
+        print(f"\nSame records: {results['two-pass'] == results['pipelined']}")
+    finally:
+        MockServer.stopServer(server)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import CurrentWeather
+import FetchEngine
+import Fixtures
+import ForecastWeather
+import HttpClient
+import MathOthers
+import MockServer
+import QueryPlan
+import WeatherCache
+import WeatherInfoJunction
+
+"""
+Benchmarks a menu choice [3] request (weather on land and at sea) with and without a shared query plan.
+
+'legacy' repeats the call pattern used before the 'QueryPlan' module existed, where every function resolved the cities and
+grid points on its own. 'plan' builds the query plan once. For each, the script reports the number of times the cities file
+was read, the time until the first request reached the mock server, the total time and the peak memory (tracemalloc).
+
+Usage:
+    python BenchPlan.py [cities_directory]
+"""
+
+DIST, LAT, LON, RADIUS_POINT = 200, 38.72, -9.14, 40
+
+def legacyBoth():
+    CurrentWeather.curWeatherCities(DIST, LAT, LON)
+    ForecastWeather.forWeatherCities(DIST, LAT, LON)
+    CurrentWeather.curWeatherPoints(DIST, LAT, LON, RADIUS_POINT)
+    ForecastWeather.forWeatherPoints(DIST, LAT, LON, RADIUS_POINT)
+    MathOthers.getCities(DIST, LAT, LON)
+    MathOthers.getPoints(DIST, LAT, LON, RADIUS_POINT)
+
+def plannedBoth():
+    plan = QueryPlan.buildPlan(DIST, LAT, LON, RADIUS_POINT)
+    WeatherInfoJunction.weatherBoth(DIST, LAT, LON, 3, plan)
+
+def measure(server, function):
+    reads = {'count': 0}
+    getCities = MathOthers.getCities
+
+    def countingGetCities(*args):
+        reads['count'] += 1
+        return getCities(*args)
+
+    MathOthers.getCities = countingGetCities
+    WeatherCache.cacheClear(CurrentWeather.cache)
+    WeatherCache.cacheClear(ForecastWeather.store)
+    with server.statsLock:
+        server.stats['first'] = None
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        function()
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        MathOthers.getCities = getCities
+
+    return reads['count'], server.stats['first'] - start, elapsed, peak
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.gettempdir(), 'owm-bench')
+    Fixtures.useCityTable(directory)
+
+    server = MockServer.startServer(0.005)
+    HttpClient.configure(root=server.url)
+    FetchEngine.setRateLimit(None)
+
+    print(f"{'mode':>8} {'csv reads':>10} {'first req (s)':>14} {'total (s)':>10} {'peak (MB)':>10}")
+    try:
+        for name, function in [('legacy', legacyBoth), ('plan', plannedBoth)]:
+            reads, first, total, peak = measure(server, function)
+            print(f"{name:>8} {reads:>10} {first:>14.3f} {total:>10.3f} {peak / 2 ** 20:>10.1f}")
+    finally:
+        MockServer.stopServer(server)
+
+if __name__ == '__main__':
+    main()
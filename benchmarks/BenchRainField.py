@@ -0,0 +1,126 @@
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import Lattice
+import MathOthers
+import RainField
+
+"""
+Measures the memory-mapped rain field file (see 'RainField' module) against the JSON export, and checks that readers in other
+processes never see a partial update.
+
+1. Export: the time to write a weather result (JSON file, or an in-place update of the rain field), and the time for a consumer
+   process to get the values of some coordinates (parse the whole JSON file, or map the rain field and read the cells).
+2. Consistency: a writer updates the same cells continuously, each update with a single value (the update number) in every cell
+   and field, while reader processes check that every read has a single value. Unprotected reads (the active buffer, without the
+   sequence counter) are counted too, to show what the protocol prevents.
+
+Usage:
+    python BenchRainField.py [seconds]
+"""
+
+DIST, LAT, LON, LEVEL = 500, 13.0, 10.0, 25
+READERS = 3
+QUERIES = 1000
+
+def syntheticWeather(grid, value=None):
+    weather = {}
+    for name, lat, lon in zip(grid['ids'], grid['lat'].tolist(), grid['lon'].tolist()):
+        rain = value if value is not None else round(abs(lat - LAT), 2)
+        weather[name] = {'coord': (lat, lon), 'weather': {'rain_3h': rain, 'percent_3h': rain, 'rain_6h': rain, 'percent_6h': rain},
+                         'rain_current': rain}
+    return weather
+
+def readJson(path, lats, lons):
+    with open(path) as infile:
+        weather = json.load(infile)
+    ids = Lattice.cellIds(LEVEL, *Lattice.snapToLattice(LEVEL, lats, lons))
+    return [weather.get(name, {}).get('rain_current') for name in ids]
+
+def readField(path, lats, lons):
+    field = RainField.openRainField(path)
+    values, sequence = RainField.readRainField(field, lats, lons)
+    RainField.closeRainField(field)
+    return values['rain_current']
+
+def reader(path, cells, stop, results):
+    field = RainField.openRainField(path)
+    reads = torn = naive = naiveTorn = 0
+
+    while not stop.is_set():
+        values, sequence = RainField.readRainField(field, *cells)
+        reads += 1
+        torn += int(np.nanmin(values['rain_current']) != np.nanmax([np.nanmax(column) for column in values.values()]))
+
+        unprotected = field['buffers'][int(field['header']['active'][0])][:, RainField.cellIndex(field, *cells)]
+        naive += 1
+        naiveTorn += int(np.nanmin(unprotected) != np.nanmax(unprotected))
+
+    results.put((reads, torn, naive, naiveTorn))
+    RainField.closeRainField(field)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    directory = tempfile.mkdtemp(prefix='owm-rainfield-')
+    jsonPath = os.path.join(directory, 'weather.json')
+    fieldPath = os.path.join(directory, 'rain.field')
+
+    grid = Lattice.getLatticeGrid(DIST, LAT, LON, LEVEL)
+    weather = syntheticWeather(grid)
+    rng = np.random.default_rng(0)
+    lats = LAT + rng.uniform(-4, 4, QUERIES)
+    lons = LON + rng.uniform(-4, 4, QUERIES)
+
+    created = timed(RainField.createRainField, fieldPath, LEVEL)[1]
+    writable = RainField.openRainField(fieldPath, writable=True)
+
+    print(f"{len(weather)} cells; rain field file of {os.path.getsize(fieldPath) / 2 ** 20:.1f} MiB created in {created:.0f} ms\n")
+    print(f"{'export':<12} {'write (ms)':>11} {'read {} coords (ms)'.format(QUERIES):>22}")
+    write = timed(MathOthers.writeJson, weather, jsonPath)[1]
+    fromJson, read = timed(readJson, jsonPath, lats, lons)
+    print(f"{'json':<12} {write:>11.1f} {read:>22.1f}")
+    write = timed(RainField.updateRainField, writable, weather)[1]
+    fromField, read = timed(readField, fieldPath, lats, lons)
+    print(f"{'rain field':<12} {write:>11.1f} {read:>22.1f}")
+    assert all((a is None and np.isnan(b)) or abs(a - b) < 1e-3 for a, b in zip(fromJson, fromField.tolist()))
+
+    # Consistency under continuous updates, with readers in other processes; every cell starts with the same value
+    RainField.updateRainField(writable, syntheticWeather(grid, 0.0))
+    cells = (grid['lat'], grid['lon'])
+    stop = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    readers = [multiprocessing.Process(target=reader, args=(fieldPath, cells, stop, results)) for _ in range(READERS)]
+    for process in readers:
+        process.start()
+
+    updates = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        updates += 1
+        RainField.updateRainField(writable, syntheticWeather(grid, float(updates)))
+
+    stop.set()
+    totals = np.sum([results.get(timeout=60) for _ in readers], axis=0)
+    for process in readers:
+        process.join()
+    RainField.closeRainField(writable)
+
+    print(f"\n{updates} updates, {READERS} reader processes")
+    print(f"{'protected reads':<18} {totals[0]:>8}   torn: {totals[1]}")
+    print(f"{'unprotected reads':<18} {totals[2]:>8}   torn: {totals[3]}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import CurrentWeather
+import FetchEngine
+import Fixtures
+import HttpClient
+import MockServer
+import QueryPlan
+import WeatherCache
+
+"""
+Measures how a grid larger than the rate limit of the account is fetched, against a mock server that enforces a calls-per-minute limit.
+
+- 'no limit, no retry': requests are sent back to back and the rejected ones are lost (the behavior before the rate limiter).
+- 'no limit, retry': requests are sent back to back, and the rejected ones are retried after the 'Retry-After' pause.
+- 'token bucket': the token bucket of the 'FetchEngine' module is sized to 95% of the limit of the server, so (almost) no request
+  is rejected.
+
+Usage:
+    python BenchRateLimit.py [calls_per_minute]
+"""
+
+DIST, LAT, LON, RADIUS_POINT = 200, 38.72, -9.14, 40
+
+def run(server, callsPerMinute, retries):
+    WeatherCache.cacheClear(CurrentWeather.cache)
+    FetchEngine.setRateLimit(callsPerMinute)
+    FetchEngine.MAX_RETRIES = retries
+    with server.statsLock:
+        server.stats['throttled'] = 0
+    server.tokens = float(MockServer.BURST)
+    time.sleep(1)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        points = CurrentWeather.curWeatherPoints(DIST, LAT, LON, RADIUS_POINT, plan=QueryPlan.buildPlan(DIST, LAT, LON, RADIUS_POINT))
+    elapsed = time.perf_counter() - start
+
+    lost = sum(1 for info in points.values() if info['rain_current'] is None)
+    return len(points), lost, server.stats['throttled'], elapsed
+
+def main():
+    limit = float(sys.argv[1]) if len(sys.argv) > 1 else 1200
+    Fixtures.useCityTable(os.path.join(tempfile.gettempdir(), 'owm-bench'))
+    server = MockServer.startServer(0.01, callsPerMinute=limit)
+    HttpClient.configure(root=server.url)
+    retries = FetchEngine.MAX_RETRIES
+
+    print(f"Mock server limit: {limit:.0f} calls per minute (burst {MockServer.BURST})\n")
+    print(f"{'mode':<22} {'points':>7} {'lost':>6} {'429s':>6} {'seconds':>8} {'calls/min':>10}")
+    try:
+        for label, callsPerMinute, maxRetries in [('no limit, no retry', None, 0), ('no limit, retry', None, retries), ('token bucket', 0.95 * limit, retries)]:
+            points, lost, throttled, elapsed = run(server, callsPerMinute, maxRetries)
+            print(f"{label:<22} {points:>7} {lost:>6} {throttled:>6} {elapsed:>8.2f} {60 * (points - lost) / elapsed:>10.0f}")
+    finally:
+        FetchEngine.MAX_RETRIES = retries
+        MockServer.stopServer(server)
+
+if __name__ == '__main__':
+    main()
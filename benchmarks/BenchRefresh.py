@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import CurrentWeather
+import FetchEngine
+import Fixtures
+import ForecastWeather
+import HttpClient
+import MockServer
+import QueryPlan
+import RefreshScheduler
+import WeatherCache
+import WeatherInfoJunction
+
+"""
+Compares a full refresh (running 'weatherBoth' again) with the incremental refresh of the 'RefreshScheduler' module, against the
+mock OpenWeatherMap server.
+
+The scheduler is ticked at simulated times: before anything is stale, after the current weather interval (with the mock rain
+pattern moved, so part of the locations change) and after the end of the forecast slot.
+
+Usage:
+    python BenchRefresh.py [cities_directory]
+"""
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.gettempdir(), 'owm-bench')
+    Fixtures.useCityTable(directory)
+
+    server = MockServer.startServer(0.01)
+    HttpClient.configure(root=server.url)
+    FetchEngine.setRateLimit(None)
+
+    try:
+        plan = QueryPlan.buildPlan(300, 13.0, 10.0, 30)
+        weather = WeatherInfoJunction.weatherBoth(300, 13.0, 10.0, 3, plan)
+        scheduler = RefreshScheduler.createScheduler(weather, QueryPlan.planForecastKeys(plan))
+        now = time.time()
+
+        WeatherCache.cacheClear(CurrentWeather.cache)
+        WeatherCache.cacheClear(ForecastWeather.store)
+        requests = server.stats['requests']
+        start = time.perf_counter()
+        WeatherInfoJunction.weatherBoth(300, 13.0, 10.0, 3, plan)
+        print(f"{len(weather)} locations. Full refresh: {server.stats['requests'] - requests} requests, "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms, {len(weather)} entries published.\n")
+
+        print(f"{'tick':<28} {'requests':>9} {'changed':>8} {'time (ms)':>10}")
+        ticks = [
+            ('nothing stale', now + 60, 0.0),
+            ('current stale, rain moved', now + RefreshScheduler.CURRENT_INTERVAL, 1.5),
+            ('current stale, no change', now + 2 * RefreshScheduler.CURRENT_INTERVAL, 1.5),
+            ('forecast slot ended', now + ForecastWeather.SLOT, 1.5),
+        ]
+        for label, tick, drift in ticks:
+            server.drift = drift
+            if tick >= now + ForecastWeather.SLOT:
+                # The forecast store expires in real time, so it is cleared to match the simulated time
+                WeatherCache.cacheClear(ForecastWeather.store)
+            requests = server.stats['requests']
+            start = time.perf_counter()
+            changes = RefreshScheduler.refresh(scheduler, now=tick)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<28} {server.stats['requests'] - requests:>9} {len(changes):>8} {elapsed * 1000:>10.1f}")
+    finally:
+        MockServer.stopServer(server)
+
+if __name__ == '__main__':
+    main()
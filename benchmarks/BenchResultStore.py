@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import MockServer
+import ResultStore
+
+"""
+Compares the memory and iteration time of the result dictionaries with the columnar 'ResultStore', for grids of growing size.
+
+The records are synthetic (the same shape as the results of 'weatherPoints'), so no server is needed. For each size, the script
+reports the memory of the dictionary and of the store (tracemalloc), and the time to sum the current rain of every location by
+iterating the dictionary, by iterating the dictionary view over the store, and by summing the store column.
+
+Usage:
+    python BenchResultStore.py
+"""
+
+SIZES = [1000, 10000, 100000]
+
+def makeRecords(count):
+    side = int(count ** 0.5) + 1
+    for i in range(count):
+        lat, lon = 30 + (i // side) * 0.01, -10 + (i % side) * 0.01
+        yield f'point{i + 1}', {
+            'coord': (round(lat, 4), round(lon, 4)),
+            'weather': {'rain_3h': MockServer.fakeRain(lat, lon, 1), 'percent_3h': 35.0, 'rain_6h': MockServer.fakeRain(lat, lon, 2), 'percent_6h': 60.0},
+            'rain_current': MockServer.fakeRain(lat, lon)
+        }
+
+def traced(function):
+    tracemalloc.start()
+    result = function()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+def timed(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    print(f"{'points':>7} {'dict (KiB)':>11} {'store (KiB)':>12} {'dict iter (ms)':>15} {'view iter (ms)':>15} {'column (ms)':>12}")
+    for size in SIZES:
+        weather, dictSize = traced(lambda: dict(makeRecords(size)))
+        view, storeSize = traced(lambda: ResultStore.fromRecords(makeRecords(size)))
+        assert view.copy() == weather
+
+        column = ResultStore.columns(view.store)['rain_current']
+        dictTime = timed(lambda: sum(record['rain_current'] for record in weather.values()))
+        viewTime = timed(lambda: sum(record['rain_current'] for record in view.values()))
+        columnTime = timed(lambda: float(np.nansum(column)))
+
+        print(f"{size:>7} {dictSize / 1024:>11.0f} {storeSize / 1024:>12.0f} {dictTime * 1000:>15.2f} {viewTime * 1000:>15.2f} {columnTime * 1000:>12.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from urllib.request import urlopen
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import FetchEngine
+import Fixtures
+import HttpClient
+import MockServer
+import WeatherService
+
+"""
+Measures the latency of the local weather service ('WeatherService' module) against the mock OpenWeatherMap server.
+
+The same region requests are sent twice: the first round fetches the weather (cold caches), the second round is answered from
+the warm state of the service.
+
+Usage:
+    python BenchService.py [cities_directory]
+"""
+
+REQUESTS = [
+    '/cities?lat=38.72&lon=-9.14&dist=200',
+    '/points?lat=38.72&lon=-9.14&dist=200&spacing=40',
+    '/both?lat=38.72&lon=-9.14&dist=200&spacing=40',
+    '/points?lat=38.9&lon=-9.3&dist=200&spacing=40&lattice=1',
+]
+
+def timedGet(url):
+    start = time.perf_counter()
+    with urlopen(url) as response:
+        payload = json.loads(response.read())
+    return time.perf_counter() - start, payload
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.gettempdir(), 'owm-bench')
+    Fixtures.useCityTable(directory)
+
+    mock = MockServer.startServer(0.02)
+    HttpClient.configure(root=mock.url)
+    FetchEngine.setRateLimit(None)
+    service = WeatherService.startService(port=0)
+
+    print(f"{'request':<58} {'items':>6} {'cold (ms)':>10} {'warm (ms)':>10}")
+    try:
+        for path in REQUESTS:
+            cold, payload = timedGet(service.url + path)
+            warm, _ = timedGet(service.url + path)
+            print(f"{path:<58} {len(payload):>6} {cold * 1000:>10.1f} {warm * 1000:>10.1f}")
+
+        print("\n" + json.dumps(timedGet(service.url + '/stats')[1], indent=2))
+    finally:
+        service.shutdown()
+        MockServer.stopServer(mock)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import CurrentWeather
+import FetchEngine
+import Fixtures
+import ForecastWeather
+import HttpClient
+import MathOthers
+import MockServer
+import QueryPlan
+import WeatherCache
+import WeatherInfoJunction
+
+"""
+Compares writing the weather of growing grids as one JSON document ('weatherPoints' and 'writeJson') with streaming it as NDJSON
+('iterWeatherPoints' and 'writeStream').
+
+For each grid, the script reports the time until the first record is in the output file, the total time and the peak memory
+(tracemalloc) of both ways.
+
+Usage:
+    python BenchStream.py [latency_seconds]
+"""
+
+DIST, LAT, LON = 300, 38.72, -9.14
+SPACINGS = [60, 30, 20]
+
+def clearCaches():
+    WeatherCache.cacheClear(CurrentWeather.cache)
+    WeatherCache.cacheClear(ForecastWeather.store)
+
+def monolithic(spacing, path):
+    plan = QueryPlan.buildPlan(DIST, LAT, LON, spacing)
+    MathOthers.writeJson(WeatherInfoJunction.weatherPoints(DIST, LAT, LON, 2, spacing, plan), path)
+    return time.perf_counter()
+
+def streamed(spacing, path):
+    first = {}
+
+    def timed(records):
+        for item in records:
+            yield item
+            first.setdefault('time', time.perf_counter())
+
+    MathOthers.writeStream(timed(WeatherInfoJunction.iterWeatherPoints(DIST, LAT, LON, spacing)), path)
+    return first['time']
+
+def measure(function, spacing, path):
+    clearCaches()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = function(spacing, path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return first - start, elapsed, peak
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.01
+    directory = os.path.join(tempfile.gettempdir(), 'owm-bench')
+    Fixtures.useCityTable(directory)
+    server = MockServer.startServer(latency)
+    HttpClient.configure(root=server.url)
+    FetchEngine.setRateLimit(None)
+
+    print(f"{'points':>7} {'mode':<8} {'first (s)':>10} {'total (s)':>10} {'peak (KiB)':>11}")
+    try:
+        for spacing in SPACINGS:
+            points = len(MathOthers.getPoints(DIST, LAT, LON, spacing))
+            for label, function, name in [('json', monolithic, 'stream.json'), ('ndjson', streamed, 'stream.ndjson')]:
+                first, elapsed, peak = measure(function, spacing, os.path.join(directory, name))
+                print(f"{points:>7} {label:<8} {first:>10.3f} {elapsed:>10.3f} {peak / 1024:>11.0f}")
+    finally:
+        MockServer.stopServer(server)
+
+if __name__ == '__main__':
+    main()
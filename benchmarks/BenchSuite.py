@@ -0,0 +1,229 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import CurrentWeather
+import DataIntroduction
+import FetchEngine
+import Fixtures
+import ForecastWeather
+import HttpClient
+import MathOthers
+import MockServer
+import QueryPlan
+import WeatherCache
+import WeatherInfoJunction
+
+"""
+Runs the whole benchmark suite offline, against the local mock OpenWeatherMap server, and stores the results so regressions show up.
+
+The suite has two parts:
+
+- End-to-end: 'weatherCities', 'weatherPoints' and 'weatherBoth' for a matrix of distances and distances between points, with cold
+  caches (each case builds its own query plan and fetches every location).
+- Micro-benchmarks: 'getCities', 'getPoints', 'haversineDist' and 'parseWeatherInfo', reported as the time of a single call.
+
+The results are written to a JSON file in 'benchmarks/results'. If a baseline file exists (by default 'results/baseline.json', created
+with '--save-baseline'), every timing is compared with it, and the timings slower than the tolerance are reported as regressions
+(the exit code is then 1). Baselines are only comparable on the same machine and with the same mock server settings.
+
+Usage:
+    python BenchSuite.py [--latency 0.01] [--error-rate 0.0] [--throttle-rate 0.0] [--quick] [--repeat N]
+                         [--output FILE] [--compare FILE] [--save-baseline] [--tolerance 0.2]
+"""
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+BASELINE = os.path.join(RESULTS_DIR, 'baseline.json')
+LAT, LON = 38.72, -9.14
+DISTS = [50, 150, 300]
+QUICK_DISTS = [50, 150]
+FUNCTIONS = ['weatherCities', 'weatherPoints', 'weatherBoth']
+
+def spacings(dist):
+    # The smallest distance between points accepted for this distance, and twice that (fewer points)
+    smallest = DataIntroduction.minDistPoints(dist)
+    return [smallest, min(2 * smallest, dist - 1)]
+
+def timeCall(function, number, repeat):
+    """
+    Returns the best time, in seconds, of a single call of a function, over 'repeat' rounds of 'number' calls.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def runCase(name, dist, spacing):
+    """
+    Runs a single end-to-end case with cold caches. Returns the elapsed time and the number of locations (and failed locations).
+    """
+    WeatherCache.cacheClear(CurrentWeather.cache)
+    WeatherCache.cacheClear(ForecastWeather.store)
+
+    # The fetch functions print every failed location; the output is not part of the benchmark
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        plan = QueryPlan.buildPlan(dist, LAT, LON, spacing)
+        if name == 'weatherCities':
+            weather = WeatherInfoJunction.weatherCities(dist, LAT, LON, 0, plan)
+        elif name == 'weatherPoints':
+            weather = WeatherInfoJunction.weatherPoints(dist, LAT, LON, 2, spacing, plan)
+        else:
+            weather = WeatherInfoJunction.weatherBoth(dist, LAT, LON, 3, plan)
+        elapsed = time.perf_counter() - start
+
+    failed = sum(1 for info in weather.values() if info.get('rain_current') is None)
+    return elapsed, len(weather), failed
+
+def endToEnd(server, dists, repeat):
+    results = {}
+
+    print(f"{'case':<44} {'locations':>9} {'failed':>7} {'requests':>9} {'seconds':>8}")
+    for dist in dists:
+        for spacing in spacings(dist):
+            for name in FUNCTIONS:
+                if name == 'weatherCities' and spacing != spacings(dist)[0]:
+                    continue
+
+                case = f'{name}[dist={dist}]' if name == 'weatherCities' else f'{name}[dist={dist},spacing={spacing}]'
+                times = []
+                for _ in range(repeat):
+                    requests = server.stats['requests']
+                    elapsed, locations, failed = runCase(name, dist, spacing)
+                    times.append(elapsed)
+
+                results[case] = {
+                    'seconds': statistics.median(times),
+                    'locations': locations,
+                    'failed': failed,
+                    'requests': server.stats['requests'] - requests
+                }
+                info = results[case]
+                print(f"{case:<44} {locations:>9} {failed:>7} {info['requests']:>9} {info['seconds']:>8.3f}")
+
+    return results
+
+def microBenchmarks(repeat):
+    # A forecast response with the same shape as the ones of the API (40 slots of 3 hours)
+    start = int(time.time()) // ForecastWeather.SLOT * ForecastWeather.SLOT + ForecastWeather.SLOT
+    forecast = {'cnt': 40, 'list': [
+        {'dt': start + ForecastWeather.SLOT * i, 'rain': {'3h': MockServer.fakeRain(LAT, LON, i + 1)}, 'pop': 0.5}
+        for i in range(40)
+    ]}
+    MathOthers.loadCityIndex()
+
+    cases = {
+        'getCities[dist=300]': (lambda: MathOthers.getCities(300, LAT, LON), 20),
+        'getPoints[dist=300,spacing=60]': (lambda: MathOthers.getPoints(300, LAT, LON, 60), 50),
+        'getPoints[dist=500,spacing=10]': (lambda: MathOthers.getPoints(500, LAT, LON, 10), 5),
+        'haversineDist': (lambda: MathOthers.haversineDist((LAT, LON), (40.41, -3.7)), 20000),
+        'parseWeatherInfo': (lambda: ForecastWeather.parseWeatherInfo(forecast), 2000),
+    }
+
+    results = {}
+    print(f"\n{'micro-benchmark':<44} {'us/call':>12}")
+    for case, (function, number) in cases.items():
+        results[case] = {'seconds': timeCall(function, number, max(3, repeat))}
+        print(f"{case:<44} {results[case]['seconds'] * 1e6:>12.2f}")
+
+    return results
+
+def compareResults(current, baseline, tolerance):
+    """
+    Compares the timings of two result files and prints the ratio of each case.
+
+    Parameters:
+        current (dict): The new results.
+        baseline (dict): The baseline results.
+        tolerance (float): Allowed slowdown, as a fraction (0.2 is 20% slower).
+
+    Returns:
+        regressions (list): The names of the cases slower than the tolerance.
+    """
+    regressions = []
+
+    print(f"\n{'case':<44} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for case, info in current['results'].items():
+        if case not in baseline['results']:
+            continue
+
+        before = baseline['results'][case]['seconds']
+        ratio = info['seconds'] / before if before else 1.0
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(case)
+            flag = '  REGRESSION'
+        print(f"{case:<44} {before:>10.6f} {info['seconds']:>10.6f} {ratio:>6.2f}x{flag}")
+
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the offline benchmark suite against the mock OpenWeatherMap server.")
+    parser.add_argument('--latency', type=float, default=0.01, help="latency, in seconds, of the mock server")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of the requests answered with a server error")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of the requests answered with 429")
+    parser.add_argument('--quick', action='store_true', help="skip the largest end-to-end cases")
+    parser.add_argument('--repeat', type=int, default=1, help="runs of each end-to-end case (the median is kept)")
+    parser.add_argument('--output', default=None, help="results file (default: results/<date>-<time>.json)")
+    parser.add_argument('--compare', default=BASELINE, help="baseline file to compare with")
+    parser.add_argument('--save-baseline', action='store_true', help="also write the results to the baseline file")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown before a case is a regression")
+    parser.add_argument('--cities-dir', default=os.path.join(tempfile.gettempdir(), 'owm-bench'), help="directory of the synthetic cities file")
+    args = parser.parse_args(argv)
+
+    Fixtures.useCityTable(args.cities_dir)
+    server = MockServer.startServer(args.latency, errorRate=args.error_rate, throttleRate=args.throttle_rate)
+    HttpClient.configure(root=server.url)
+    FetchEngine.setRateLimit(None)
+
+    try:
+        results = endToEnd(server, QUICK_DISTS if args.quick else DISTS, args.repeat)
+    finally:
+        MockServer.stopServer(server)
+    results.update(microBenchmarks(args.repeat))
+
+    current = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': f'{platform.node()} {platform.machine()} Python {platform.python_version()}',
+        'settings': {'latency': args.latency, 'errorRate': args.error_rate, 'throttleRate': args.throttle_rate, 'quick': args.quick},
+        'results': results
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(output, 'w', encoding='utf-8') as outfile:
+        json.dump(current, outfile, indent=2)
+    print(f"\nResults written to '{output}'.")
+
+    regressions = []
+    if os.path.exists(args.compare) and not args.save_baseline:
+        with open(args.compare, encoding='utf-8') as infile:
+            baseline = json.load(infile)
+
+        if baseline['settings'] != current['settings']:
+            print(f"The baseline was run with other settings ({baseline['settings']}); the comparison may not be meaningful.")
+        regressions = compareResults(current, baseline, args.tolerance)
+        print(f"\n{len(regressions)} regressions (tolerance {args.tolerance:.0%}).")
+
+    if args.save_baseline:
+        with open(BASELINE, 'w', encoding='utf-8') as outfile:
+            json.dump(current, outfile, indent=2)
+        print(f"Baseline written to '{BASELINE}'.")
+
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
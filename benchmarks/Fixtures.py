@@ -0,0 +1,66 @@
+import csv
+import os
+import random
+
+"""
+This module provides synthetic input files for the benchmarks, so they can run without the real 'worldcities.csv'.
+
+Functions in this module:
+
+- 'makeCityTable()': Writes a synthetic cities file with the same columns as 'worldcities.csv'.
+- 'useCityTable()': Creates a synthetic cities file in a directory (if missing) and makes it the current working directory.
+"""
+
+COLUMNS = ['city', 'city_ascii', 'lat', 'lng', 'country', 'iso2', 'iso3', 'admin_name', 'capital', 'population', 'id']
+
+def makeCityTable(path, count=45000, seed=0):
+    """
+    Writes a synthetic cities file with the same columns as 'worldcities.csv'. Cities are spread over land-like latitudes,
+    with denser clusters around a few centers (one of them close to Lisbon, which is used by the benchmarks).
+
+    Parameters:
+        path (str): Path of the file to write.
+        count (int): Number of cities.
+        seed (int): Seed of the random generator, so the file is always the same.
+
+    Returns:
+        None.
+    """
+    rng = random.Random(seed)
+    centers = [(38.72, -9.14), (48.85, 2.35), (40.71, -74.0), (35.68, 139.69), (-23.55, -46.63), (28.61, 77.2)]
+
+    with open(path, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(COLUMNS)
+
+        for i in range(count):
+            if i % 3 == 0:
+                lat, lon = rng.uniform(-55, 70), rng.uniform(-180, 180)
+            else:
+                center = centers[(i // 3) % len(centers)]
+                lat = max(-89.9, min(89.9, rng.gauss(center[0], 4)))
+                lon = (rng.gauss(center[1], 5) + 180) % 360 - 180
+
+            name = f'City{i}'
+            writer.writerow([name, name, round(lat, 4), round(lon, 4), 'Country', 'CC', 'CCC', 'Admin', '', rng.randint(1000, 10 ** 7), 10 ** 9 + i])
+
+def useCityTable(directory, count=45000):
+    """
+    Creates a synthetic 'worldcities.csv' in a directory (if missing) and makes it the current working directory,
+    which is where 'MathOthers.getCities()' looks for the file.
+
+    Parameters:
+        directory (str): Directory of the file.
+        count (int): Number of cities, if the file has to be created.
+
+    Returns:
+        path (str): Path of the cities file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'worldcities.csv')
+
+    if not os.path.exists(path):
+        makeCityTable(path, count)
+
+    os.chdir(directory)
+    return path
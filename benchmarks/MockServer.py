@@ -0,0 +1,200 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+"""
+This module provides a local stand-in for the OpenWeatherMap API, used to benchmark the weather modules without network access
+or API quota.
+
+The server answers the current weather ('/data/2.5/weather'), forecast ('/data/2.5/forecast') and direct geocoding
+('/geo/1.0/direct') endpoints with deterministic values derived from the requested coordinates, after an artificial latency.
+A fraction of the requests can fail with a server error (500) or be throttled (429, with a 'Retry-After' header), and the server
+can enforce a calls-per-minute limit (with a burst of 'BURST' calls), answering 429 when it is exceeded, as the real API does.
+
+The server can also run on its own, as a local stand-in for the API (for example, for the 'WeatherService' module):
+
+    python MockServer.py --port 9000 --latency 0.05 [--error-rate 0.01] [--throttle-rate 0.05] [--calls-per-minute 600]
+
+Functions in this module:
+
+- 'fakeRain()': Computes a deterministic rain value for a pair of coordinates.
+- 'startServer()': Starts the mock server in a background thread.
+- 'stopServer()': Stops a server started by 'startServer()'.
+"""
+
+BURST = 10
+
+def fakeRain(lat, lon, slot=0):
+    """
+    Computes a deterministic rain value, in mm, for a pair of coordinates.
+
+    Parameters:
+        lat (float): Latitude of the location.
+        lon (float): Longitude of the location.
+        slot (int): Index of the 3 hour forecast slot (0 for the current weather).
+
+    Returns:
+        float: Rain value in mm.
+    """
+    value = math.sin(math.radians(lat) * 7 + slot * 0.3) * math.cos(math.radians(lon) * 5)
+    return round(max(0.0, value) * 4, 2)
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self, name):
+        # The handlers run on several threads, so the counters are only changed with the lock of the server
+        with self.server.statsLock:
+            self.server.stats[name] += 1
+            if self.server.stats['first'] is None:
+                self.server.stats['first'] = time.perf_counter()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self._count('requests')
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.callsPerMinute:
+            with self.server.lock:
+                now = time.monotonic()
+                rate = self.server.callsPerMinute / 60
+                self.server.tokens = min(BURST, self.server.tokens + (now - self.server.updated) * rate)
+                self.server.updated = now
+                wait = 0 if self.server.tokens >= 1 else (1 - self.server.tokens) / rate
+                if not wait:
+                    self.server.tokens -= 1
+
+            if wait:
+                self._count('throttled')
+                self._send(429, {'cod': 429, 'message': 'Your account is temporary blocked due to exceeding of requests limitation.'},
+                           {'Retry-After': str(math.ceil(wait))})
+                return
+
+        draw = self.server.random.random()
+        if draw < self.server.throttleRate:
+            self._count('throttled')
+            self._send(429, {'cod': 429, 'message': 'Your account is temporary blocked due to exceeding of requests limitation.'},
+                       {'Retry-After': str(self.server.retryAfter)})
+            return
+        if draw < self.server.throttleRate + self.server.errorRate:
+            self._count('errors')
+            self._send(500, {'cod': 500, 'message': 'Internal error'})
+            return
+
+        if url.path.endswith('/data/2.5/weather'):
+            lat, lon = float(query['lat']), float(query['lon'])
+            payload = {'coord': {'lat': lat, 'lon': lon}, 'rain': {'1h': fakeRain(lat, lon + self.server.drift)}}
+        elif url.path.endswith('/data/2.5/forecast'):
+            lat, lon = float(query['lat']), float(query['lon'])
+            start = int(time.time()) // 10800 * 10800 + 10800
+            payload = {'cnt': 40, 'list': [
+                {'dt': start + 10800 * i, 'rain': {'3h': fakeRain(lat, lon, i + 1)}, 'pop': round(min(1.0, fakeRain(lat, lon, i + 1) / 4), 2)}
+                for i in range(40)
+            ]}
+        elif url.path.endswith('/geo/1.0/direct'):
+            name = query.get('q', '').split(',')[0]
+            payload = [{'name': name, 'lat': (len(name) * 7) % 90, 'lon': (len(name) * 13) % 180}]
+        else:
+            self._send(404, {'cod': 404, 'message': 'not found'})
+            return
+
+        self._send(200, payload)
+
+def startServer(latency=0.05, port=0, errorRate=0.0, throttleRate=0.0, retryAfter=1, seed=0, callsPerMinute=None):
+    """
+    Starts the mock server in a background thread.
+
+    Parameters:
+        latency (float): Artificial latency, in seconds, added to every response.
+        port (int): Port to listen on. If 0, a free port is chosen.
+        errorRate (float): Fraction of the requests answered with a server error (500).
+        throttleRate (float): Fraction of the requests answered with 'Too Many Requests' (429).
+        retryAfter (int): Seconds sent in the 'Retry-After' header of the 429 responses.
+        seed (int): Seed of the random generator that chooses the failed requests.
+        callsPerMinute (float): Calls per minute allowed, with a burst of 'BURST' calls. If None, the calls are not limited.
+
+    Returns:
+        server (ThreadingHTTPServer): The running server. Its root URL is in 'server.url', and 'server.stats' holds the request count
+        (with the 'errors' and 'throttled' counts) and the 'time.perf_counter()' value of the first request, changed with the
+        'server.statsLock' lock. Setting 'server.drift' (degrees of longitude) moves the current rain pattern, to simulate changing
+        weather.
+    """
+    server = _Server(('127.0.0.1', port), _Handler)
+    server.latency = latency
+    server.drift = 0.0
+    server.errorRate = errorRate
+    server.throttleRate = throttleRate
+    server.retryAfter = retryAfter
+    server.random = random.Random(seed)
+    server.callsPerMinute = callsPerMinute
+    server.tokens = float(BURST)
+    server.updated = time.monotonic()
+    server.lock = threading.Lock()
+    server.statsLock = threading.Lock()
+    server.stats = {'requests': 0, 'errors': 0, 'throttled': 0, 'first': None}
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    return server
+
+def stopServer(server):
+    """
+    Stops a server started by 'startServer()'.
+
+    Parameters:
+        server (ThreadingHTTPServer): The running server.
+
+    Returns:
+        None.
+    """
+    server.shutdown()
+    server.server_close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs a local stand-in for the OpenWeatherMap API.")
+    parser.add_argument('--port', type=int, default=9000, help="port to listen on")
+    parser.add_argument('--latency', type=float, default=0.05, help="latency, in seconds, added to every response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of the requests answered with a server error (500)")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of the requests answered with 'Too Many Requests' (429)")
+    parser.add_argument('--retry-after', type=int, default=1, help="seconds sent in the 'Retry-After' header of the 429 responses")
+    parser.add_argument('--calls-per-minute', type=float, default=None, help="calls per minute allowed before answering 429")
+    args = parser.parse_args(argv)
+
+    server = startServer(args.latency, args.port, args.error_rate, args.throttle_rate, args.retry_after, callsPerMinute=args.calls_per_minute)
+    print(f"Mock OpenWeatherMap server listening on {server.url}")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stopServer(server)
+
+if __name__ == '__main__':
+    main()